@@ -1,23 +1,24 @@
 """Main entry point for the PDF Parser application."""
 
 import streamlit as st
-from anthropic import Anthropic
 
 from src.auth.password import check_password
 from src.ui.main_tab import render_main_tab
 from src.ui.split_tab import render_split_tab
 from src.ui.debug_tab import render_debug_tab
+from src.ui.history_tab import render_history_tab
+from src.utils.clients import get_anthropic_client
 
 def main():
     """Main application entry point."""
-    # Get API key from secrets
-    client = Anthropic(api_key=st.secrets["ANTHROPIC_API_KEY"])
+    # Shared client, created once per process rather than on every rerun
+    client = get_anthropic_client()
 
     # Create tabs based on admin status
     if st.session_state.get("is_admin", False):
-        main_tab, split_tab, debug_tab = st.tabs(["Main", "PDF Splitting", "Debug Info"])
+        main_tab, split_tab, history_tab, debug_tab = st.tabs(["Main", "PDF Splitting", "Results History", "Debug Info"])
     else:
-        main_tab, split_tab = st.tabs(["Main", "PDF Splitting"])
+        main_tab, split_tab, history_tab = st.tabs(["Main", "PDF Splitting", "Results History"])
 
     # Render each tab
     with split_tab:
@@ -26,6 +27,9 @@ def main():
     with main_tab:
         render_main_tab()
 
+    with history_tab:
+        render_history_tab()
+
     # Render debug tab if admin
     if st.session_state.get("is_admin", False):
         with debug_tab:
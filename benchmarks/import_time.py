@@ -0,0 +1,73 @@
+"""Import-time benchmark for the PDF Parser application.
+
+Runs each entry module in a fresh interpreter with ``-X importtime`` and
+reports its cumulative import time and the slowest imports it pulls in.
+Fails if a module that should be deferred to first use (OpenCV, PyMuPDF,
+...) is imported at start-up.
+
+Usage (from the repository root):
+    python benchmarks/import_time.py [--top 10]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ENTRY_MODULES = ["src.pdf.parser", "src.ui.split_tab", "src.ui.main_tab"]
+
+# Heavy optional modules that must only be imported on first use
+DEFERRED_MODULES = ["cv2", "fitz", "pymupdf"]
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_imports(module):
+    """Import a module in a fresh interpreter and parse the -X importtime output.
+
+    Returns:
+        List of (module_name, self_us, cumulative_us, depth) tuples
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args()
+
+    failures = []
+    for module in ENTRY_MODULES:
+        entries = measure_imports(module)
+        cumulative = {name: cumulative_us for name, _, cumulative_us, _ in entries}
+        print(f"{module}: {cumulative.get(module, 0) / 1000:.1f} ms cumulative")
+
+        top_level = [entry for entry in entries if entry[3] <= 1 and entry[0] != module]
+        for name, _, cumulative_us, _ in sorted(top_level, key=lambda e: -e[2])[:args.top]:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+        loaded = {name.split('.')[0] for name, _, _, _ in entries}
+        for deferred in DEFERRED_MODULES:
+            if deferred in loaded:
+                failures.append(f"{module} imports {deferred} at start-up")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Per-page memory benchmark for the vision render→encode pipeline.
+
+Runs the previous page pipeline (PIL image → NumPy array → BGR copy →
+crop → RGB copy → PIL image → BytesIO → base64) and the current
+iter_page_images path over the same PDF, each in a fresh interpreter, and
+reports time per image, the largest Python-traced allocation peak while a
+page is processed (NumPy and bytes buffers; Pillow and MuPDF internals are
+not traced) and the process's peak resident memory.
+
+The current path also trims digital pages by their vector bounds, so use a
+scanned PDF to compare the raster pipelines like for like.
+
+Usage (from the repository root):
+    python benchmarks/page_allocations.py statement.pdf [--dpi 200] [--png]
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+VARIANTS = ["previous", "current"]
+
+def previous_page_images(pdf_path, dpi, use_png):
+    """The page pipeline as it was before the copy-free rework."""
+    import cv2
+    import fitz  # PyMuPDF
+    import numpy as np
+    from PIL import Image
+    from src.pdf.parser import find_content_crop
+
+    with fitz.open(pdf_path) as pdf_document:
+        for page in pdf_document:
+            pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
+            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            cv_image = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+            crop = find_content_crop(cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB))
+            if crop is not None:
+                x_min, y_min, x_max, y_max = crop
+                img = Image.fromarray(cv2.cvtColor(cv_image[y_min:y_max, x_min:x_max], cv2.COLOR_BGR2RGB))
+            buffer = io.BytesIO()
+            if use_png:
+                img.save(buffer, format='PNG')
+            else:
+                img.save(buffer, format='JPEG', quality=85)
+            yield base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+def current_page_images(pdf_path, dpi, use_png):
+    """The current streaming page pipeline."""
+    from src.pdf.documents import InputDocument
+    from src.pdf.parser import iter_page_images
+
+    for image_data, _ in iter_page_images(InputDocument.from_path(pdf_path), dpi=dpi, use_png=use_png,
+                                          max_images=sys.maxsize, max_total_bytes=sys.maxsize):
+        yield image_data
+
+def measure(variant, pdf_path, dpi, use_png):
+    """Run one variant and collect its per-page measurements."""
+    from src.utils.memory import get_peak_memory_mb
+
+    images = previous_page_images if variant == "previous" else current_page_images
+    page_peaks = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in images(pdf_path, dpi, use_png):
+        page_peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    return {
+        'images': len(page_peaks),
+        'seconds_per_image': elapsed / max(len(page_peaks), 1),
+        'max_traced_peak_mb': max(page_peaks, default=0) / (1024 * 1024),
+        'mean_traced_peak_mb': sum(page_peaks) / max(len(page_peaks), 1) / (1024 * 1024),
+        'peak_rss_mb': get_peak_memory_mb()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", help="PDF to render")
+    parser.add_argument("--dpi", type=int, default=200, help="Render resolution")
+    parser.add_argument("--png", action="store_true", help="Encode PNG instead of JPEG")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        # Child process: measure one variant and report it as JSON
+        print(json.dumps(measure(args.variant, os.path.abspath(args.pdf), args.dpi, args.png)))
+        return 0
+
+    print(f"{'variant':<10}{'images':>8}{'s/image':>10}{'max traced MB':>15}{'mean traced MB':>16}{'peak RSS MB':>13}")
+    for variant in VARIANTS:
+        command = [sys.executable, os.path.abspath(__file__), os.path.abspath(args.pdf), "--dpi", str(args.dpi), "--variant", variant]
+        if args.png:
+            command.append("--png")
+        completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{variant} failed:\n{completed.stderr[-2000:]}")
+            return 1
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        peak_rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else "n/a"
+        print(f"{variant:<10}{result['images']:>8}{result['seconds_per_image']:>10.3f}"
+              f"{result['max_traced_peak_mb']:>15.1f}{result['mean_traced_peak_mb']:>16.1f}{peak_rss:>13}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
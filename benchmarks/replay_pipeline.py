@@ -0,0 +1,123 @@
+"""Offline pipeline benchmark for the PDF Parser application.
+
+Runs process_pdf_files over a set of bills with the API served from a
+cassette (see src.utils.cassettes), so response parsing, validation,
+DataFrame assembly and export can be profiled at full speed, with no API
+key and no cost. Record the cassette once against the live API, then
+replay it as often as needed:
+
+Usage (from the repository root):
+    python benchmarks/replay_pipeline.py cassettes/water.jsonl bills/*.pdf --template "Water Bills" --record
+    python benchmarks/replay_pipeline.py cassettes/water.jsonl bills/*.pdf --template "Water Bills" [--repeat 5] [--latency 1]
+
+The same options must be used for recording and replaying, since they
+shape the requests the cassette is matched on.
+
+Every run prints a digest of the extracted rows. Recording also stores it
+next to the cassette (cassette path + ".digest"), and replays exit with
+status 1 when their digest differs from the stored one (or from
+--expected-digest), so a committed cassette doubles as a regression check
+for everything downstream of the API.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+def run_once(documents, prompt, include_calculations, field_names, use_vision):
+    """Extract and export the bills once.
+
+    Returns:
+        (DataFrame or None, CSV export, dict of seconds per stage)
+    """
+    from src.pdf.parser import process_pdf_files
+    from src.utils.run_state import bind_run_state
+
+    timings = {}
+    started = time.perf_counter()
+    # Logs and messages go to a throwaway dict instead of a Streamlit session
+    with bind_run_state({}):
+        df = process_pdf_files(documents, prompt, include_calculations, use_vision=use_vision,
+                               field_names=field_names)
+    timings['extract'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    csv_data = df.to_csv(index=False) if df is not None else ""
+    timings['csv'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if df is not None:
+        df.to_excel(io.BytesIO(), index=False, sheet_name='Extracted Data')
+    timings['excel'] = time.perf_counter() - started
+    return df, csv_data, timings
+
+def main():
+    from src.config.templates import TEMPLATES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette", help="Cassette file to record to or replay from")
+    parser.add_argument("pdfs", nargs="+", help="Bills to extract")
+    parser.add_argument("--template", required=True, choices=list(TEMPLATES.keys()), help="Template to extract with")
+    parser.add_argument("--calculations", action="store_true", help="Include charge calculations")
+    parser.add_argument("--vision", action="store_true", help="Send pages as images")
+    parser.add_argument("--record", action="store_true", help="Call the live API and record the responses")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Replay this multiple of the recorded latency (0 replays instantly)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of replay runs")
+    parser.add_argument("--expected-digest", help="Digest replays must produce (defaults to the one stored when recording)")
+    args = parser.parse_args()
+
+    from src.utils.cassettes import CASSETTE_ENV, CASSETTE_MODE_ENV, RECORD, REPLAY, REPLAY_LATENCY_ENV
+
+    # Must be set before the shared HTTP client is first created
+    os.environ[CASSETTE_ENV] = os.path.abspath(args.cassette)
+    os.environ[CASSETTE_MODE_ENV] = RECORD if args.record else REPLAY
+    os.environ[REPLAY_LATENCY_ENV] = str(args.latency)
+
+    from src.pdf.documents import InputDocument
+    from src.pdf.prompts import build_prompt
+
+    fields = TEMPLATES[args.template]
+    prompt = build_prompt(fields, args.calculations)
+    field_names = [field for field, _ in fields if field]
+    documents = [InputDocument.from_path(os.path.abspath(path)) for path in args.pdfs]
+
+    digest_path = os.path.abspath(args.cassette) + ".digest"
+    expected_digest = args.expected_digest
+    if expected_digest is None and not args.record and os.path.exists(digest_path):
+        with open(digest_path, encoding="utf-8") as f:
+            expected_digest = f.read().strip()
+
+    mismatches = 0
+    print(f"{'run':<8}{'rows':>6}{'extract s':>11}{'csv s':>9}{'excel s':>9}  digest")
+    for run in range(1 if args.record else args.repeat):
+        df, csv_data, timings = run_once(documents, prompt, args.calculations, field_names, args.vision)
+        rows = len(df) if df is not None else 0
+        digest = hashlib.sha256(csv_data.encode()).hexdigest()[:12]
+        label = "record" if args.record else f"replay {run + 1}"
+        print(f"{label:<8}{rows:>6}{timings['extract']:>11.3f}{timings['csv']:>9.3f}{timings['excel']:>9.3f}  {digest}")
+        if rows < len(documents):
+            print(f"  {len(documents) - rows} of {len(documents)} bills produced no row; "
+                  f"check the options match the recording")
+        if args.record:
+            with open(digest_path, "w", encoding="utf-8") as f:
+                f.write(digest + "\n")
+        elif expected_digest and digest != expected_digest:
+            print(f"  digest differs from the expected {expected_digest}")
+            mismatches += 1
+
+    if mismatches:
+        print(f"{mismatches} replay run{'s' if mismatches > 1 else ''} produced different results")
+        return 1
+    if not args.record and not expected_digest:
+        print("No expected digest to compare with; record the cassette again or pass --expected-digest")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
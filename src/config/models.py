@@ -0,0 +1,11 @@
+"""Model definitions for the PDF Parser application."""
+
+# Model used for every request unless tiered routing is enabled
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+# Faster, cheaper model tried first when tiered routing is enabled
+FAST_MODEL = "claude-3-5-haiku-20241022"
+
+# Models tried in order by tiered routing; a bill escalates to the next tier
+# when the previous tier's result fails validation
+MODEL_TIERS = [FAST_MODEL, DEFAULT_MODEL]
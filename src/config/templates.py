@@ -35,4 +35,11 @@ TEMPLATES = {
         ("", ""),  # Empty field 4
         ("", "")   # Empty field 5
     ]
-} 
\ No newline at end of file
+} 
+
+# Fields that must be non-null for an extraction to pass validation
+REQUIRED_FIELDS = {
+    "Water Bills": ["Start Date", "End Date", "Account Number", "Total Current Charges"],
+    "Festus Gas": ["Account Number", "Subtotal"],
+    "Custom": []
+}
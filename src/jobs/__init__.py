@@ -0,0 +1 @@
+"""Background processing package for PDF Parser.""" 
\ No newline at end of file
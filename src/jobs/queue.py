@@ -0,0 +1,238 @@
+"""Durable SQLite work queue for the PDF Parser application.
+
+Each queued file is a task row holding the PDF bytes and its processing
+options. Workers lease tasks for a visibility timeout; a task whose lease
+expires (e.g. its worker crashed) becomes visible to other workers again,
+until it has used up its attempts and is marked failed.
+
+Any number of worker processes on the same host can share one queue file.
+SQLite's WAL mode needs shared memory between its users, so the queue file
+must sit on a local filesystem, not a network share.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+DEFAULT_QUEUE_PATH = os.path.join(os.getcwd(), "work_queue.db")
+
+# Seconds a leased task stays invisible to other workers
+DEFAULT_VISIBILITY_TIMEOUT = 600
+
+# Attempts before a task is marked failed for good
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content BLOB NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_tasks_batch ON tasks (batch_id);
+"""
+
+class WorkQueue:
+    """Per-file extraction tasks with leases and completion records."""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the queue safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # Rolls back a transaction left open by an error; only closing releases the connection
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue_batch(self, documents, options):
+        """Queue one task per document.
+
+        Args:
+            documents: List of InputDocuments; their content is copied into the queue
+            options: JSON-serializable processing options shared by the batch
+
+        Returns:
+            str: The batch ID
+        """
+        batch_id = uuid.uuid4().hex[:12]
+        options_json = json.dumps(options)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            for document in documents:
+                conn.execute(
+                    "INSERT INTO tasks (batch_id, filename, content, options, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (batch_id, document.name, document.getvalue(), options_json, now)
+                )
+            conn.execute("COMMIT")
+        return batch_id
+
+    def _fail_expired(self, conn, now):
+        # A lease that expired on the final attempt (its worker died) can't be retried
+        conn.execute(
+            "UPDATE tasks SET status = ?, error = ?, content = X'', lease_owner = NULL, completed_at = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (FAILED, f"Worker lease expired on attempt {self.max_attempts} of {self.max_attempts}", now,
+             LEASED, now, self.max_attempts)
+        )
+
+    def lease(self, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """Lease the oldest available task.
+
+        Args:
+            worker_id: Identifier of the leasing worker
+            visibility_timeout: Seconds before the lease expires
+
+        Returns:
+            dict with id, batch_id, filename, content, options and attempts, or None
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock up front so two workers can't lease the same row
+            conn.execute("BEGIN IMMEDIATE")
+            self._fail_expired(conn, now)
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE (status = ? OR (status = ? AND lease_expires < ?)) "
+                "AND attempts < ? ORDER BY id LIMIT 1",
+                (PENDING, LEASED, now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (LEASED, worker_id, now + visibility_timeout, row['id'])
+            )
+            conn.execute("COMMIT")
+        return {
+            'id': row['id'],
+            'batch_id': row['batch_id'],
+            'filename': row['filename'],
+            'content': row['content'],
+            'options': json.loads(row['options']),
+            'attempts': row['attempts'] + 1
+        }
+
+    def heartbeat(self, task_id, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """Extend a lease held by this worker.
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (time.time() + visibility_timeout, task_id, LEASED, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result):
+        """Record a task's result and release its content.
+
+        Returns:
+            bool: False if the lease was lost and the result discarded
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, content = X'', completed_at = ?, lease_owner = NULL "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE, json.dumps(result), time.time(), task_id, LEASED, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        """Record a failed attempt; the task is retried until MAX_ATTEMPTS is reached."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, "
+                "completed_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (self.max_attempts, FAILED, PENDING, error, self.max_attempts, time.time(),
+                 task_id, LEASED, worker_id)
+            )
+
+    def batch_status(self, batch_id):
+        """Count a batch's tasks by status.
+
+        Returns:
+            dict mapping status to count, plus 'total'
+        """
+        with self._connect() as conn:
+            # Expired final attempts count as failed even when no worker is left to lease
+            self._fail_expired(conn, time.time())
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS count FROM tasks WHERE batch_id = ? GROUP BY status",
+                (batch_id,)
+            ).fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row['status']: row['count'] for row in rows})
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def abandon_batch(self, batch_id):
+        """Fail a batch's unfinished tasks, so it counts as finished.
+
+        Results a worker is still producing are discarded, since complete()
+        only accepts tasks that are still leased.
+
+        Returns:
+            int: Number of tasks abandoned
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, content = X'', lease_owner = NULL, completed_at = ? "
+                "WHERE batch_id = ? AND status IN (?, ?)",
+                (FAILED, "Abandoned before a worker finished it", time.time(), batch_id, PENDING, LEASED)
+            )
+        return cursor.rowcount
+
+    def batch_results(self, batch_id):
+        """Get the completed results and failures of a batch.
+
+        Returns:
+            (results, failures) where results is a list of extracted dicts and
+            failures a list of {'filename', 'response'} dicts
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT filename, status, result, error FROM tasks WHERE batch_id = ? AND status IN (?, ?) ORDER BY id",
+                (batch_id, DONE, FAILED)
+            ).fetchall()
+        results = [json.loads(row['result']) for row in rows if row['status'] == DONE]
+        failures = [{'filename': row['filename'], 'response': row['error']} for row in rows if row['status'] == FAILED]
+        return results, failures
+
+@functools.lru_cache(maxsize=None)
+def get_work_queue(path=DEFAULT_QUEUE_PATH):
+    """Get the shared WorkQueue for a queue file."""
+    return WorkQueue(path)
@@ -0,0 +1,125 @@
+"""Background job runner for the PDF Parser application.
+
+Jobs run on a process-wide thread pool, outside any Streamlit script run,
+so a long batch keeps going when the user navigates away or closes the
+browser tab. Sessions keep only the job ID and poll the job for progress.
+"""
+
+import functools
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.run_state import bind_run_state
+
+# Number of jobs that may run at the same time in this process
+MAX_CONCURRENT_JOBS = 2
+
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+class Job:
+    """A unit of background work with progress, cancellation and a result."""
+
+    def __init__(self, description, total=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.description = description
+        self.status = QUEUED
+        self.processed = 0
+        self.total = total
+        self.result = None
+        self.error = None
+        # Logs and diagnostics recorded by the job (see src.utils.run_state)
+        self.state = {}
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def progress(self):
+        """Fraction of work done, from 0 to 1."""
+        return self.processed / self.total if self.total else 0.0
+
+    def update_progress(self, processed, total):
+        """Progress callback passed to the job function."""
+        self.processed = processed
+        self.total = total
+
+    def cancel(self):
+        """Ask the job to stop; it finishes the file in flight first."""
+        self.cancel_event.set()
+
+class JobRunner:
+    """Run jobs on a thread pool and keep them addressable by ID."""
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, description, func, *args, total=0, **kwargs):
+        """Start a job in the background.
+
+        The function is called with the given arguments plus
+        progress_callback and cancel_event keyword arguments, and anything
+        it records through get_run_state() lands in job.state.
+
+        Args:
+            description: Human-readable description of the job
+            func: The function to run
+            total: Number of work items, for progress reporting
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            Job: The submitted job
+        """
+        job = Job(description, total)
+        with self._lock:
+            self._purge_finished()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        try:
+            with bind_run_state(job.state):
+                job.result = func(*args, progress_callback=job.update_progress,
+                                  cancel_event=job.cancel_event, **kwargs)
+            job.status = CANCELLED if job.cancel_event.is_set() else COMPLETED
+        except Exception as e:
+            job.error = f"{str(e)}\n{traceback.format_exc()}"
+            job.status = FAILED
+        job.finished_at = time.time()
+
+    def _purge_finished(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Get a job by ID, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+@functools.lru_cache(maxsize=None)
+def get_job_runner():
+    """Get the process-wide job runner, shared by all sessions."""
+    return JobRunner()
@@ -0,0 +1,223 @@
+"""Watch-folder ingestion for the PDF Parser application.
+
+Watches a directory for new or changed PDFs and extracts each one with a
+template as soon as it has finished being written:
+
+    python -m src.jobs.watcher incoming/ --template "Water Bills" --output results.jsonl
+
+Every extracted bill is appended to the output as one JSON line tagged with
+its content hash, so files already processed (even under another name) are
+skipped across restarts. File events come from the watchdog package (listed
+in requirements.txt); where it isn't installed, the directory is polled
+instead.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+
+from src.config.templates import TEMPLATES
+from src.pdf.documents import InputDocument
+from src.utils.run_state import bind_run_state
+
+# A file must be unchanged for this many seconds before it is processed
+DEFAULT_DEBOUNCE_SECONDS = 5.0
+
+# Seconds between directory scans
+DEFAULT_POLL_INTERVAL = 2.0
+
+def scan_directory(directory):
+    """Get the size and modification time of every PDF in a directory.
+
+    Returns:
+        dict mapping path to (size, mtime)
+    """
+    signatures = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.lower().endswith('.pdf'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Removed between listing and stat
+                continue
+            signatures[entry.path] = (stat.st_size, stat.st_mtime)
+    return signatures
+
+class ChangeTracker:
+    """Debounce file changes until a file has stopped being written."""
+
+    def __init__(self, debounce=DEFAULT_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._changed = {}
+        self._lock = threading.Lock()
+
+    def touch(self, path):
+        """Record that a file was created or modified."""
+        with self._lock:
+            self._changed[path] = time.time()
+
+    def pop_ready(self):
+        """Get the files that have been quiet for the debounce period."""
+        cutoff = time.time() - self.debounce
+        with self._lock:
+            ready = [path for path, changed_at in self._changed.items() if changed_at <= cutoff]
+            for path in ready:
+                del self._changed[path]
+        return ready
+
+def start_observer(directory, tracker):
+    """Feed file system events into the tracker using watchdog, if installed.
+
+    Returns:
+        The running observer, or None when watchdog is unavailable
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class PdfEventHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            # Moves into the folder report the new name as dest_path
+            path = getattr(event, 'dest_path', None) or event.src_path
+            if str(path).lower().endswith('.pdf'):
+                tracker.touch(os.fsdecode(path))
+
+    observer = Observer()
+    observer.schedule(PdfEventHandler(), directory, recursive=False)
+    observer.start()
+    return observer
+
+def load_processed_hashes(output_path):
+    """Get the content hashes of files already recorded in the output."""
+    hashes = set()
+    if not os.path.exists(output_path):
+        return hashes
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                hashes.add(json.loads(line)['file_hash'])
+            except (json.JSONDecodeError, KeyError):
+                # Partial line from an interrupted write
+                continue
+    return hashes
+
+def append_result(output_path, result):
+    """Append one extracted bill to the output as a JSON line."""
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def extract_file(document, template_name, include_calculations=False, use_vision=False):
+    """Extract one bill with a template's fields and add it to the results store.
+
+    Returns:
+        dict: The extracted data
+    """
+    from src.pdf.parser import get_processing_client, process_single_pdf, store_result
+    from src.pdf.prompts import build_prompt
+
+    fields = TEMPLATES[template_name]
+    prompt = build_prompt(fields, include_calculations)
+    client = get_processing_client(use_vision)
+    # Messages and logs go to a per-file dict instead of a Streamlit session
+    with bind_run_state({}):
+        result = process_single_pdf(client, document, prompt, include_calculations, use_vision,
+                                    field_names=[field for field, _ in fields if field])
+    if result:
+        store_result(document, result, template_name)
+    return result
+
+def run_watcher(directory, template_name, output_path, include_calculations=False, use_vision=False,
+                debounce=DEFAULT_DEBOUNCE_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL, once=False):
+    """Process PDFs in a directory as they arrive until interrupted.
+
+    Args:
+        directory: Directory to watch
+        template_name: Name of the template in TEMPLATES to extract with
+        output_path: JSON Lines file results are appended to
+        include_calculations: Whether to include calculations
+        use_vision: Whether to process PDFs as images
+        debounce: Seconds a file must be unchanged before it is processed
+        poll_interval: Seconds between scans
+        once: Whether to process the files currently present and exit
+    """
+    processed_hashes = load_processed_hashes(output_path)
+    # Hashes that failed are retried only once the file changes
+    failed_hashes = set()
+    tracker = ChangeTracker(0 if once else debounce)
+    observer = None if once else start_observer(directory, tracker)
+    print(f"Watching {directory} ({'watchdog events' if observer else 'polling'}); "
+          f"{len(processed_hashes)} files already processed")
+
+    signatures = {}
+    first_scan = True
+    try:
+        while True:
+            if observer is None or first_scan:
+                # Polling, plus a first scan to pick up files present at startup
+                current = scan_directory(directory)
+                for path, signature in current.items():
+                    if signatures.get(path) != signature:
+                        tracker.touch(path)
+                signatures = current
+                first_scan = False
+
+            for path in tracker.pop_ready():
+                if not os.path.exists(path):
+                    continue
+                document = InputDocument.from_path(path)
+                file_hash = document.content_hash()
+                if file_hash in processed_hashes or file_hash in failed_hashes:
+                    continue
+                print(f"Processing {document.name}")
+                try:
+                    result = extract_file(document, template_name, include_calculations, use_vision)
+                except Exception as e:
+                    print(f"Error processing {document.name}: {str(e)}\n{traceback.format_exc()}")
+                    failed_hashes.add(file_hash)
+                    continue
+                if not result:
+                    failed_hashes.add(file_hash)
+                    continue
+                result['file_hash'] = file_hash
+                result['template'] = template_name
+                append_result(output_path, result)
+                processed_hashes.add(file_hash)
+
+            if once:
+                return
+            time.sleep(poll_interval)
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract PDFs dropped into a directory.")
+    parser.add_argument("directory", help="Directory to watch for PDFs")
+    parser.add_argument("--template", required=True, choices=list(TEMPLATES.keys()), help="Template to extract with")
+    parser.add_argument("--output", default="results.jsonl", help="JSON Lines file results are appended to")
+    parser.add_argument("--calculations", action="store_true", help="Include charge calculations and breakdowns")
+    parser.add_argument("--vision", action="store_true", help="Process PDFs as images")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_SECONDS,
+                        help="Seconds a file must be unchanged before it is processed")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between scans")
+    parser.add_argument("--once", action="store_true", help="Process the files present now and exit")
+    args = parser.parse_args()
+
+    try:
+        run_watcher(args.directory, args.template, args.output, args.calculations, args.vision,
+                    args.debounce, args.poll_interval, args.once)
+    except KeyboardInterrupt:
+        print("Watcher stopped")
+
+if __name__ == "__main__":
+    main()
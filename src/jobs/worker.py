@@ -0,0 +1,128 @@
+"""Work queue consumer for the PDF Parser application.
+
+Run any number of workers against the same queue file to scale extraction
+horizontally:
+
+    python -m src.jobs.worker --queue work_queue.db
+
+Each worker leases one file at a time, extracts it with the same logic as
+the Main tab, and records the result or error back on the queue. Leases are
+renewed while a file is being processed; if a worker dies, its file becomes
+visible to the other workers once the lease expires.
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+
+from src.jobs.queue import DEFAULT_QUEUE_PATH, DEFAULT_VISIBILITY_TIMEOUT, WorkQueue
+from src.pdf.documents import InputDocument
+from src.utils.run_state import bind_run_state
+
+# Seconds to wait before polling an empty queue again
+DEFAULT_POLL_INTERVAL = 2.0
+
+def process_task(task):
+    """Extract one queued file.
+
+    Args:
+        task: Task dict from WorkQueue.lease
+
+    Returns:
+        dict: The extracted data
+    """
+    from src.pdf.parser import get_processing_client, process_single_pdf, process_with_routing, store_result
+    from src.pdf.slimming import slim_input_document
+
+    options = task['options']
+    document = InputDocument.from_bytes(task['filename'], task['content'])
+    payload = document
+    if options.get('slim_pdfs') and not options.get('use_vision'):
+        payload = slim_input_document(document, options.get('max_image_dpi'))
+    client = get_processing_client(options.get('use_vision', False), options.get('use_files_api', False))
+    common = dict(
+        use_vision=options.get('use_vision', False),
+        use_png=options.get('use_png', False),
+        use_files_api=options.get('use_files_api', False),
+        adaptive_encoding=options.get('adaptive_encoding', False),
+        field_names=options.get('field_names'),
+        extraction_tool=options.get('extraction_tool'),
+        region_fields=options.get('field_names') if options.get('crop_regions') else None
+    )
+    if options.get('use_model_routing'):
+        result = process_with_routing(client, payload, options['prompt'], options['include_calculations'],
+                                      options.get('required_fields'), **common)
+    else:
+        result = process_single_pdf(client, payload, options['prompt'], options['include_calculations'], **common)
+    if result and options.get('template_name'):
+        store_result(document, result, options['template_name'])
+    return result
+
+def keep_lease_alive(queue, task_id, worker_id, visibility_timeout, stop_event):
+    """Renew a lease until stop_event is set; runs on a helper thread."""
+    while not stop_event.wait(visibility_timeout / 3):
+        if not queue.heartbeat(task_id, worker_id, visibility_timeout):
+            print(f"Lost lease on task {task_id}")
+            return
+
+def run_worker(queue, worker_id, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL, once=False):
+    """Consume tasks from the queue until interrupted.
+
+    Args:
+        queue: The WorkQueue to consume
+        worker_id: Identifier recorded on leases
+        visibility_timeout: Seconds a lease lasts between heartbeats
+        poll_interval: Seconds to sleep when the queue is empty
+        once: Whether to exit as soon as the queue is empty
+    """
+    print(f"Worker {worker_id} consuming {queue.path}")
+    while True:
+        task = queue.lease(worker_id, visibility_timeout)
+        if task is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"Processing {task['filename']} (task {task['id']}, attempt {task['attempts']})")
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=keep_lease_alive,
+                                     args=(queue, task['id'], worker_id, visibility_timeout, stop_event),
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            # Messages and logs go to a per-task dict instead of a Streamlit session
+            with bind_run_state({}):
+                result = process_task(task)
+            if result:
+                queue.complete(task['id'], worker_id, result)
+            else:
+                queue.fail(task['id'], worker_id, "No data extracted")
+        except Exception as e:
+            print(f"Error processing {task['filename']}: {str(e)}\n{traceback.format_exc()}")
+            queue.fail(task['id'], worker_id, str(e))
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume PDF extraction tasks from a work queue.")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="Path to the queue database")
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT,
+                        help="Seconds before an unrenewed lease expires")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    try:
+        run_worker(WorkQueue(args.queue), worker_id, args.visibility_timeout, args.poll_interval, args.once)
+    except KeyboardInterrupt:
+        print(f"Worker {worker_id} stopped")
+
+if __name__ == "__main__":
+    main()
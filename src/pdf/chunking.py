@@ -0,0 +1,152 @@
+"""Page-window chunking for oversized PDFs in the PDF Parser application.
+
+Statements with more pages or bytes than one request should carry are split
+into consecutive page windows, each window is extracted on its own, and the
+partial results are merged back into one bill with deterministic rules:
+
+- Instances of a field (FIELD, FIELD_2, ...) are concatenated in page order
+  and renumbered. A value already seen in an earlier window (an account
+  number or date printed on every page) is kept only once.
+- The first stated FIELD_Total in page order wins.
+- FIELD_CalcTotal is recomputed from the merged instances, and dropped when
+  a stated total exists.
+"""
+
+import os
+import re
+
+from src.pdf.documents import InputDocument
+from src.pdf.validation import to_number
+
+# Limits above which a document is split into page windows
+WINDOW_MAX_PAGES = 20
+WINDOW_MAX_BYTES = 16 * 1024 * 1024   # base64 inflates this to ~21 MB, under the 32 MB request limit
+
+# Number of windows extracted at the same time per document
+MAX_CONCURRENT_WINDOWS = 4
+
+# Instance (_2), stated total (_Total) and calculated total (_CalcTotal) suffixes
+SUFFIX_PATTERN = re.compile(r"^(.+?)_(?:(\d+)|(Total)|(CalcTotal))$")
+
+def plan_page_windows(page_count, size_bytes, max_pages=WINDOW_MAX_PAGES, max_bytes=WINDOW_MAX_BYTES):
+    """Divide a document's pages into windows that fit the per-request limits.
+
+    Bytes are assumed to be spread evenly over the pages.
+
+    Args:
+        page_count: Number of pages in the document
+        size_bytes: Size of the document in bytes
+        max_pages: Maximum pages per window
+        max_bytes: Maximum estimated bytes per window
+
+    Returns:
+        list of (first_page, last_page) zero-based inclusive ranges
+    """
+    pages_per_window = max_pages
+    if size_bytes > max_bytes:
+        pages_per_window = min(pages_per_window, max(1, int(page_count * max_bytes / size_bytes)))
+    return [(start, min(start + pages_per_window, page_count) - 1)
+            for start in range(0, page_count, pages_per_window)]
+
+def extract_page_window(pdf_bytes, first_page, last_page):
+    """Copy a range of pages into a new PDF held in memory.
+
+    Returns:
+        bytes: The window PDF
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as source, fitz.open() as window:
+        window.insert_pdf(source, from_page=first_page, to_page=last_page)
+        return window.tobytes(garbage=3, deflate=True)
+
+def split_into_windows(document, max_pages=WINDOW_MAX_PAGES, max_bytes=WINDOW_MAX_BYTES):
+    """Split an oversized document into in-memory page-window documents.
+
+    The size and the (cached) page count are checked first, so documents
+    within the limits, the usual case, are never read or opened here.
+
+    Args:
+        document: The InputDocument to check
+        max_pages: Maximum pages per window
+        max_bytes: Maximum estimated bytes per window
+
+    Returns:
+        list of InputDocuments in page order, or None if the document fits in one request
+    """
+    if document.size <= max_bytes and document.page_count() <= max_pages:
+        return None
+
+    pdf_bytes = document.getvalue()
+    windows = plan_page_windows(document.page_count(), len(pdf_bytes), max_pages, max_bytes)
+    if len(windows) <= 1:
+        return None
+
+    stem = os.path.splitext(document.name)[0]
+    return [
+        InputDocument.from_bytes(f"{stem}_pages_{first + 1}-{last + 1}.pdf",
+                                 extract_page_window(pdf_bytes, first, last))
+        for first, last in windows
+    ]
+
+def split_field_key(key):
+    """Split a result key into its base field and suffix.
+
+    Returns:
+        (base, suffix) where suffix is an instance number (1 for the plain
+        name), 'Total' or 'CalcTotal'
+    """
+    match = SUFFIX_PATTERN.match(key)
+    if not match:
+        return key, 1
+    base, number, total, calc_total = match.groups()
+    if number:
+        return base, int(number)
+    return base, total or calc_total
+
+def merge_window_results(results):
+    """Merge the partial results of a document's page windows.
+
+    Args:
+        results: Extracted data per window, in page order
+
+    Returns:
+        dict: The merged extracted data (without a filename)
+    """
+    fields = {}
+    for result in results:
+        window_instances = {}
+        for key, value in result.items():
+            if key == 'filename':
+                continue
+            base, suffix = split_field_key(key)
+            field = fields.setdefault(base, {'instances': [], 'total': None, 'calc_total': False})
+            if suffix == 'Total':
+                if field['total'] is None and value not in (None, ""):
+                    field['total'] = value
+            elif suffix == 'CalcTotal':
+                field['calc_total'] = True
+            else:
+                window_instances.setdefault(base, []).append((suffix, value))
+
+        for base, instances in window_instances.items():
+            seen = list(fields[base]['instances'])
+            for _, value in sorted(instances, key=lambda instance: instance[0]):
+                if value not in (None, "") and value not in seen:
+                    fields[base]['instances'].append(value)
+
+    merged = {}
+    for base, field in fields.items():
+        instances = field['instances']
+        for number, value in enumerate(instances, 1):
+            merged[base if number == 1 else f"{base}_{number}"] = value
+        if field['total'] is not None:
+            merged[f"{base}_Total"] = field['total']
+        elif field['calc_total']:
+            numbers = [to_number(value) for value in instances]
+            numbers = [number for number in numbers if number is not None]
+            merged[f"{base}_CalcTotal"] = round(sum(numbers), 2) if numbers else None
+        elif not instances:
+            # Looked for in every window and not found
+            merged[base] = None
+    return merged
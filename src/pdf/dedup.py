@@ -0,0 +1,108 @@
+"""Page-level deduplication for the PDF Parser application.
+
+Pages are first compared by perceptual hash. A hash only captures a page's
+layout, so two bills with the same layout but different figures can hash
+within a few bits of each other; a hash match is therefore confirmed on a
+grayscale thumbnail before a page is skipped. The similarity threshold sets
+both how close the hashes must be and how many thumbnail pixels may differ,
+so 1.0 skips only exact repeats and lower values also skip near-identical
+pages (scan noise, re-rendered pages).
+"""
+
+import zlib
+from PIL import Image, ImageChops
+
+# Side length of the difference hash grid (a 256-bit hash); it finds candidate
+# duplicates but can't tell apart pages that differ only in their numbers
+HASH_SIZE = 16
+
+# Width of the thumbnail a hash match is confirmed on
+CONFIRM_WIDTH = 480
+
+# Gray-level difference above which a thumbnail pixel counts as changed
+PIXEL_TOLERANCE = 24
+
+# Share of thumbnail pixels allowed to change per unit of dissimilarity: a 0.99 threshold
+# allows 0.1% of the pixels to change, 0.90 allows 1%; a changed figure takes about 0.01%
+CHANGED_SHARE_PER_DISSIMILARITY = 0.1
+
+def difference_hash(image, hash_size=HASH_SIZE):
+    """Compute a perceptual difference hash (dHash) of an image.
+
+    Args:
+        image: PIL Image of the page
+        hash_size: Side length of the hash grid
+
+    Returns:
+        int: Hash with hash_size * hash_size bits
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def confirm_thumbnail(image):
+    """Get the grayscale thumbnail a hash match is confirmed on."""
+    height = max(1, round(image.height * CONFIRM_WIDTH / image.width))
+    return image.convert('L').resize((CONFIRM_WIDTH, height), Image.LANCZOS)
+
+def count_changed_pixels(thumbnail, other):
+    """Count the pixels that differ between two thumbnails, or None if their shapes differ."""
+    if thumbnail.size != other.size:
+        return None
+    changed = ImageChops.difference(thumbnail, other).point(lambda value: 255 if value > PIXEL_TOLERANCE else 0)
+    return changed.histogram()[255]
+
+class PageDeduplicator:
+    """Track page hashes across a batch and flag repeated pages.
+
+    A page is a duplicate when its hash matches a page already kept, either
+    earlier in the same file or in another file of the batch, with at least
+    the configured similarity (fraction of equal hash bits), and at most
+    the share of thumbnail pixels that similarity allows has changed (none
+    at 1.0). Kept pages' thumbnails are stored compressed, since they are
+    only needed on a hash match.
+    """
+
+    def __init__(self, similarity=1.0, hash_size=HASH_SIZE):
+        self.hash_size = hash_size
+        self.max_distance = int((1 - similarity) * hash_size * hash_size)
+        self.max_changed_share = max(0.0, 1 - similarity) * CHANGED_SHARE_PER_DISSIMILARITY
+        self.seen = []
+        self.skipped = []
+
+    def is_duplicate(self, image, filename, page_num):
+        """Check a page against those already seen, remembering it if new.
+
+        Args:
+            image: PIL Image of the rendered page
+            filename: Name of the file the page belongs to
+            page_num: 1-based page number within the file
+
+        Returns:
+            bool: True if the page should be skipped
+        """
+        page_hash = difference_hash(image, self.hash_size)
+        thumbnail = None
+        for seen_hash, seen_thumbnail, seen_filename, seen_page in self.seen:
+            if bin(page_hash ^ seen_hash).count('1') > self.max_distance:
+                continue
+            if thumbnail is None:
+                thumbnail = confirm_thumbnail(image)
+            seen_image = Image.frombytes('L', seen_thumbnail[0], zlib.decompress(seen_thumbnail[1]))
+            changed = count_changed_pixels(thumbnail, seen_image)
+            if changed is not None and changed <= self.max_changed_share * thumbnail.width * thumbnail.height:
+                self.skipped.append({
+                    'filename': filename,
+                    'page': page_num,
+                    'duplicate_of': f"{seen_filename} page {seen_page}"
+                })
+                return True
+        if thumbnail is None:
+            thumbnail = confirm_thumbnail(image)
+        self.seen.append((page_hash, (thumbnail.size, zlib.compress(thumbnail.tobytes())), filename, page_num))
+        return False
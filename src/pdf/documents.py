@@ -0,0 +1,122 @@
+"""Input document handles for the PDF Parser application."""
+
+import hashlib
+import io
+import os
+
+# Default chunk size for streaming reads (1 MB)
+CHUNK_SIZE = 1024 * 1024
+
+class InputDocument:
+    """A PDF queued for processing whose bytes are loaded only on demand.
+
+    Documents are backed either by a Streamlit upload (already in memory) or
+    by a file on disk, such as a split PDF. Disk-backed documents hold only
+    their path, so queues of any length cost no memory until a worker reads
+    them.
+    """
+
+    def __init__(self, name, path=None, upload=None):
+        if (path is None) == (upload is None):
+            raise ValueError("InputDocument needs exactly one of path or upload")
+        self.name = name
+        self.path = path
+        self._upload = upload
+        self._page_count = None
+
+    @classmethod
+    def from_upload(cls, uploaded_file):
+        """Wrap a Streamlit UploadedFile."""
+        return cls(uploaded_file.name, upload=uploaded_file)
+
+    @classmethod
+    def from_path(cls, path, name=None):
+        """Reference a PDF on disk without reading it."""
+        return cls(name or os.path.basename(path), path=path)
+
+    @classmethod
+    def from_bytes(cls, name, content):
+        """Wrap PDF content already in memory, such as a queued task's payload."""
+        upload = io.BytesIO(content)
+        upload.size = len(content)
+        return cls(name, upload=upload)
+
+    @property
+    def size(self):
+        """Size of the document in bytes, without loading it."""
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        return self._upload.size
+
+    def page_count(self):
+        """Get the number of pages, opening the PDF only the first time.
+
+        Disk-backed documents are opened from their path, so PyMuPDF reads
+        only the parts of the file it needs rather than the whole content.
+
+        Returns:
+            int: Total number of pages
+        """
+        if self._page_count is None:
+            import fitz  # PyMuPDF
+
+            if self.path is not None:
+                pdf_document = fitz.open(self.path, filetype="pdf")
+            else:
+                pdf_document = fitz.open(stream=self._upload.getvalue(), filetype="pdf")
+            with pdf_document:
+                self._page_count = len(pdf_document)
+        return self._page_count
+
+    def exists(self):
+        """Check whether the underlying content is still available."""
+        return self.path is None or os.path.exists(self.path)
+
+    def open(self):
+        """Open a binary stream over the document content.
+
+        Returns:
+            A readable binary file object; callers should close it
+        """
+        if self.path is not None:
+            return open(self.path, "rb")
+        return io.BytesIO(self._upload.getvalue())
+
+    def getvalue(self):
+        """Read the full document content.
+
+        The content is not cached, so memory is released as soon as the
+        caller drops the returned bytes.
+
+        Returns:
+            bytes: The PDF content
+        """
+        with self.open() as stream:
+            return stream.read()
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Stream the document content in fixed-size chunks.
+
+        Args:
+            chunk_size: Maximum number of bytes per chunk
+
+        Yields:
+            bytes: Consecutive chunks of the PDF content
+        """
+        with self.open() as stream:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def content_hash(self):
+        """Get the SHA-256 hex digest of the content, read in chunks."""
+        digest = hashlib.sha256()
+        for chunk in self.iter_chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def __repr__(self):
+        source = self.path if self.path is not None else "upload"
+        return f"InputDocument({self.name!r}, {source!r})"
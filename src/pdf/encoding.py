@@ -0,0 +1,133 @@
+"""Content-adaptive page image encoding for the PDF Parser application."""
+
+import io
+import math
+from PIL import Image, ImageChops, ImageStat, features
+
+# Minimum PSNR (dB) a lossy or palette candidate must reach against the page
+DEFAULT_QUALITY_FLOOR = 32.0
+
+# Pages are analysed on a downscaled copy of at most this many pixels per side
+ANALYSIS_SIZE = 512
+
+# Mean per-channel deviation from gray (0-255) below which a page counts as grayscale
+GRAYSCALE_TOLERANCE = 2.0
+
+MEDIA_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp'
+}
+
+def is_grayscale(image):
+    """Check whether a page carries (almost) no color information."""
+    if image.mode == 'L':
+        return True
+    small = image.copy()
+    small.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    gray = small.convert('L').convert('RGB')
+    deviation = ImageStat.Stat(ImageChops.difference(small, gray)).mean
+    return max(deviation) <= GRAYSCALE_TOLERANCE
+
+def count_colors(image, max_colors=256):
+    """Count distinct colors on a downscaled copy, or None if above max_colors."""
+    small = image.copy()
+    small.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.NEAREST)
+    colors = small.getcolors(maxcolors=max_colors)
+    return len(colors) if colors is not None else None
+
+def psnr(reference, candidate_bytes):
+    """Peak signal-to-noise ratio (dB) of an encoded candidate against the reference."""
+    decoded = Image.open(io.BytesIO(candidate_bytes)).convert(reference.mode)
+    rms = ImageStat.Stat(ImageChops.difference(reference, decoded)).rms
+    error = math.sqrt(sum(r * r for r in rms) / len(rms))
+    if error == 0:
+        return float('inf')
+    return 20 * math.log10(255 / error)
+
+def _encode(image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+def encode_pixmap(pix, use_png=False, quality=85):
+    """Encode a PyMuPDF pixmap directly as PNG or JPEG, without copying it into Pillow.
+
+    Returns:
+        (bytes, media_type)
+    """
+    if use_png:
+        return pix.tobytes("png"), MEDIA_TYPES['PNG']
+    return pix.tobytes("jpeg", jpg_quality=quality), MEDIA_TYPES['JPEG']
+
+def encode_adaptive(image, quality_floor=DEFAULT_QUALITY_FLOOR):
+    """Encode a page with the smallest candidate format that meets the quality floor.
+
+    Grayscale pages are encoded single-channel, and pages with few colors
+    also try a palette PNG. Lossless candidates always meet the floor; lossy
+    and palette candidates are checked by PSNR against the page.
+
+    Args:
+        image: RGB or grayscale (L) PIL Image of the page
+        quality_floor: Minimum PSNR (dB) for lossy or palette candidates
+
+    Returns:
+        (bytes, media_type, info) where info describes the chosen encoding and
+        the size of the classic RGB JPEG for comparison
+    """
+    grayscale = is_grayscale(image)
+    base = image.convert('L') if grayscale else image
+    mode = 'L' if grayscale else 'RGB'
+
+    # (label, data, lossless)
+    candidates = [
+        (f"PNG {mode}", _encode(base, 'PNG', optimize=True), True),
+        (f"JPEG {mode}", _encode(base, 'JPEG', quality=85), False)
+    ]
+    baseline_jpeg = candidates[1][1] if not grayscale else _encode(image.convert('RGB'), 'JPEG', quality=85)
+
+    num_colors = count_colors(base)
+    if num_colors is not None:
+        # Palette size rounded up to a power of two, at least 2 bits
+        palette_size = max(4, 2 ** math.ceil(math.log2(max(num_colors, 2))))
+        palette = base.convert('RGB').quantize(colors=palette_size)
+        candidates.append((f"PNG P{palette_size}", _encode(palette, 'PNG', optimize=True), False))
+
+    if features.check('webp'):
+        # WebP has no single-channel mode, so grayscale pages are encoded as RGB too
+        candidates.append(("WEBP RGB", _encode(base.convert('RGB'), 'WEBP', quality=80), False))
+
+    # Try smallest first and keep the first one that meets the floor
+    chosen = None
+    for label, data, lossless in sorted(candidates, key=lambda c: len(c[1])):
+        if lossless or psnr(base, data) >= quality_floor:
+            chosen = (label, data)
+            break
+
+    label, data = chosen
+    info = {
+        'encoding': label,
+        'bytes': len(data),
+        'baseline_bytes': len(baseline_jpeg)
+    }
+    return data, MEDIA_TYPES[label.split(' ')[0]], info
+
+def shrink_to_fit(image, max_bytes, quality=85):
+    """Downscale a page until its JPEG encoding fits within a byte limit.
+
+    Args:
+        image: PIL Image of the page
+        max_bytes: Maximum encoded size
+        quality: JPEG quality to encode with
+
+    Returns:
+        (bytes, media_type)
+    """
+    scaled = image if image.mode == 'L' else image.convert('RGB')
+    data = _encode(scaled, 'JPEG', quality=quality)
+    while len(data) > max_bytes and min(scaled.size) > 1:
+        # Bytes scale roughly with area, so shrink each side by the square root of the overshoot
+        factor = max(0.5, min(0.9, math.sqrt(max_bytes / len(data))))
+        scaled = scaled.resize((max(1, int(scaled.width * factor)), max(1, int(scaled.height * factor))), Image.LANCZOS)
+        data = _encode(scaled, 'JPEG', quality=quality)
+    return data, MEDIA_TYPES['JPEG']
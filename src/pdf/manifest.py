@@ -0,0 +1,188 @@
+"""Manifest-driven bulk splitting for the PDF Parser application.
+
+A split manifest maps source PDFs to named page ranges, one row per output
+PDF, such as the index files vendors ship with combined statements. CSV
+manifests need source, name and pages columns:
+
+    source,name,pages
+    statement_2024_05.pdf,Account 1001,1-3
+    statement_2024_05.pdf,Account 1002,"4-5, 9"
+
+JSON manifests hold the same rows as a list of objects, or map each source
+to its groups:
+
+    {"statement_2024_05.pdf": {"Account 1001": "1-3", "Account 1002": [[4, 5], [9, 9]]}}
+
+Every row is validated before anything is split, and sources are then split
+in parallel worker processes.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.pdf.documents import InputDocument
+from src.pdf.splitter import get_split_filename, split_pdf, validate_page_ranges
+
+# Columns every manifest row must have
+MANIFEST_COLUMNS = ('source', 'name', 'pages')
+
+# Number of sources split at the same time
+MAX_SPLIT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Separators between the ranges of a page specification ("1-3, 5; 7")
+RANGE_SEPARATOR = re.compile(r"[,;]")
+
+def parse_page_spec(pages):
+    """Parse a manifest page specification into (start, end) ranges.
+
+    Bounds are left as given, so validate_page_ranges reports anything that
+    isn't a page number.
+
+    Args:
+        pages: A string such as "1-3, 5", or a list of pages, "a-b" strings
+               or [start, end] pairs
+
+    Returns:
+        list of (start, end) tuples
+    """
+    if isinstance(pages, (str, int)):
+        parts = [part.strip() for part in RANGE_SEPARATOR.split(str(pages)) if part.strip()]
+    else:
+        parts = pages
+
+    ranges = []
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            # [start, end], or [page]
+            ranges.append((str(part[0]), str(part[-1])) if part else ("", ""))
+        elif "-" in str(part):
+            start, end = str(part).split("-", 1)
+            ranges.append((start.strip(), end.strip()))
+        else:
+            ranges.append((str(part).strip(), str(part).strip()))
+    return ranges
+
+def load_manifest(content, filename):
+    """Read the rows of a CSV or JSON split manifest.
+
+    Args:
+        content: Raw bytes of the manifest
+        filename: Manifest filename; a .json extension selects JSON, anything else CSV
+
+    Returns:
+        list of dicts with source, name and ranges keys, in manifest order
+
+    Raises:
+        ValueError: If the manifest can't be read or lacks the required columns
+    """
+    text = content.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Manifest is not valid JSON: {str(e)}")
+        if isinstance(data, dict):
+            rows = [{'source': source, 'name': name, 'pages': pages}
+                    for source, groups in data.items() for name, pages in groups.items()]
+        else:
+            rows = data
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        fieldnames = [column.strip().lower() for column in reader.fieldnames or []]
+        missing = [column for column in MANIFEST_COLUMNS if column not in fieldnames]
+        if missing:
+            raise ValueError(f"Manifest is missing the column{'s' if len(missing) > 1 else ''} {', '.join(missing)}")
+        rows = [{key.strip().lower(): value for key, value in row.items() if key} for row in reader]
+
+    manifest = []
+    for row in rows:
+        if not isinstance(row, dict) or any(not row.get(column) for column in MANIFEST_COLUMNS):
+            raise ValueError(f"Manifest row {len(manifest) + 1} needs a source, name and pages")
+        manifest.append({
+            'source': os.path.basename(str(row['source']).strip()),
+            'name': str(row['name']).strip(),
+            'ranges': parse_page_spec(row['pages'])
+        })
+    return manifest
+
+def validate_manifest(manifest, page_counts):
+    """Validate every manifest row against its source before anything is split.
+
+    Args:
+        manifest: Rows from load_manifest
+        page_counts: Page count per available source filename
+
+    Returns:
+        (jobs, error_messages) where jobs maps each source to its
+        (group_name, valid_ranges) list; jobs should only be run when
+        there are no errors
+    """
+    jobs = {}
+    error_messages = []
+    output_names = set()
+
+    for row_number, row in enumerate(manifest, 1):
+        if row['source'] not in page_counts:
+            error_messages.append(f"Row {row_number}: source {row['source']} is not available")
+            continue
+        valid_ranges, errors = validate_page_ranges(row['ranges'], page_counts[row['source']])
+        error_messages.extend(f"Row {row_number} ({row['name']}): {error}" for error in errors)
+        if errors:
+            continue
+
+        output_name = get_split_filename(row['source'], row['name'], valid_ranges)
+        if output_name in output_names:
+            error_messages.append(f"Row {row_number} ({row['name']}): duplicates an earlier row's output {output_name}")
+            continue
+        output_names.add(output_name)
+        jobs.setdefault(row['source'], []).append((row['name'], valid_ranges))
+
+    return jobs, error_messages
+
+def split_source(source_name, content, group_ranges, output_dir, max_image_dpi=None):
+    """Split one manifest source; runs in a worker process.
+
+    Args:
+        source_name: Filename of the source PDF
+        content: The source PDF content
+
+    Returns:
+        List of created PDF filenames
+    """
+    return split_pdf(InputDocument.from_bytes(source_name, content), group_ranges, output_dir, max_image_dpi)
+
+def run_manifest_splits(jobs, sources, output_dir=None, max_image_dpi=None, max_workers=MAX_SPLIT_WORKERS):
+    """Split the manifest's sources in parallel worker processes.
+
+    Results are yielded as soon as each source is done, so callers can queue
+    its outputs while the others are still being split.
+
+    Args:
+        jobs: Groups per source, from validate_manifest
+        sources: InputDocument per source filename, such as the uploaded sources
+        output_dir: Directory to save split PDFs (defaults to current directory)
+        max_image_dpi: Downsample embedded images shown above this resolution to it; None to keep them
+        max_workers: Number of worker processes
+
+    Yields:
+        (source_name, created_filenames, error) where error is None on success
+    """
+    if output_dir is None:
+        output_dir = os.getcwd()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(split_source, source_name,
+                            sources[source_name].getvalue(),
+                            group_ranges, output_dir, max_image_dpi): source_name
+            for source_name, group_ranges in jobs.items()
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], [], str(e)
@@ -2,61 +2,113 @@
 
 import base64
 import json
-import io
-import pandas as pd
-import streamlit as st
-from anthropic import Anthropic
-import fitz  # PyMuPDF
-from PIL import Image
-import os
-import cv2
-import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
+from anthropic import BadRequestError, NotFoundError
 
 from src.config.examples import CALCULATIONS_EXAMPLES, SIMPLE_EXAMPLES
+from src.config.models import DEFAULT_MODEL, MODEL_TIERS
+from src.pdf.chunking import MAX_CONCURRENT_WINDOWS, merge_window_results, split_into_windows
+from src.pdf.prompts import build_packed_tool
+from src.pdf.regions import REGIONS_INSTRUCTIONS
+from src.pdf.slimming import slim_input_document
+from src.pdf.validation import get_field_values, validate_extraction
 from src.utils.api_utils import log_api_call
+from src.utils.clients import get_anthropic_client
+from src.utils.json_repair import parse_json_response
+from src.utils.memory import track_peak_memory
+from src.utils.run_state import bind_run_state, get_run_state, report_message
+from src.utils.file_registry import FILES_API_BETA, get_file_registry
 
-def optimize_image_for_processing(pil_image):
-    """Optimize a PIL Image for better OCR processing.
+# Limits for packing several small bills into one request
+PACK_MAX_BILL_PAGES = 2         # only bills with at most this many pages are packed
+PACK_MAX_PAGES = 10             # total pages per packed request
+PACK_MAX_BILLS = 8              # bills per packed request (bounds the output size)
+PACK_MAX_INPUT_TOKENS = 40000   # estimated bill content tokens per packed request
+ESTIMATED_TOKENS_PER_PAGE = 2000
+
+PACKED_BILLS_INSTRUCTIONS = """The content above contains {count} separate utility bills. Each bill is introduced by a "Bill key:" label, followed by its content.
+
+Apply all of the instructions above to each bill independently. Instead of a single JSON object, return ONLY a JSON array with one object per bill, in the order the bills appear. Each object must contain a "bill_key" entry with that bill's key alongside its extracted fields, for example:
+[
+  {{"bill_key": "bill_1", ...}},
+  {{"bill_key": "bill_2", ...}}
+]"""
+
+PACKED_TOOL_INSTRUCTIONS = """The content above contains {count} separate utility bills. Each bill is introduced by a "Bill key:" label, followed by its content.
+
+Apply all of the instructions above to each bill independently, and record every bill as one entry of the "bills" array in a single tool call, with its key in "bill_key"."""
+
+# Follow-up prompt asking only for fields missing from the first response
+MISSING_FIELDS_PROMPT = """Extract only the following fields from this utility bill:
+{fields}
+
+Use the same suffix rules as before: plain field name for the first tier/instance/charge, "_2", "_3" for additional ones, "_Total" for a stated total and "_CalcTotal" for a calculated one. Use null for fields not found in the bill. Return each amount as a plain number.
+
+Provide ONLY the JSON object as your final output, with no additional text."""
+
+# Output token limit for missing-field follow-up requests
+MISSING_FIELDS_MAX_TOKENS = 2048
+
+# Per-request image limits for vision mode
+MAX_IMAGES_PER_REQUEST = 100
+MAX_IMAGE_BYTES = 5 * 1024 * 1024           # per encoded image
+MAX_REQUEST_IMAGE_BYTES = 20 * 1024 * 1024  # all images of one request, before base64
+
+# Stages reported by capture_page_stages, in pipeline order; only scans report gray, binary and contours
+PAGE_STAGES = ('original', 'gray', 'binary', 'contours', 'sent')
+
+def find_content_crop(pixels, stage_hook=None):
+    """Locate the content area of a page, excluding excess whitespace.
+    
+    Works directly on an RGB array, which may be a read-only view of a
+    pixmap's buffer; only single-channel intermediates are allocated.
     
     Args:
-        pil_image: PIL Image to optimize
-        
+        pixels: H x W x 3 uint8 RGB array
+        stage_hook: Optional callable receiving the 'gray', 'binary' and 'contours' stages
+    
     Returns:
-        PIL Image: Optimized image with content centered and excess whitespace removed,
-                  preserving original DPI
+        (x_min, y_min, x_max, y_max) in pixels, including padding, or None if no content was found
     """
-    # Store original DPI information
-    original_dpi = pil_image.info.get('dpi')
-    
-    # Convert PIL to OpenCV format
-    cv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+    import cv2
+    import numpy as np
     
     # Convert to grayscale
-    gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+    gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+    if stage_hook:
+        stage_hook('gray', gray)
     
     # Apply Gaussian blur to reduce noise
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    del gray
     
     # Get binary image with more aggressive thresholding
     binary = cv2.adaptiveThreshold(
         blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 21, 15
     )
+    del blurred
     
-    # Remove noise with morphological operations
+    # Remove noise with morphological operations, in place
     kernel = np.ones((3,3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, dst=binary)
+    cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, dst=binary)
+    if stage_hook:
+        stage_hook('binary', binary)
     
     # Find contours of content areas
     contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    del binary
     
     # Filter out very small contours (noise)
-    min_contour_area = cv_image.shape[0] * cv_image.shape[1] * 0.0005  # 0.05% of image area
+    height, width = pixels.shape[:2]
+    min_contour_area = height * width * 0.0005  # 0.05% of image area
     contours = [cnt for cnt in contours if cv2.contourArea(cnt) > min_contour_area]
     
     if not contours:
-        # If no contours found, return original image
-        return pil_image
+        if stage_hook:
+            stage_hook('contours', cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR))
+        return None
     
     # Find the bounding box that contains all content
     x_min, y_min, x_max, y_max = float('inf'), float('inf'), 0, 0
@@ -69,149 +121,334 @@ def optimize_image_for_processing(pil_image):
         y_max = max(y_max, y + h)
     
     # Add smaller padding (1% of image size)
-    padding_x = int(cv_image.shape[1] * 0.01)
-    padding_y = int(cv_image.shape[0] * 0.01)
+    padding_x = int(width * 0.01)
+    padding_y = int(height * 0.01)
     
     x_min = max(0, x_min - padding_x)
     y_min = max(0, y_min - padding_y)
-    x_max = min(cv_image.shape[1], x_max + padding_x)
-    y_max = min(cv_image.shape[0], y_max + padding_y)
+    x_max = min(width, x_max + padding_x)
+    y_max = min(height, y_max + padding_y)
+    
+    if stage_hook:
+        # Visualize detected content (red) and the final crop (green)
+        contour_viz = cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+        cv2.drawContours(contour_viz, contours, -1, (0, 0, 255), 2)
+        cv2.rectangle(contour_viz, (x_min, y_min), (x_max, y_max), (0, 255, 0), 3)
+        stage_hook('contours', contour_viz)
+    
+    return x_min, y_min, x_max, y_max
+
+def render_page_pixmaps(page, dpi=200, skip_optimization=False, region_fields=None):
+    """Render a page the way iter_page_images sends it.
+    
+    Pages where the regions of region_fields can be located become a
+    low-resolution overview plus full-resolution crops. Scans are rendered
+    whole, to be trimmed by trim_scan_pixmap. Digital pages are rendered
+    straight to their vector content bounds.
+    
+    Returns:
+        list of (part, fitz.Pixmap), where part is 'overview', 'region N', 'page' (a scan) or 'content'
+    """
+    import fitz  # PyMuPDF
+    from src.pdf.regions import OVERVIEW_DPI, find_charge_regions, render_region
+    from src.pdf.render import is_scanned_page, render_content_pixmap
+    
+    regions = find_charge_regions(page, region_fields) if region_fields else []
+    if regions:
+        # Overview for orientation, then tight crops at full resolution
+        images = [('overview', render_region(page, OVERVIEW_DPI))]
+        images += [(f"region {index}", render_region(page, dpi, rect)) for index, rect in enumerate(regions, 1)]
+        return images
+    if skip_optimization or is_scanned_page(page):
+        # Scans need raster analysis
+        return [('page', page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), alpha=False))]
+    # Digital pages: trim to the vector content bounds while rendering
+    return [('content', render_content_pixmap(page, dpi))]
+
+def trim_scan_pixmap(pix, stage_hook=None):
+    """Trim a scanned page's pixmap to its content, analysing a zero-copy view of it.
+    
+    Args:
+        pix: RGB fitz.Pixmap of the whole page
+        stage_hook: Optional callable receiving the stages of find_content_crop
+    
+    Returns:
+        fitz.Pixmap: The cropped pixmap, or pix itself if no content was found
+    """
+    import numpy as np
+    from src.pdf.render import crop_pixmap
+    
+    pixels = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    crop = find_content_crop(pixels, stage_hook)
+    del pixels
+    return pix if crop is None else crop_pixmap(pix, crop)
+
+def capture_page_stages(pdf_bytes, page_index, stage_hook, dpi=200):
+    """Run one page through the branch iter_page_images takes for it, reporting each stage.
     
-    # Crop the image to the content area
-    cropped = cv_image[y_min:y_max, x_min:x_max]
+    Used by the Debug tab, so it shows exactly what would be sent. Every page
+    reports 'original' (the whole page) and 'sent' (the image that would be
+    encoded); scans also report the 'gray', 'binary' and 'contours' stages
+    of the raster analysis.
     
-    # Convert back to PIL and restore original DPI
-    result_image = Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
-    if original_dpi:
-        result_image.info['dpi'] = original_dpi
+    Args:
+        pdf_bytes: Raw bytes of the PDF
+        page_index: Zero-based index of the page
+        stage_hook: Callable receiving (stage_name, image); images are PIL Images or OpenCV arrays
+        dpi: The DPI to render at
+    
+    Returns:
+        str: 'scan' or 'digital'
+    """
+    import fitz  # PyMuPDF
+    from src.pdf.render import pixmap_to_image
     
-    return result_image
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        page = pdf_document[page_index]
+        stage_hook('original', pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), alpha=False)))
+        
+        part, pix = render_page_pixmaps(page, dpi)[0]
+        if part == 'page':
+            pix = trim_scan_pixmap(pix, stage_hook)
+        # Gray pixmaps are shared, not copied, so detach the image from the pixmap
+        stage_hook('sent', pixmap_to_image(pix).copy())
+    return 'scan' if part == 'page' else 'digital'
 
-def convert_pdf_to_image(pdf_file, dpi=200, use_png=False, skip_optimization=False):
-    """Convert all pages of a PDF file to images with appropriate quality for Claude vision.
+def iter_page_images(pdf_file, dpi=200, use_png=False, skip_optimization=False, deduplicator=None, adaptive_encoding=False, encoding_report=None, region_fields=None, max_images=MAX_IMAGES_PER_REQUEST, max_image_bytes=MAX_IMAGE_BYTES, max_total_bytes=MAX_REQUEST_IMAGE_BYTES):
+    """Render, optimize and encode the pages of a PDF one at a time.
+    
+    Digital pages are rendered straight to their content bounds (and in
+    grayscale when they have no color) from the PDF's vector geometry; only
+    scanned pages go through raster analysis (see trim_scan_pixmap). Pages are encoded directly from the
+    pixmap unless adaptive encoding needs Pillow. Only one page's
+    intermediates are alive at any moment; each page is released before
+    the next one is rendered. Pages
+    above max_image_bytes are downscaled until they fit, and the request
+    caps on image count and total encoded bytes are enforced as pages are
+    produced rather than after the whole document has been converted.
     
     Args:
-        pdf_file: The uploaded PDF file
+        pdf_file: The PDF file or InputDocument to convert
         dpi: The DPI to use for rendering (default 200 - good balance of quality and size)
         use_png: Whether to use PNG format (higher quality) instead of JPEG
         skip_optimization: Whether to skip the image optimization step
+        deduplicator: Optional PageDeduplicator; repeated pages after the first are dropped
+        adaptive_encoding: Whether to pick the smallest adequate format per page (overrides use_png)
+        encoding_report: Optional list to append a bytes-per-page entry to for each encoded page
+        region_fields: Optional field names; pages where their regions can be located are sent
+                       as a low-resolution overview plus full-resolution crops (see src.pdf.regions)
+        max_images: Maximum number of images one request may carry
+        max_image_bytes: Maximum encoded size of a single image
+        max_total_bytes: Maximum encoded size of all images in the request
     
-    Returns:
-        list of base64 encoded image data, one per page
+    Yields:
+        (base64 image data, media type) per image: one per kept page, or an
+        overview and crops for pages with located regions
+    
+    Raises:
+        ValueError: If the document exceeds the per-request image count or byte budget
     """
-    # Save PDF temporarily
-    temp_path = os.path.join(os.getcwd(), pdf_file.name)
-    with open(temp_path, "wb") as f:
-        f.write(pdf_file.getvalue())
+    import fitz  # PyMuPDF
+    from src.pdf.encoding import encode_adaptive, encode_pixmap, shrink_to_fit
+    from src.pdf.render import pixmap_to_image
+    
+    # Open PDF from memory; writing a temp copy named after the file could
+    # overwrite (and then delete) a split PDF with the same name
+    pdf_document = fitz.open(stream=pdf_file.getvalue(), filetype="pdf")
+    images_sent = 0
+    total_bytes = 0
     
     try:
-        # Open PDF
-        pdf_document = fitz.open(temp_path)
-        images_base64 = []
-        
-        # Convert each page
         for page in pdf_document:
-            # Convert to image
-            pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
-            
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            # Each image stays a pixmap until it is encoded; no Pillow or NumPy copy of the page is made
+            images = render_page_pixmaps(page, dpi, skip_optimization, region_fields)
             
-            # Optimize the image only if not skipped
-            if not skip_optimization:
-                try:
-                    img = optimize_image_for_processing(img)
-                except Exception as e:
-                    st.warning(f"Image optimization failed, using original image: {str(e)}")
+            # Drop boilerplate pages already seen in this batch (the first page is always kept)
+            if deduplicator and page.number > 0 and deduplicator.is_duplicate(pixmap_to_image(images[0][1]), pdf_file.name, page.number + 1):
+                continue
             
-            # Save to bytes
-            img_byte_arr = io.BytesIO()
-            if use_png:
-                img.save(img_byte_arr, format='PNG')
-                media_type = 'image/png'
-            else:
-                img.save(img_byte_arr, format='JPEG', quality=85)
-                media_type = 'image/jpeg'
-            img_byte_arr = img_byte_arr.getvalue()
-            
-            # Encode to base64
-            img_base64 = base64.b64encode(img_byte_arr).decode('utf-8')
-            images_base64.append((img_base64, media_type))
-            
-        return images_base64
-        
+            while images:
+                part, pix = images.pop(0)
+                if images_sent >= max_images:
+                    raise ValueError(f"{pdf_file.name} needs more than {max_images} images to send in one request")
+                
+                # Trim scans to their content
+                if part == 'page' and not skip_optimization:
+                    try:
+                        pix = trim_scan_pixmap(pix)
+                    except Exception as e:
+                        report_message('warning', f"Image optimization failed, using original image: {str(e)}")
+                
+                # Encode straight from the pixmap unless Pillow is needed for format selection
+                if adaptive_encoding:
+                    img_byte_arr, media_type, encoding_info = encode_adaptive(pixmap_to_image(pix))
+                else:
+                    img_byte_arr, media_type = encode_pixmap(pix, use_png)
+                    encoding_info = {'encoding': media_type, 'bytes': len(img_byte_arr)}
+                if len(img_byte_arr) > max_image_bytes:
+                    img_byte_arr, media_type = shrink_to_fit(pixmap_to_image(pix), max_image_bytes)
+                    encoding_info = {**encoding_info, 'encoding': f"{media_type} (downscaled)", 'bytes': len(img_byte_arr)}
+                del pix
+                
+                total_bytes += len(img_byte_arr)
+                if total_bytes > max_total_bytes:
+                    raise ValueError(f"Page images of {pdf_file.name} exceed the {max_total_bytes // (1024 * 1024)} MB request budget")
+                if encoding_report is not None:
+                    encoding_report.append({'filename': pdf_file.name, 'page': page.number + 1, 'part': part, **encoding_info})
+                
+                images_sent += 1
+                # ASCII decoding of base64 output is a straight copy, with no character validation
+                yield base64.b64encode(img_byte_arr).decode('ascii'), media_type
+    
     finally:
-        # Clean up
-        if 'pdf_document' in locals():
-            pdf_document.close()
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        # Clean up, also when the consumer stops early
+        pdf_document.close()
+
+def get_processing_client(use_vision=False, use_files_api=False):
+    """Get the shared client with the beta headers a processing run needs.
+    
+    Args:
+        use_vision: Whether PDFs are sent as images
+        use_files_api: Whether PDFs are referenced through the Files API
+    
+    Returns:
+        Anthropic: The shared client
+    """
+    betas = []
+    if not use_vision:
+        betas.append("pdfs-2024-09-25")
+        if use_files_api:
+            betas.append(FILES_API_BETA)
+    return get_anthropic_client(betas)
 
-def process_pdf_files(uploaded_files, split_files, prompt, include_calculations, status_container=None, progress_bar=None, total_files=None, use_vision=False, use_png=False):
+def process_pdf_files(documents, prompt, include_calculations, progress_callback=None, cancel_event=None, use_vision=False, use_png=False, use_files_api=False, dedup_similarity=None, adaptive_encoding=False, pack_small_bills=False, use_model_routing=False, required_fields=None, field_names=None, extraction_tool=None, template_name=None, crop_regions=False, slim_pdfs=False, max_image_dpi=None):
     """Process PDF files through the Claude API.
     
     Args:
-        uploaded_files: List of uploaded PDF files
-        split_files: List of tuples (file_type, file_name, file_content) for split PDFs
+        documents: List of InputDocuments; content is read only when each one is processed
         prompt: The prompt to send to Claude
         include_calculations: Whether to include calculations in the output
-        status_container: Streamlit container for status messages
-        progress_bar: Streamlit progress bar
-        total_files: Total number of files to process
+        progress_callback: Optional callable receiving (files_processed, total_files)
+        cancel_event: Optional threading.Event; when set, no further files are started
         use_vision: Whether to process PDFs as images
         use_png: Whether to use PNG format for images
+        use_files_api: Whether to upload PDFs once via the Files API and reference them by ID
+        dedup_similarity: In vision mode, skip pages at least this similar (0-1) to a page
+                          already sent in the batch; None disables deduplication
+        adaptive_encoding: Whether to choose the smallest adequate image encoding per page
+        pack_small_bills: Whether to send several small bills per request (see plan_request_packs)
+        use_model_routing: Whether to try the fast model first and escalate bills that fail validation
+        required_fields: Field names that must be non-null for a result to pass validation
+        field_names: Requested field names; fields missing from a response are re-asked
+        extraction_tool: Optional tool definition for structured output (see build_extraction_tool)
+        template_name: Template the fields came from; when given, each result is appended
+                       to the persistent results store as it completes
+        crop_regions: In vision mode, send crops of the regions holding the fields plus a
+                      low-resolution overview instead of full pages where they can be located
+        slim_pdfs: In document mode, send slimmed copies of the PDFs (see src.pdf.slimming);
+                   results are still stored under the original file's hash
+        max_image_dpi: When slimming, downsample embedded images shown above this resolution
     
     Returns:
         DataFrame containing the extracted data
     """
+    import pandas as pd
+    
     individual_results = []
     api_logs = []
     files_processed = 0
+    deduplicator = None
+    if use_vision and dedup_similarity:
+        from src.pdf.dedup import PageDeduplicator
+        deduplicator = PageDeduplicator(dedup_similarity)
+    encoding_report = []
+    slimming_report = []
 
-    # Create the client with custom headers
-    pdf_client = Anthropic(
-        api_key=st.secrets["ANTHROPIC_API_KEY"],
-        default_headers={"anthropic-beta": "pdfs-2024-09-25"} if not use_vision else {}
-    )
+    pdf_client = get_processing_client(use_vision, use_files_api)
+    region_fields = field_names if use_vision and crop_regions else None
+
+    total_files = len(documents)
 
     def update_progress():
-        if progress_bar and total_files:
-            progress_bar.progress(files_processed / total_files)
-        if status_container:
-            status_container.markdown(f"Processing files ({files_processed} out of {total_files})...")
+        if progress_callback:
+            progress_callback(files_processed, total_files)
 
-    # Process regular uploaded files
-    for pdf_file in uploaded_files:
-        try:
-            result = process_single_pdf(pdf_client, pdf_file, prompt, include_calculations, use_vision, use_png)
-            if result:
-                individual_results.append(result)
-            files_processed += 1
-            update_progress()
-        except Exception as e:
-            handle_processing_error(pdf_file, e, api_logs)
-            files_processed += 1
-            update_progress()
+    def get_payload(document):
+        # Vision mode renders pages itself, so only documents sent as PDFs are slimmed
+        if slim_pdfs and not use_vision:
+            return slim_input_document(document, max_image_dpi, slimming_report)
+        return document
 
-    # Process split PDFs
-    for file_type, file_name, file_content in split_files:
+    def process_document(document, page_deduplicator, first_tier=0, payload=None):
+        nonlocal files_processed
         try:
-            # Create a temporary BytesIO object to simulate a file upload
-            temp_file = io.BytesIO(file_content)
-            temp_file.name = file_name
-            
-            result = process_single_pdf(pdf_client, temp_file, prompt, include_calculations, use_vision, use_png)
+            payload = payload or get_payload(document)
+            if use_model_routing:
+                result = process_with_routing(pdf_client, payload, prompt, include_calculations, required_fields, first_tier, use_vision, use_png, use_files_api, page_deduplicator, adaptive_encoding, encoding_report, field_names, extraction_tool, region_fields)
+            else:
+                result = process_single_pdf(pdf_client, payload, prompt, include_calculations, use_vision, use_png, use_files_api, page_deduplicator, adaptive_encoding, encoding_report, field_names=field_names, extraction_tool=extraction_tool, region_fields=region_fields)
             if result:
                 individual_results.append(result)
-            files_processed += 1
-            update_progress()
+                if template_name:
+                    store_result(document, result, template_name)
         except Exception as e:
-            handle_processing_error(temp_file, e, api_logs)
-            files_processed += 1
-            update_progress()
+            handle_processing_error(document, e, api_logs)
+        files_processed += 1
+        update_progress()
+
+    # Process each document, loading its content only when it is picked up
+    with track_peak_memory() as memory:
+        packs = plan_request_packs(documents) if pack_small_bills else [[document] for document in documents]
+        for pack in packs:
+            if cancel_event is not None and cancel_event.is_set():
+                report_message('info', f"Processing cancelled after {files_processed} of {total_files} files")
+                break
 
-    # Store API logs in session state
-    st.session_state.api_logs = api_logs
+            if len(pack) == 1:
+                process_document(pack[0], deduplicator)
+                continue
+
+            pack_model = MODEL_TIERS[0] if use_model_routing else DEFAULT_MODEL
+            started = time.time()
+            try:
+                payloads = [get_payload(document) for document in pack]
+                packed_results = process_packed_pdfs(pdf_client, payloads, prompt, include_calculations, use_vision, use_png, use_files_api, deduplicator, adaptive_encoding, encoding_report, pack_model, extraction_tool, region_fields)
+            except Exception as e:
+                report_message('warning', f"Packed request failed, processing {len(pack)} bills individually: {str(e)}")
+                packed_results = [None] * len(pack)
+                payloads = [None] * len(pack)
+
+            if use_model_routing:
+                # Packed entries that fail validation are escalated individually
+                for index, result in enumerate(packed_results):
+                    passed = result is not None and not validate_extraction(result, required_fields)
+                    record_tier_attempt(pack_model, passed, (time.time() - started) / len(pack))
+                    if not passed:
+                        packed_results[index] = None
+
+            for document, payload, result in zip(pack, payloads, packed_results):
+                if result is None:
+                    # Missing, malformed or failing entry: retry this bill on its own. Its pages
+                    # are already registered with the deduplicator, so don't deduplicate again
+                    process_document(document, None, first_tier=1, payload=payload)
+                else:
+                    individual_results.append(result)
+                    if template_name:
+                        store_result(document, result, template_name)
+                    files_processed += 1
+                    update_progress()
+
+    # Store API logs in session state (or the job's state in background runs)
+    run_state = get_run_state()
+    run_state['api_logs'] = api_logs
+    run_state['skipped_pages'] = deduplicator.skipped if deduplicator else []
+    run_state['image_encoding_report'] = encoding_report
+    run_state['pdf_slimming_report'] = slimming_report
+    run_state['peak_memory_mb'] = memory['peak_mb']
+    if run_state['skipped_pages']:
+        skipped_count = len(run_state['skipped_pages'])
+        report_message('info', f"Skipped {skipped_count} duplicate page{'s' if skipped_count > 1 else ''}; "
+                               f"see the Debug tab for details")
 
     # Create DataFrame from results
     if individual_results:
@@ -221,75 +458,485 @@ def process_pdf_files(uploaded_files, split_files, prompt, include_calculations,
     
     return None
 
-def process_single_pdf(client, pdf_file, prompt, include_calculations, use_vision=False, use_png=False):
+def build_document_block(client, pdf_file, use_files_api=False):
+    """Build the document content block for a PDF.
+    
+    Args:
+        client: The Anthropic client, used for Files API uploads
+        pdf_file: The PDF file to reference
+        use_files_api: Whether to reference an uploaded file ID instead of inlining base64
+    
+    Returns:
+        dict: The document content block
+    """
+    content = pdf_file.getvalue()
+    if use_files_api:
+        file_id = get_file_registry().get_or_upload(client, pdf_file.name, content)
+        source = {
+            "type": "file",
+            "file_id": file_id
+        }
+    else:
+        source = {
+            "type": "base64",
+            "media_type": "application/pdf",
+            "data": base64.b64encode(content).decode()
+        }
+    return {
+        "type": "document",
+        "source": source
+    }
+
+def build_bill_content(client, pdf_file, use_vision=False, use_png=False, use_files_api=False, deduplicator=None, adaptive_encoding=False, encoding_report=None, region_fields=None):
+    """Build the content blocks carrying one bill: its page images or its document.
+    
+    Args:
+        client: The Anthropic client, used for Files API uploads
+        pdf_file: The InputDocument to send
+        use_vision: Whether to send the PDF as page images
+        use_png: Whether to use PNG format for images
+        use_files_api: Whether to reference the PDF by Files API ID (document mode only)
+        deduplicator: Optional PageDeduplicator shared across the batch (vision mode only)
+        adaptive_encoding: Whether to choose the smallest adequate image encoding per page
+        encoding_report: Optional list collecting bytes-per-page entries (vision mode only)
+        region_fields: Optional field names whose page regions are sent as crops (vision mode only)
+    
+    Returns:
+        list of content blocks
+    """
+    if not use_vision:
+        # Regular PDF processing, either inlined or referenced by file ID
+        return [build_document_block(client, pdf_file, use_files_api)]
+    
+    # Convert PDF to images one page at a time
+    images_data = iter_page_images(pdf_file, use_png=use_png, deduplicator=deduplicator,
+                                   adaptive_encoding=adaptive_encoding, encoding_report=encoding_report,
+                                   region_fields=region_fields)
+    
+    content = [{"type": "text", "text": REGIONS_INSTRUCTIONS}] if region_fields else []
+    return content + [
+        {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": img_data
+            }
+        }
+        for img_data, media_type in images_data
+    ]
+
+def build_instruction_blocks(prompt, include_calculations):
+    """Build the examples and prompt blocks that follow the bill content."""
+    return [
+        {
+            "type": "text",
+            "text": CALCULATIONS_EXAMPLES if include_calculations else SIMPLE_EXAMPLES
+        },
+        {
+            "type": "text",
+            "text": prompt
+        }
+    ]
+
+def record_usage(message):
+    """Store usage statistics and the raw response of the last API call."""
+    run_state = get_run_state()
+    run_state['last_usage'] = {
+        'input_tokens': message.usage.input_tokens,
+        'output_tokens': message.usage.output_tokens,
+        'stop_reason': message.stop_reason
+    }
+    run_state['raw_json_response'] = message.model_dump_json()
+
+def record_tier_attempt(model, passed, seconds):
+    """Accumulate per-model validation success and latency in session state.
+    
+    Args:
+        model: The model ID that was tried
+        passed: Whether its result passed validation
+        seconds: Time taken by the attempt
+    """
+    routing_stats = get_run_state().setdefault('routing_stats', {})
+    stats = routing_stats.setdefault(model, {'attempts': 0, 'passed': 0, 'total_seconds': 0.0})
+    stats['attempts'] += 1
+    stats['passed'] += int(passed)
+    stats['total_seconds'] += seconds
+
+def store_result(document, result, template_name):
+    """Append a result to the persistent results store.
+    
+    A storage failure is reported as a warning but never fails the extraction itself.
+    
+    Args:
+        document: The InputDocument the result was extracted from
+        result: The extracted data
+        template_name: Template the fields came from
+    """
+    from src.utils.results_store import get_results_store
+    try:
+        get_results_store().append(result, document.content_hash(), template_name)
+    except Exception as e:
+        report_message('warning', f"Could not save the result for {document.name} to the history: {str(e)}")
+
+def process_with_routing(client, pdf_file, prompt, include_calculations, required_fields=None, first_tier=0, use_vision=False, use_png=False, use_files_api=False, deduplicator=None, adaptive_encoding=False, encoding_report=None, field_names=None, extraction_tool=None, region_fields=None):
+    """Process a bill with the cheapest model tier whose result passes validation.
+    
+    Each tier in MODEL_TIERS is tried in turn; a bill only escalates to the
+    next tier when the request fails or validate_extraction reports problems.
+    The last tier's result is returned even if it fails validation.
+    
+    Args:
+        client: The Anthropic client
+        pdf_file: The InputDocument to process
+        prompt: The prompt to send to Claude
+        include_calculations: Whether to include calculations
+        required_fields: Field names that must be non-null
+        first_tier: Index into MODEL_TIERS to start from
+        (remaining arguments as for process_single_pdf)
+    
+    Returns:
+        dict: The extracted data
+    """
+    for tier in range(first_tier, len(MODEL_TIERS)):
+        model = MODEL_TIERS[tier]
+        is_last_tier = tier == len(MODEL_TIERS) - 1
+        # Pages and encodings are only registered on the first attempt
+        first_attempt = tier == first_tier
+        started = time.time()
+        try:
+            result = process_single_pdf(client, pdf_file, prompt, include_calculations, use_vision, use_png, use_files_api,
+                                        deduplicator if first_attempt else None, adaptive_encoding,
+                                        encoding_report if first_attempt else None, model=model,
+                                        field_names=field_names, extraction_tool=extraction_tool,
+                                        region_fields=region_fields)
+        except Exception as e:
+            record_tier_attempt(model, False, time.time() - started)
+            if is_last_tier:
+                raise
+            report_message('info', f"{model} failed on {pdf_file.name}, escalating: {str(e)}")
+            continue
+        
+        problems = validate_extraction(result, required_fields)
+        record_tier_attempt(model, not problems, time.time() - started)
+        if not problems or is_last_tier:
+            return result
+        report_message('info', f"{model} result for {pdf_file.name} failed validation, escalating: {'; '.join(problems)}")
+
+def process_single_pdf(client, pdf_file, prompt, include_calculations, use_vision=False, use_png=False, use_files_api=False, deduplicator=None, adaptive_encoding=False, encoding_report=None, model=DEFAULT_MODEL, field_names=None, extraction_tool=None, region_fields=None):
     """Process a single PDF file through the Claude API.
     
     Args:
         client: The Anthropic client
-        pdf_file: The PDF file to process
+        pdf_file: The InputDocument to process
         prompt: The prompt to send to Claude
         include_calculations: Whether to include calculations
         use_vision: Whether to process the PDF as an image
         use_png: Whether to use PNG format for images
+        use_files_api: Whether to reference the PDF by Files API ID (document mode only)
+        deduplicator: Optional PageDeduplicator shared across the batch (vision mode only)
+        adaptive_encoding: Whether to choose the smallest adequate image encoding per page
+        encoding_report: Optional list collecting bytes-per-page entries (vision mode only)
+        model: The model ID to use
+        field_names: Requested field names; any missing from the response are re-asked
+        extraction_tool: Optional tool definition for structured output (see build_extraction_tool)
+        region_fields: Optional field names whose page regions are sent as crops (vision mode only);
+                       missing fields are re-asked with full pages
     
     Returns:
         dict: The extracted data
     """
-    if use_vision:
-        # Convert PDF to images
-        images_data = convert_pdf_to_image(pdf_file, use_png=use_png)
+    # Statements too large for one request are extracted in page windows and merged
+    windows = split_into_windows(pdf_file)
+    if windows:
+        return process_in_windows(client, pdf_file, windows, prompt, include_calculations, use_vision, use_png,
+                                  use_files_api, adaptive_encoding, encoding_report, model, extraction_tool,
+                                  region_fields)
+
+    message_content = build_bill_content(client, pdf_file, use_vision, use_png, use_files_api,
+                                         deduplicator, adaptive_encoding, encoding_report, region_fields)
+    message_content.extend(build_instruction_blocks(prompt, include_calculations))
+
+    # Send to Claude API
+    try:
+        message = send_extraction_request(client, message_content, model, extraction_tool=extraction_tool)
+    except (BadRequestError, NotFoundError):
+        if use_vision or not use_files_api:
+            raise
+        # The file ID may have expired server-side; forget it and upload again
+        get_file_registry().forget(pdf_file.content_hash())
+        message_content[0] = build_document_block(client, pdf_file, use_files_api)
+        message = send_extraction_request(client, message_content, model, extraction_tool=extraction_tool)
+
+    # Store API usage statistics and raw JSON response
+    record_usage(message)
+
+    # Read the tool input, or parse the text, repairing fences, trailing prose and truncation
+    repair_details = {}
+    response_data, repaired = get_response_data(message, repair_details)
+    if repaired:
+        report_message('info', f"Repaired malformed JSON response for {pdf_file.name} (stop reason: {message.stop_reason})")
+    
+    # Handle different response formats
+    if isinstance(response_data, dict) and response_data.get('bills') and response_data.get('fields'):
+        result = dict(zip(response_data['fields'], response_data['bills'][0]))
+    elif isinstance(response_data, dict):
+        result = response_data
+    elif isinstance(response_data, list) and response_data and isinstance(response_data[0], dict):
+        result = response_data[0]
+    else:
+        raise ValueError("Unexpected response format from API")
+    
+    cut_key = None
+    if repaired and message.stop_reason == 'max_tokens' and repair_details.get('closed_cut_value') and result:
+        # The repair kept the value the response was cut in, which may be shortened; re-ask for it instead
+        cut_key = list(result)[-1]
+        result.pop(cut_key)
+    
+    # Ask again for just the fields the response is missing
+    missing_fields = find_missing_fields(result, field_names)
+    if cut_key and cut_key not in missing_fields:
+        # A suffixed key (Charge_3) isn't missing while other instances remain, so ask for it by name
+        missing_fields.append(cut_key)
+    if missing_fields:
+        report_message('info', f"Re-asking {len(missing_fields)} missing field(s) for {pdf_file.name}: {', '.join(missing_fields)}")
+        follow_up = request_missing_fields(client, pdf_file, missing_fields, use_vision, use_png, use_files_api, model)
+        for key, value in follow_up.items():
+            if result.get(key) is None:
+                result[key] = value
+    
+    result['filename'] = pdf_file.name
+    return result
+
+def process_in_windows(client, pdf_file, windows, prompt, include_calculations, use_vision=False, use_png=False, use_files_api=False, adaptive_encoding=False, encoding_report=None, model=DEFAULT_MODEL, extraction_tool=None, region_fields=None):
+    """Extract an oversized PDF window by window, concurrently, and merge the results.
+    
+    Windows are not re-asked for missing fields (most fields live on only a
+    few pages) and skip page deduplication, whose state is not thread-safe.
+    A failed window only loses its own pages; the document fails when every
+    window does.
+    
+    Args:
+        client: The Anthropic client
+        pdf_file: The oversized InputDocument
+        windows: Its page-window InputDocuments from split_into_windows
+        (remaining arguments as for process_single_pdf)
+    
+    Returns:
+        dict: The merged extracted data
+    """
+    report_message('info', f"Splitting {pdf_file.name} into {len(windows)} page windows")
+    
+    def process_window(window):
+        # Window threads have no run state of their own; collect it and merge it below
+        window_state = {}
+        with bind_run_state(window_state):
+            result = process_single_pdf(client, window, prompt, include_calculations, use_vision, use_png,
+                                        use_files_api, None, adaptive_encoding, encoding_report,
+                                        model=model, extraction_tool=extraction_tool,
+                                        region_fields=region_fields)
+        return result, window_state
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_WINDOWS, len(windows))) as executor:
+        futures = [executor.submit(process_window, window) for window in windows]
+    
+    results = []
+    errors = []
+    usage = {'input_tokens': 0, 'output_tokens': 0, 'stop_reason': None}
+    run_state = get_run_state()
+    for window, future in zip(windows, futures):
+        try:
+            result, window_state = future.result()
+        except Exception as e:
+            errors.append(e)
+            report_message('warning', f"Pages {window.name} of {pdf_file.name} failed: {str(e)}")
+            continue
+        results.append(result)
+        for level, message in window_state.get('messages', []):
+            report_message(level, message)
+        if 'last_usage' in window_state:
+            usage['input_tokens'] += window_state['last_usage']['input_tokens']
+            usage['output_tokens'] += window_state['last_usage']['output_tokens']
+            usage['stop_reason'] = window_state['last_usage']['stop_reason']
+            run_state['raw_json_response'] = window_state['raw_json_response']
+    
+    if not results:
+        raise errors[0]
+    run_state['last_usage'] = usage
+    
+    result = merge_window_results(results)
+    result['filename'] = pdf_file.name
+    return result
+
+def find_missing_fields(result, field_names):
+    """List requested fields that have no key at all (plain or suffixed) in a result.
+    
+    Fields present with a null value were looked for and not found, so they
+    are not considered missing.
+    """
+    return [field for field in field_names or [] if not get_field_values(result, field)]
+
+def request_missing_fields(client, pdf_file, missing_fields, use_vision=False, use_png=False, use_files_api=False, model=DEFAULT_MODEL):
+    """Send a minimal follow-up request for specific fields of a bill.
+    
+    Args:
+        client: The Anthropic client
+        pdf_file: The InputDocument being processed
+        missing_fields: Field names to extract
+        use_vision: Whether to send the PDF as page images
+        use_png: Whether to use PNG format for images
+        use_files_api: Whether to reference the PDF by Files API ID
+        model: The model ID to use
+    
+    Returns:
+        dict: Extracted values for the missing fields (empty if the follow-up fails)
+    """
+    message_content = build_bill_content(client, pdf_file, use_vision, use_png, use_files_api)
+    message_content.append({
+        "type": "text",
+        "text": MISSING_FIELDS_PROMPT.format(fields=json.dumps({field: "" for field in missing_fields}, indent=2))
+    })
+    
+    try:
+        message = send_extraction_request(client, message_content, model, MISSING_FIELDS_MAX_TOKENS)
+        follow_up, _ = parse_json_response(message.content[0].text)
+    except Exception as e:
+        report_message('warning', f"Missing-field request failed for {pdf_file.name}: {str(e)}")
+        return {}
+    
+    return follow_up if isinstance(follow_up, dict) else {}
+
+def plan_request_packs(documents, max_bill_pages=PACK_MAX_BILL_PAGES, max_pages=PACK_MAX_PAGES, max_bills=PACK_MAX_BILLS, max_input_tokens=PACK_MAX_INPUT_TOKENS):
+    """Group small bills into shared requests, preserving document order.
+    
+    A bill sent on its own closes the pack before it, so packs come out in
+    input order and so do their results. Page counts are read with
+    InputDocument.page_count, which doesn't load disk-backed documents.
+    
+    Args:
+        documents: List of InputDocuments
+        max_bill_pages: Bills with more pages than this are sent on their own
+        max_pages: Maximum total pages in one packed request
+        max_bills: Maximum number of bills in one packed request
+        max_input_tokens: Maximum estimated bill content tokens in one packed request
+    
+    Returns:
+        List of packs, each a list of InputDocuments
+    """
+    packs = []
+    current_pack, current_pages = [], 0
+    
+    for document in documents:
+        try:
+            page_count = document.page_count()
+        except Exception:
+            # Unreadable PDFs go on their own so their error is reported normally
+            page_count = None
         
-        # Create message content with all images
-        message_content = []
+        if page_count is None or page_count > max_bill_pages:
+            if current_pack:
+                packs.append(current_pack)
+                current_pack, current_pages = [], 0
+            packs.append([document])
+            continue
         
-        # Add all images first
-        for img_data, media_type in images_data:
-            message_content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": media_type,
-                    "data": img_data
-                }
-            })
+        pages = current_pages + page_count
+        fits = (len(current_pack) < max_bills and pages <= max_pages and
+                pages * ESTIMATED_TOKENS_PER_PAGE <= max_input_tokens)
+        if current_pack and not fits:
+            packs.append(current_pack)
+            current_pack, current_pages = [], 0
         
-        # Add examples and prompt
-        message_content.extend([
-            {
-                "type": "text",
-                "text": CALCULATIONS_EXAMPLES if include_calculations else SIMPLE_EXAMPLES
-            },
-            {
-                "type": "text",
-                "text": prompt
-            }
-        ])
-    else:
-        # Regular PDF processing - exactly as it was before
-        message_content = [
-            {
-                "type": "document",
-                "source": {
-                    "type": "base64",
-                    "media_type": "application/pdf",
-                    "data": base64.b64encode(pdf_file.read()).decode()
-                }
-            },
-            {
-                "type": "text",
-                "text": CALCULATIONS_EXAMPLES if include_calculations else SIMPLE_EXAMPLES
-            },
-            {
-                "type": "text",
-                "text": prompt
-            }
-        ]
-        pdf_file.seek(0)  # Reset file pointer
+        current_pack.append(document)
+        current_pages += page_count
+    
+    if current_pack:
+        packs.append(current_pack)
+    
+    return packs
 
-    # Send to Claude API
-    message = client.messages.create(
-        model="claude-3-5-sonnet-20241022",
-        max_tokens=8192,
+def process_packed_pdfs(client, pdf_files, prompt, include_calculations, use_vision=False, use_png=False, use_files_api=False, deduplicator=None, adaptive_encoding=False, encoding_report=None, model=DEFAULT_MODEL, extraction_tool=None, region_fields=None):
+    """Process several small bills in one Claude API request.
+    
+    Each bill is labelled with a key and the response is expected to be a
+    JSON array of per-bill objects carrying that key. Entries are matched
+    back to their files individually, so one malformed entry only affects
+    its own bill.
+    
+    Args:
+        client: The Anthropic client
+        pdf_files: The InputDocuments to process together
+        prompt: The prompt to send to Claude
+        include_calculations: Whether to include calculations
+        (remaining arguments as for process_single_pdf)
+    
+    Returns:
+        list: Extracted data per file, in input order; None for bills missing or
+              malformed in the response
+    """
+    message_content = []
+    for index, pdf_file in enumerate(pdf_files, 1):
+        message_content.append({
+            "type": "text",
+            "text": f"Bill key: bill_{index}"
+        })
+        message_content.extend(build_bill_content(client, pdf_file, use_vision, use_png, use_files_api,
+                                                  deduplicator, adaptive_encoding, encoding_report, region_fields))
+    message_content.extend(build_instruction_blocks(prompt, include_calculations))
+    instructions = PACKED_TOOL_INSTRUCTIONS if extraction_tool else PACKED_BILLS_INSTRUCTIONS
+    message_content.append({
+        "type": "text",
+        "text": instructions.format(count=len(pdf_files))
+    })
+    
+    packed_tool = build_packed_tool(extraction_tool) if extraction_tool else None
+    message = send_extraction_request(client, message_content, model, extraction_tool=packed_tool)
+    record_usage(message)
+    
+    response_data, repaired = get_response_data(message)
+    if isinstance(response_data, dict):
+        response_data = response_data.get('bills', [])
+    if repaired and message.stop_reason == 'max_tokens' and isinstance(response_data, list) and response_data:
+        # The entry being written at the cut is incomplete even once repaired; its bill is retried on its own
+        response_data = response_data[:-1]
+    
+    results = [None] * len(pdf_files)
+    for entry in response_data if isinstance(response_data, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        bill_key = str(entry.pop('bill_key', ''))
+        if not bill_key.startswith('bill_') or not bill_key[5:].isdigit():
+            continue
+        index = int(bill_key[5:]) - 1
+        if 0 <= index < len(pdf_files) and results[index] is None:
+            entry['filename'] = pdf_files[index].name
+            results[index] = entry
+    
+    return results
+
+def send_extraction_request(client, message_content, model=DEFAULT_MODEL, max_tokens=8192, extraction_tool=None):
+    """Send an extraction request to the Claude API.
+    
+    Args:
+        client: The Anthropic client
+        message_content: Content blocks for the user message
+        model: The model ID to use
+        max_tokens: Output token limit
+        extraction_tool: Optional tool definition the model is forced to call
+    
+    Returns:
+        The API message response
+    """
+    if extraction_tool:
+        tool_params = {
+            "tools": [extraction_tool],
+            "tool_choice": {"type": "tool", "name": extraction_tool["name"]}
+        }
+    else:
+        tool_params = {}
+    return client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
         temperature=0,
         system="You are an expert utility bill analyst AI specializing in data extraction and standardization. Your primary responsibilities include:\n\n1. Accurately extracting specific fields from utility bills\n2. Handling complex cases such as tiered charges\n3. Maintaining consistent data formatting\n4. Returning data in a standardized JSON format\n\nYour expertise allows you to navigate complex billing structures, identify relevant information quickly, and standardize data in various utility bill formats. You are meticulous in following instructions and maintaining data integrity throughout the extraction and formatting process.",
         messages=[
@@ -297,33 +944,24 @@ def process_single_pdf(client, pdf_file, prompt, include_calculations, use_visio
                 "role": "user",
                 "content": message_content
             }
-        ]
+        ],
+        **tool_params
     )
 
-    # Store API usage statistics
-    st.session_state.last_usage = {
-        'input_tokens': message.usage.input_tokens,
-        'output_tokens': message.usage.output_tokens,
-        'stop_reason': message.stop_reason
-    }
-
-    # Store raw JSON response
-    st.session_state.raw_json_response = message.model_dump_json()
-
-    # Parse response
-    response_data = json.loads(message.content[0].text)
+def get_response_data(message, details=None):
+    """Get the extracted data from a response, from its tool call or its JSON text.
     
-    # Handle different response formats
-    if isinstance(response_data, dict):
-        response_data['filename'] = pdf_file.name
-        result = response_data
-    elif response_data.get('bills') and len(response_data['bills']) > 0:
-        result = dict(zip(response_data['fields'], response_data['bills'][0]))
-        result['filename'] = pdf_file.name
-    else:
-        raise ValueError("Unexpected response format from API")
-
-    return result
+    Args:
+        message: The API message response
+        details: Optional dict receiving repair details (see parse_json_response)
+    
+    Returns:
+        (data, repaired) where repaired is True if the JSON text needed repair
+    """
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input, False
+    return parse_json_response(message.content[0].text, details)
 
 def handle_processing_error(pdf_file, error, api_logs):
     """Handle errors during PDF processing.
@@ -333,8 +971,9 @@ def handle_processing_error(pdf_file, error, api_logs):
         error: The error that occurred
         api_logs: List to append the error log to
     """
-    if 'problematic_files' not in st.session_state:
-        st.session_state.problematic_files = []
+    run_state = get_run_state()
+    if 'problematic_files' not in run_state:
+        run_state['problematic_files'] = []
     
     error_info = {
         'filename': pdf_file.name,
@@ -342,8 +981,8 @@ def handle_processing_error(pdf_file, error, api_logs):
     }
     
     if isinstance(error, json.JSONDecodeError):
-        error_info['raw_response'] = st.session_state.get('raw_json_response', '')
+        error_info['raw_response'] = run_state.get('raw_json_response', '')
     
-    st.session_state.problematic_files.append(error_info)
+    run_state['problematic_files'].append(error_info)
     api_logs.append(log_api_call(pdf_file, None, str(error)))
-    st.error(f"Error processing {pdf_file.name}: {str(error)}") 
\ No newline at end of file
+    report_message('error', f"Error processing {pdf_file.name}: {str(error)}") 
\ No newline at end of file
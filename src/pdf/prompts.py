@@ -0,0 +1,138 @@
+"""Prompt and tool schema builders for the PDF Parser application."""
+
+import json
+
+EXTRACTION_TOOL_NAME = "record_bill_fields"
+
+# Schema used for values of tier/total variants such as "FIELD_2" or "FIELD_Total"
+VALUE_SCHEMA = {"type": ["number", "string", "null"]}
+
+def get_tiered_instructions(include_calculations):
+    """Get the instructions for tiered/repeated charges."""
+    if include_calculations:
+        return """
+   a. Use the plain field name for the first tiers/instances/charges (e.g., "FIELD")
+   b. Add a suffix for each additional tiers/instances/charges (e.g., "FIELD_2", "FIELD_3")
+   c. If there is a total value stated, use it and add a '_Total' suffix for the total (e.g., "FIELD_Total")
+   d. If there isn't a clearly stated total, calculate and create one with the sum of the tiers/instances/charges. You MUST add a "CalcTotal" suffix to indicate it was calculated. (e.g., "FIELD_CalcTotal")."""
+    return """
+   a. If there is a total value stated, use it and add a '_Total' suffix for the total (e.g., "FIELD_Total")
+   b. If there isn't a clearly stated total, calculate and create one with the sum of the tiers/instances/charges. You MUST add a "CalcTotal" suffix to indicate it was calculated. (e.g., "FIELD_CalcTotal")."""
+
+def build_prompt(fields, include_calculations, meter_number=None):
+    """Build the JSON-text extraction prompt.
+
+    Args:
+        fields: List of (field_name, format_hint) tuples
+        include_calculations: Whether to include calculations
+        meter_number: Optional meter/account to restrict the extraction to
+
+    Returns:
+        str: The prompt
+    """
+    field_dict = {field: "" for field, _ in fields if field}
+
+    return f"""Your objective is to extract key information from this utility bill and present it in a standardized JSON format. Follow these steps:
+
+1. Carefully analyze the utility bill content.
+2. Identify and extract the required fields.
+3. Format the extracted information according to the specifications.
+4. Handle any tiered charges appropriately.
+5. Compile the final JSON output.
+
+Required Fields{f" to be extracted only for {meter_number}" if meter_number else ""}:
+{json.dumps(field_dict, indent=2)}
+
+Special Instructions:
+1. For charges that show multiple charges with the main part of the name identical but with seasonal suffixes (e.g., "Charge A Summer", "Charge A Winter"), or tiered charges (like water service charges), or multiple instances of the same charge (when a rate changes in the middle of the bill period), or any other case where the same charge is shown multiple times with different values, use the following instructions:{get_tiered_instructions(include_calculations)}
+
+2. Formatting Rules:
+   - Each field should be a separate key at the root level of the JSON
+   - Do not nest the values in sub-objects
+   - Return each amount as a plain number
+   - Do not include gallons, rates, or date ranges
+
+3. If a field is not found in the bill, use null as the value.
+
+Return the data in this structure (while adding the proper suffixes for different tiers/instances/charges and totals):
+{json.dumps(field_dict, indent=2)}
+
+Remember to replace the null values with the actual extracted data or keep as null if the information is not found in the bill.
+
+Provide ONLY the JSON object as your final output, with no additional text."""
+
+def build_tool_prompt(include_calculations, meter_number=None):
+    """Build the short prompt used with the extraction tool.
+
+    The field list and output structure live in the tool schema, so the
+    prompt only carries the extraction rules.
+
+    Args:
+        include_calculations: Whether to include calculations
+        meter_number: Optional meter/account to restrict the extraction to
+
+    Returns:
+        str: The prompt
+    """
+    return f"""Extract the fields defined by the {EXTRACTION_TOOL_NAME} tool from this utility bill{f" only for {meter_number}" if meter_number else ""} and record them with the tool.
+
+For charges that appear several times (seasonal variants, tiers, or a rate change mid-period), use these rules, adding the suffixed keys alongside the schema fields:{get_tiered_instructions(include_calculations)}
+
+Return each amount as a plain number. Do not include gallons, rates, or date ranges. Use null for fields not found in the bill."""
+
+def build_field_schema(format_hint):
+    """Build the JSON schema for one template field."""
+    if format_hint:
+        return {"type": ["string", "null"], "description": f"Format: {format_hint}"}
+    return dict(VALUE_SCHEMA)
+
+def build_extraction_tool(fields):
+    """Compile template fields into a tool definition for structured output.
+
+    Every field is required (null when not found), and tier/total variants
+    are accepted as additional properties.
+
+    Args:
+        fields: List of (field_name, format_hint) tuples
+
+    Returns:
+        dict: Tool definition for the Messages API
+    """
+    named_fields = [(field, format_hint) for field, format_hint in fields if field]
+    return {
+        "name": EXTRACTION_TOOL_NAME,
+        "description": "Record the fields extracted from one utility bill.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                field: build_field_schema(format_hint)
+                for field, format_hint in named_fields
+            },
+            "required": [field for field, _ in named_fields],
+            "additionalProperties": VALUE_SCHEMA
+        }
+    }
+
+def build_packed_tool(extraction_tool):
+    """Wrap a single-bill extraction tool so it records several keyed bills.
+
+    Args:
+        extraction_tool: Tool definition from build_extraction_tool
+
+    Returns:
+        dict: Tool definition whose input is {"bills": [{"bill_key": ..., fields...}]}
+    """
+    bill_schema = dict(extraction_tool["input_schema"])
+    bill_schema["properties"] = {"bill_key": {"type": "string"}, **bill_schema["properties"]}
+    bill_schema["required"] = ["bill_key"] + bill_schema["required"]
+    return {
+        "name": extraction_tool["name"],
+        "description": "Record the fields extracted from each of several utility bills.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "bills": {"type": "array", "items": bill_schema}
+            },
+            "required": ["bills"]
+        }
+    }
@@ -0,0 +1,188 @@
+"""Charge-region detection for the PDF Parser application.
+
+Locates the parts of a page that carry a template's fields, so vision
+requests can send tight full-resolution crops plus a low-resolution page
+overview instead of the whole page at full resolution. Digital pages are
+analysed through the PyMuPDF text layer (field label hits and the tables
+containing them); scanned pages fall back to OpenCV ruling-line detection.
+
+PyMuPDF, Pillow and OpenCV are imported inside each function, like in
+src.pdf.render.
+"""
+
+from src.pdf.render import is_scanned_page, pixmap_to_image, union_rects
+
+# Padding around each detected region, in points
+REGION_PADDING = 12
+
+# Regions closer than this (points) are merged into one crop
+MERGE_GAP = 24
+
+# When the regions cover more than this share of the page, the full page is sent instead
+MAX_REGION_COVERAGE = 0.6
+
+# Resolution of the page overview sent alongside the crops
+OVERVIEW_DPI = 50
+
+# Resolution at which scanned pages are analysed for ruling lines
+SCAN_ANALYSIS_DPI = 100
+
+# Smallest ruled area (share of the page) taken as a table on a scan
+MIN_TABLE_AREA = 0.02
+
+# Words too common on bills to locate a field by
+GENERIC_WORDS = {'charge', 'charges', 'total', 'current', 'number', 'service', 'amount', 'date', 'start', 'end'}
+
+REGIONS_INSTRUCTIONS = """Some pages are sent as a low-resolution overview of the page followed by full-resolution crops of its charge and summary regions. Use the overview only for orientation and read all values from the crops."""
+
+def get_search_terms(field_names):
+    """Get the text to search a page for to locate the given fields.
+
+    Field names are searched as-is, along with their distinctive words,
+    since bills rarely print a field name exactly as the template spells it.
+    """
+    terms = []
+    for name in field_names:
+        for term in [name] + [word for word in name.split() if len(word) > 3 and word.lower() not in GENERIC_WORDS]:
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+def merge_rects(rects, gap=MERGE_GAP):
+    """Merge rectangles that overlap or lie within gap points of each other."""
+    import fitz  # PyMuPDF
+
+    merged = [fitz.Rect(rect) for rect in rects]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            rect = merged[i]
+            grown = fitz.Rect(rect.x0 - gap, rect.y0 - gap, rect.x1 + gap, rect.y1 + gap)
+            for j in range(i + 1, len(merged)):
+                if grown.intersects(merged[j]):
+                    merged[i] = merged[i] | merged[j]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return sorted(merged, key=lambda rect: (rect.y0, rect.x0))
+
+def find_text_regions(page, field_names):
+    """Find field regions on a digital page through its text layer.
+
+    Each label hit selects the table containing it, or otherwise a band
+    across the text width at the hit's height, where the value usually sits.
+    """
+    import fitz  # PyMuPDF
+
+    hits = []
+    for term in get_search_terms(field_names):
+        hits.extend(page.search_for(term))
+    if not hits:
+        return []
+
+    try:
+        tables = [fitz.Rect(table.bbox) for table in page.find_tables().tables]
+    except AttributeError:
+        # find_tables needs PyMuPDF 1.23 or later
+        tables = []
+
+    text_area = union_rects(block[:4] for block in page.get_text("blocks")) or page.rect
+
+    regions = []
+    for hit in hits:
+        table = next((table for table in tables if table.intersects(hit)), None)
+        if table is not None:
+            regions.append(table)
+        else:
+            regions.append(fitz.Rect(text_area.x0, hit.y0, text_area.x1, hit.y1))
+    return regions
+
+def find_ruled_regions(page):
+    """Find tables on a scanned page from their horizontal and vertical ruling lines."""
+    import cv2
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    scale = SCAN_ANALYSIS_DPI / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (max(pix.width // 30, 1), 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(pix.height // 30, 1))))
+    grid = cv2.dilate(horizontal | vertical, np.ones((5, 5), np.uint8))
+
+    contours, _ = cv2.findContours(grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = pix.width * pix.height * MIN_TABLE_AREA
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h >= min_area:
+            regions.append(fitz.Rect(x / scale, y / scale, (x + w) / scale, (y + h) / scale))
+    return regions
+
+def find_charge_regions(page, field_names):
+    """Find the regions of a page worth sending at full resolution.
+
+    Args:
+        page: PyMuPDF page
+        field_names: Template field names to locate
+
+    Returns:
+        list of fitz.Rect in page coordinates, top to bottom; empty when the
+        full page should be sent (nothing found, or the regions cover most of it)
+    """
+    import fitz  # PyMuPDF
+
+    if is_scanned_page(page):
+        regions = find_ruled_regions(page)
+    else:
+        regions = find_text_regions(page, field_names)
+    if not regions:
+        return []
+
+    page_rect = page.rect
+    padded = [
+        fitz.Rect(rect.x0 - REGION_PADDING, rect.y0 - REGION_PADDING,
+                  rect.x1 + REGION_PADDING, rect.y1 + REGION_PADDING) & page_rect
+        for rect in regions
+    ]
+    regions = merge_rects(padded)
+
+    covered = sum(rect.get_area() for rect in regions)
+    if covered > page_rect.get_area() * MAX_REGION_COVERAGE:
+        return []
+    return regions
+
+def render_region(page, dpi, clip=None):
+    """Render a page, or a clip of it, to an RGB pixmap."""
+    import fitz  # PyMuPDF
+
+    return page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), clip=clip, alpha=False)
+
+def draw_regions(pdf_bytes, page_index, field_names, dpi=72):
+    """Render a page with its detected charge regions outlined, for debugging.
+
+    Returns:
+        (PIL Image, list of regions as (x0, y0, x1, y1) tuples in points)
+    """
+    import fitz  # PyMuPDF
+    from PIL import ImageDraw
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        page = pdf_document[page_index]
+        regions = find_charge_regions(page, field_names)
+        # RGB pixmaps are copied into the image, so it outlives the pixmap
+        image = pixmap_to_image(render_region(page, dpi))
+
+    scale = dpi / 72
+    draw = ImageDraw.Draw(image)
+    for rect in regions:
+        draw.rectangle([rect.x0 * scale, rect.y0 * scale, rect.x1 * scale, rect.y1 * scale],
+                       outline=(0, 200, 0), width=3)
+    return image, [tuple(rect) for rect in regions]
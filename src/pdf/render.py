@@ -0,0 +1,181 @@
+"""Page rendering helpers for the PDF Parser application.
+
+PyMuPDF and Pillow are imported inside each function so that importing this
+module (e.g. from the Split tab) does not load them until a page is rendered.
+"""
+
+import hashlib
+
+# Pages with fewer text characters than this, and mostly covered by images, are scans
+MIN_TEXT_CHARS = 20
+SCAN_IMAGE_COVERAGE = 0.5
+
+# Padding around the content bounds, as a share of the page size (matches the raster optimizer)
+CONTENT_PADDING = 0.01
+
+# Largest spread between color channels (0-1) still counted as gray
+GRAY_TOLERANCE = 0.02
+
+def document_hash(pdf_bytes):
+    """Get a stable content hash for a PDF document.
+
+    Args:
+        pdf_bytes: Raw bytes of the PDF
+
+    Returns:
+        str: Hex SHA-256 digest of the content
+    """
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+def get_page_count(pdf_bytes):
+    """Get the number of pages in a PDF held in memory.
+
+    Args:
+        pdf_bytes: Raw bytes of the PDF
+
+    Returns:
+        int: Total number of pages
+    """
+    import fitz  # PyMuPDF
+    
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return len(pdf_document)
+
+def render_page_thumbnail(pdf_bytes, page_index, dpi=36):
+    """Render a low-DPI PNG thumbnail of a single PDF page.
+
+    Args:
+        pdf_bytes: Raw bytes of the PDF
+        page_index: Zero-based index of the page to render
+        dpi: The DPI to use for rendering (default 36 - half of the native 72)
+
+    Returns:
+        bytes: PNG-encoded thumbnail
+    """
+    import fitz  # PyMuPDF
+    
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        pix = pdf_document[page_index].get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
+        return pix.tobytes("png")
+
+
+def union_rects(rects):
+    """Get the smallest rectangle containing all the given rectangles, or None."""
+    import fitz  # PyMuPDF
+
+    rects = [fitz.Rect(rect) for rect in rects]
+    rects = [rect for rect in rects if not rect.is_empty]
+    if not rects:
+        return None
+    bounds = rects[0]
+    for rect in rects[1:]:
+        bounds |= rect
+    return bounds
+
+def is_scanned_page(page):
+    """Check whether a page is a scan: almost no text layer and mostly image."""
+    import fitz  # PyMuPDF
+
+    if len(page.get_text("text").strip()) >= MIN_TEXT_CHARS:
+        return False
+    image_area = sum((fitz.Rect(info['bbox']) & page.rect).get_area() for info in page.get_image_info())
+    return image_area >= page.rect.get_area() * SCAN_IMAGE_COVERAGE
+
+def get_content_bbox(page):
+    """Get the bounds of a page's text, drawings and images from its vector geometry.
+
+    Plain white fills (page backgrounds) are ignored.
+
+    Returns:
+        fitz.Rect clipped to the page, or None for an empty page
+    """
+    rects = [block[:4] for block in page.get_text("blocks")]
+    for drawing in page.get_drawings():
+        if drawing.get('color') is None and drawing.get('fill') in (None, (1.0, 1.0, 1.0)):
+            continue
+        rects.append(drawing['rect'])
+    rects.extend(info['bbox'] for info in page.get_image_info())
+
+    bounds = union_rects(rects)
+    if bounds is None:
+        return None
+    bounds &= page.rect
+    return None if bounds.is_empty else bounds
+
+def is_gray(color, tolerance=GRAY_TOLERANCE):
+    """Check whether an RGB color tuple (0-1 components) is a shade of gray."""
+    return color is None or len(color) != 3 or max(color) - min(color) <= tolerance
+
+def has_only_gray_content(page):
+    """Check whether a page's text and drawings are all black, white or gray.
+
+    Pages with raster images are treated as colored, since checking them
+    would need the pixels.
+    """
+    if page.get_image_info():
+        return False
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                color = span["color"]
+                if not is_gray((((color >> 16) & 255) / 255, ((color >> 8) & 255) / 255, (color & 255) / 255)):
+                    return False
+    for drawing in page.get_drawings():
+        if not (is_gray(drawing.get('color')) and is_gray(drawing.get('fill'))):
+            return False
+    return True
+
+def render_content_pixmap(page, dpi=200):
+    """Render only the content area of a digital page, in grayscale where it has no color.
+
+    The content bounds come from the page's vector geometry, so no raster
+    analysis is needed to trim the margins.
+
+    Args:
+        page: PyMuPDF page
+        dpi: The DPI to use for rendering
+
+    Returns:
+        fitz.Pixmap with one (gray) or three (RGB) channels
+    """
+    import fitz  # PyMuPDF
+
+    clip = get_content_bbox(page)
+    if clip is not None:
+        pad_x = page.rect.width * CONTENT_PADDING
+        pad_y = page.rect.height * CONTENT_PADDING
+        clip = fitz.Rect(clip.x0 - pad_x, clip.y0 - pad_y, clip.x1 + pad_x, clip.y1 + pad_y) & page.rect
+
+    colorspace = fitz.csGRAY if has_only_gray_content(page) else fitz.csRGB
+    return page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), clip=clip, colorspace=colorspace, alpha=False)
+
+def pixmap_to_image(pix):
+    """Wrap a pixmap as a PIL Image with as few copies as possible.
+
+    Grayscale pixmaps are shared without copying, so the pixmap must stay
+    alive while the image is in use. RGB pixmaps are copied once, into
+    Pillow's own pixel layout.
+
+    Returns:
+        PIL Image in mode 'L' or 'RGB'
+    """
+    from PIL import Image
+
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+
+def crop_pixmap(pix, box):
+    """Copy a pixel box of a pixmap into a new pixmap of just that size.
+
+    Args:
+        pix: Source fitz.Pixmap
+        box: (x_min, y_min, x_max, y_max) in pixels
+
+    Returns:
+        fitz.Pixmap covering the box
+    """
+    import fitz  # PyMuPDF
+
+    cropped = fitz.Pixmap(pix.colorspace, fitz.IRect(*box), pix.alpha)
+    cropped.copy(pix, cropped.irect)
+    return cropped
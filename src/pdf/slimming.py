@@ -0,0 +1,108 @@
+"""PDF payload slimming for the PDF Parser application.
+
+Split PDFs and statements exported by billing systems often carry far more
+than their pages need: the parent document's whole resource set, duplicated
+objects and uncompressed streams. Slimming rewrites a PDF without them
+before it is saved or sent to the API in document mode:
+
+- Content streams are sanitized, which rebuilds each page's resources with
+  only the fonts and images it actually uses.
+- Unreferenced and duplicate objects are garbage-collected.
+- Streams, fonts and images are deflated, and embedded fonts are subset.
+- Optionally, embedded images above a DPI threshold are downsampled.
+
+PyMuPDF is imported inside each function, like in src.pdf.render.
+"""
+
+import functools
+import importlib.util
+import logging
+
+from src.pdf.documents import InputDocument
+from src.utils.run_state import report_message
+
+logger = logging.getLogger(__name__)
+
+# Options passed to Document.save / Document.tobytes when writing a slimmed PDF
+SLIM_SAVE_OPTIONS = dict(garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True)
+
+# Default resolution above which embedded images are downsampled, when enabled
+DEFAULT_MAX_IMAGE_DPI = 150
+
+@functools.lru_cache(maxsize=None)
+def can_subset_fonts():
+    """Check once whether fontTools, which PyMuPDF subsets fonts with, is installed."""
+    if importlib.util.find_spec("fontTools") is None:
+        logger.warning("fontTools is not installed; PDFs are slimmed without subsetting their fonts")
+        return False
+    return True
+
+def slim_document(pdf_document, max_image_dpi=None):
+    """Subset the fonts of an open PDF and optionally downsample its images, in place.
+
+    Objects are only dropped and deflated when the document is written with
+    SLIM_SAVE_OPTIONS.
+
+    Args:
+        pdf_document: Open PyMuPDF document
+        max_image_dpi: Downsample embedded images shown above this resolution to it; None to keep them
+    """
+    if can_subset_fonts():
+        try:
+            pdf_document.subset_fonts()
+        except Exception as e:
+            # Some embedded fonts can't be subset; the rest of the slimming still applies
+            report_message('warning', f"Could not subset fonts: {str(e)}")
+
+    if max_image_dpi:
+        try:
+            # Images only a little above the target are left alone
+            pdf_document.rewrite_images(dpi_threshold=int(max_image_dpi * 1.2), dpi_target=max_image_dpi)
+        except AttributeError:
+            report_message('warning', "Image downsampling needs a newer PyMuPDF (Document.rewrite_images)")
+
+def slim_pdf_bytes(pdf_bytes, max_image_dpi=None):
+    """Slim a PDF held in memory.
+
+    Args:
+        pdf_bytes: The PDF content
+        max_image_dpi: Downsample embedded images shown above this resolution to it; None to keep them
+
+    Returns:
+        bytes: The slimmed PDF, or the original content if slimming didn't make it smaller
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        slim_document(pdf_document, max_image_dpi)
+        slimmed = pdf_document.tobytes(**SLIM_SAVE_OPTIONS)
+    return slimmed if len(slimmed) < len(pdf_bytes) else pdf_bytes
+
+def slim_input_document(document, max_image_dpi=None, slimming_report=None):
+    """Get a slimmed in-memory copy of a document to send in its place.
+
+    A document that can't be slimmed (a damaged or encrypted PDF) is
+    returned unchanged, so the request still goes out with the original.
+
+    Args:
+        document: The InputDocument to slim
+        max_image_dpi: Downsample embedded images shown above this resolution to it; None to keep them
+        slimming_report: Optional list that receives the bytes before and after
+
+    Returns:
+        InputDocument: The slimmed document, under the same name
+    """
+    content = document.getvalue()
+    try:
+        slimmed = slim_pdf_bytes(content, max_image_dpi)
+    except Exception as e:
+        report_message('warning', f"Could not slim {document.name}, sending it unchanged: {str(e)}")
+        slimmed = content
+
+    if slimming_report is not None:
+        slimming_report.append({
+            'filename': document.name,
+            'bytes_before': len(content),
+            'bytes_after': len(slimmed)
+        })
+    return InputDocument.from_bytes(document.name, slimmed)
@@ -1,16 +1,85 @@
 """PDF splitting functionality for the PDF Parser application."""
 
+import io
 import os
-import fitz  # PyMuPDF
-import streamlit as st
+import zipfile
 
-def split_pdf(uploaded_pdf, group_ranges, output_dir=None):
+from src.pdf.render import get_page_count
+from src.pdf.slimming import SLIM_SAVE_OPTIONS, slim_document
+
+def get_split_filename(source_name, group_name, valid_ranges):
+    """Get the filename of the PDF split from a source for one group.
+    
+    Args:
+        source_name: Filename of the source PDF
+        group_name: Name of the group
+        valid_ranges: The group's validated (start, end) page ranges
+    
+    Returns:
+        str: The split PDF's filename
+    """
+    base_name = os.path.splitext(source_name)[0]
+    ranges_str = '_'.join(f"{start}-{end}" for start, end in valid_ranges)
+    safe_group_name = "".join(c if c.isalnum() else "_" for c in group_name)
+    return f"split_{safe_group_name}_{ranges_str}_{base_name}.pdf"
+
+def iter_split_pdfs(uploaded_pdf, group_ranges, slim=True, max_image_dpi=None, size_report=None):
+    """Generate the split PDFs in memory, one group at a time.
+    
+    Args:
+        uploaded_pdf: The uploaded PDF file
+        group_ranges: List of tuples containing (group_name, [(start, end), ...])
+        slim: Whether to drop the source's unused objects from each split PDF (see src.pdf.slimming)
+        max_image_dpi: When slimming, downsample embedded images shown above this resolution to it
+        size_report: Optional list that receives each split PDF's size unslimmed and as generated
+    
+    Yields:
+        (filename, bytes) for each group, in order
+    """
+    import fitz  # PyMuPDF
+    
+    # Open the source from memory once for all groups
+    with fitz.open(stream=uploaded_pdf.getvalue(), filetype="pdf") as pdf_document:
+        for group_name, valid_ranges in group_ranges:
+            with fitz.open() as new_pdf:
+                all_pages = []
+                for start, end in valid_ranges:
+                    all_pages.extend(range(start-1, end))
+                
+                for page_num in sorted(all_pages):
+                    new_pdf.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
+                
+                if slim:
+                    if size_report is not None:
+                        bytes_before = len(new_pdf.tobytes())
+                    slim_document(new_pdf, max_image_dpi)
+                    content = new_pdf.tobytes(**SLIM_SAVE_OPTIONS)
+                else:
+                    content = new_pdf.tobytes()
+                    bytes_before = len(content)
+            
+            new_filename = get_split_filename(uploaded_pdf.name, group_name, valid_ranges)
+            if size_report is not None:
+                size_report.append({
+                    'filename': new_filename,
+                    'bytes_before': bytes_before,
+                    'bytes_after': len(content)
+                })
+            yield new_filename, content
+
+def split_pdf(uploaded_pdf, group_ranges, output_dir=None, max_image_dpi=None, size_report=None, slim=True):
     """Split a PDF into multiple PDFs based on page ranges.
     
+    Split PDFs are saved slimmed by default, so each keeps only the objects
+    its own pages use rather than the whole source document's resources.
+    
     Args:
         uploaded_pdf: The uploaded PDF file
         group_ranges: List of tuples containing (group_name, [(start, end), ...])
         output_dir: Directory to save split PDFs (defaults to current directory)
+        max_image_dpi: When slimming, downsample embedded images shown above this resolution to it
+        size_report: Optional list that receives each split PDF's size unslimmed and as saved
+        slim: Whether to slim the split PDFs
     
     Returns:
         List of created PDF filenames
@@ -21,35 +90,9 @@ def split_pdf(uploaded_pdf, group_ranges, output_dir=None):
     created_files = []
     
     try:
-        # Save the uploaded PDF temporarily
-        temp_path = os.path.join(output_dir, uploaded_pdf.name)
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_pdf.getvalue())
-        
-        # Create new PDFs for each group
-        for group_name, valid_ranges in group_ranges:
-            pdf_document = fitz.open(temp_path)
-            new_pdf = fitz.open()
-            
-            all_pages = []
-            for start, end in valid_ranges:
-                all_pages.extend(range(start-1, end))
-            
-            for page_num in sorted(all_pages):
-                new_pdf.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
-            
-            # Generate filename using group name
-            base_name = os.path.splitext(uploaded_pdf.name)[0]
-            ranges_str = '_'.join(f"{start}-{end}" for start, end in valid_ranges)
-            safe_group_name = "".join(c if c.isalnum() else "_" for c in group_name)
-            new_filename = f"split_{safe_group_name}_{ranges_str}_{base_name}.pdf"
-            new_path = os.path.join(output_dir, new_filename)
-            
-            # Save the new PDF
-            new_pdf.save(new_path)
-            new_pdf.close()
-            pdf_document.close()
-            
+        for new_filename, content in iter_split_pdfs(uploaded_pdf, group_ranges, slim, max_image_dpi, size_report):
+            with open(os.path.join(output_dir, new_filename), "wb") as f:
+                f.write(content)
             created_files.append(new_filename)
             
     except Exception as e:
@@ -57,6 +100,31 @@ def split_pdf(uploaded_pdf, group_ranges, output_dir=None):
         
     return created_files
 
+def build_split_zip(uploaded_pdf, group_ranges, slim=True, max_image_dpi=None, size_report=None):
+    """Build one ZIP archive of the split PDFs without writing them to disk.
+    
+    Each split PDF is generated from the source, added to the archive and
+    released before the next one, so only the archive itself is held.
+    
+    Args:
+        uploaded_pdf: The uploaded PDF file
+        group_ranges: List of tuples containing (group_name, [(start, end), ...])
+        slim: Whether to slim the split PDFs
+        max_image_dpi: When slimming, downsample embedded images shown above this resolution to it
+        size_report: Optional list that receives each split PDF's size unslimmed and as archived
+    
+    Returns:
+        bytes: The ZIP archive
+    """
+    buffer = io.BytesIO()
+    try:
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for new_filename, content in iter_split_pdfs(uploaded_pdf, group_ranges, slim, max_image_dpi, size_report):
+                archive.writestr(new_filename, content)
+    except Exception as e:
+        raise Exception(f"Error splitting PDF: {str(e)}")
+    return buffer.getvalue()
+
 def validate_page_ranges(ranges, total_pages):
     """Validate page ranges against total number of pages.
     
@@ -89,6 +157,23 @@ def validate_page_ranges(ranges, total_pages):
     
     return valid_ranges, error_messages
 
+def pages_to_ranges(pages):
+    """Collapse page numbers into contiguous (start, end) ranges.
+    
+    Args:
+        pages: Iterable of 1-based page numbers
+    
+    Returns:
+        List of (start, end) tuples in ascending order
+    """
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
 def get_pdf_page_count(uploaded_pdf):
     """Get the total number of pages in a PDF.
     
@@ -98,14 +183,4 @@ def get_pdf_page_count(uploaded_pdf):
     Returns:
         int: Total number of pages
     """
-    # Save the uploaded PDF temporarily
-    temp_path = os.path.join(os.getcwd(), uploaded_pdf.name)
-    with open(temp_path, "wb") as f:
-        f.write(uploaded_pdf.getvalue())
-    
-    # Open PDF and get page count
-    pdf_document = fitz.open(temp_path)
-    page_count = len(pdf_document)
-    pdf_document.close()
-    
-    return page_count 
\ No newline at end of file
+    return get_page_count(uploaded_pdf.getvalue())
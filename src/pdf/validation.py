@@ -0,0 +1,83 @@
+"""Extraction result validation for the PDF Parser application."""
+
+import re
+
+# Suffixes marking a total of several tiers/instances of the same charge
+TOTAL_SUFFIXES = ('_Total', '_CalcTotal')
+
+# Allowed difference between a stated total and the sum of its components
+TOTAL_TOLERANCE = 0.015
+
+def to_number(value):
+    """Convert an extracted value to a float, or None if it is not numeric.
+    
+    Accepts plain numbers and strings such as "$1,234.56" or "(12.00)".
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace('$', '').replace(',', '')
+        negative = text.startswith('(') and text.endswith(')')
+        text = text.strip('()')
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        return -number if negative else number
+    return None
+
+def get_field_values(result, field):
+    """Get the values of a field and all of its suffixed variants.
+    
+    Args:
+        result: Extracted data for one bill
+        field: Base field name
+    
+    Returns:
+        dict mapping each matching key to its value
+    """
+    pattern = re.compile(rf"^{re.escape(field)}(_\d+|_Total|_CalcTotal)?$")
+    return {key: value for key, value in result.items() if pattern.match(key)}
+
+def validate_extraction(result, required_fields=None):
+    """Check an extraction result for problems that warrant a retry.
+    
+    Args:
+        result: Extracted data for one bill
+        required_fields: Field names that must have a non-null value (under
+                         their own name or a suffixed variant)
+    
+    Returns:
+        list of problem descriptions; empty if the result is valid
+    """
+    if not isinstance(result, dict):
+        return ["Response is not a JSON object"]
+    
+    problems = []
+    
+    # Required fields must be present and non-null
+    for field in required_fields or []:
+        values = get_field_values(result, field)
+        if not any(value is not None and value != "" for value in values.values()):
+            problems.append(f"Required field '{field}' is missing or null")
+    
+    # Totals must match the sum of their components
+    for key, value in result.items():
+        suffix = next((s for s in TOTAL_SUFFIXES if key.endswith(s)), None)
+        total = to_number(value)
+        if suffix is None or total is None:
+            continue
+        base = key[:-len(suffix)]
+        components = [
+            to_number(v) for k, v in get_field_values(result, base).items()
+            if not k.endswith(TOTAL_SUFFIXES)
+        ]
+        components = [c for c in components if c is not None]
+        # A lone component may legitimately differ (e.g. untiered output), so
+        # only check totals that are broken down into several parts
+        if len(components) > 1 and abs(sum(components) - total) > TOTAL_TOLERANCE:
+            problems.append(f"'{key}' is {total:g} but its components sum to {sum(components):g}")
+    
+    return problems
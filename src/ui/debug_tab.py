@@ -3,15 +3,30 @@
 import json
 import streamlit as st
 from src.utils.api_utils import preview_api_call, count_tokens
+from src.utils.clients import get_connection_stats, get_http_pool_settings
 import io
-from PIL import Image
-import cv2
-import numpy as np
-from src.pdf.parser import convert_pdf_to_image, optimize_image_for_processing
-import base64
+from src.pdf.parser import PAGE_STAGES, capture_page_stages
+from src.pdf.regions import draw_regions
+from src.pdf.render import document_hash, get_page_count
+
+# Display labels for each page stage
+STAGE_LABELS = {
+    'original': "Original",
+    'gray': "Grayscale",
+    'binary': "Binary (White = Content)",
+    'contours': "Detected Content (Red: Details, Green: Final Crop)",
+    'sent': "Image Sent"
+}
+
+# Longest side of the on-screen preview, in pixels
+THUMBNAIL_SIZE = 800
 
 def save_debug_image(image, format='PNG'):
     """Save image to bytes for downloading."""
+    import cv2
+    import numpy as np
+    from PIL import Image
+    
     img_byte_arr = io.BytesIO()
     if isinstance(image, np.ndarray):
         # Convert OpenCV image to PIL
@@ -24,182 +39,108 @@ def save_debug_image(image, format='PNG'):
     pil_image.save(img_byte_arr, format=format)
     return img_byte_arr.getvalue()
 
-def process_debug_images(debug_pdf):
-    """Process PDF and store debug images in session state."""
-    images_data = convert_pdf_to_image(debug_pdf, use_png=True, skip_optimization=True)  # Skip optimization to get true original
-    debug_images = []
+def get_debug_stage_image(pdf_bytes, page_index, stage):
+    """Run one page through the production rendering branch and capture a single stage.
     
-    for page_num, (img_base64, _) in enumerate(images_data, 1):
-        # Get original image
-        img_bytes = base64.b64decode(img_base64)
-        original_image = Image.open(io.BytesIO(img_bytes))
-        
-        # Convert to OpenCV format
-        cv_image = cv2.cvtColor(np.array(original_image), cv2.COLOR_RGB2BGR)
-        
-        # Get grayscale
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Get binary image with more aggressive thresholding
-        binary = cv2.adaptiveThreshold(
-            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 21, 15
-        )
-        
-        # Remove noise with morphological operations
-        kernel = np.ones((3,3), np.uint8)
-        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-        
-        # Find contours for visualization
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter out very small contours (noise)
-        min_contour_area = cv_image.shape[0] * cv_image.shape[1] * 0.0005  # Middle ground: 0.05% of image area
-        contours = [cnt for cnt in contours if cv2.contourArea(cnt) > min_contour_area]
-        
-        # Create a copy of original image for contour visualization
-        contour_viz = cv_image.copy()
-        
-        # Find the bounding box that contains all content
-        if contours:
-            # Initialize with first contour
-            x_min, y_min, x_max, y_max = float('inf'), float('inf'), 0, 0
-            
-            # Draw all contours in red with thicker lines
-            cv2.drawContours(contour_viz, contours, -1, (0, 0, 255), 2)
-            
-            for contour in contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                x_min = min(x_min, x)
-                y_min = min(y_min, y)
-                x_max = max(x_max, x + w)
-                y_max = max(y_max, y + h)
-            
-            # Add smaller padding (1% of image size)
-            padding_x = int(cv_image.shape[1] * 0.01)
-            padding_y = int(cv_image.shape[0] * 0.01)
-            
-            x_min = max(0, x_min - padding_x)
-            y_min = max(0, y_min - padding_y)
-            x_max = min(cv_image.shape[1], x_max + padding_x)
-            y_max = min(cv_image.shape[0], y_max + padding_y)
-            
-            # Draw the final bounding box in bright green with thicker line
-            cv2.rectangle(contour_viz, (x_min, y_min), (x_max, y_max), (0, 255, 0), 3)
-        else:
-            # If no contours found, use the whole image
-            x_min, y_min = 0, 0
-            x_max, y_max = cv_image.shape[1], cv_image.shape[0]
-        
-        # Create cropped image
-        cropped = cv_image[y_min:y_max, x_min:x_max]
-        optimized = Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
-        
-        # Convert binary to 3 channels for better visualization
-        binary_viz = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
-        
-        # Store all versions
-        page_images = {
-            'original': save_debug_image(original_image),
-            'rgb': save_debug_image(cv_image),
-            'gray': save_debug_image(gray),
-            'binary': save_debug_image(binary_viz),
-            'contours': save_debug_image(contour_viz),
-            'optimized': save_debug_image(optimized)
-        }
-        debug_images.append(page_images)
+    Args:
+        pdf_bytes: Raw bytes of the debug PDF
+        page_index: Zero-based index of the page to render
+        stage: One of PAGE_STAGES
+    
+    Returns:
+        PIL Image or OpenCV array for the requested stage, or None if the
+        page doesn't go through it (raster stages of digital pages)
+    """
+    captured = {}
+    
+    def capture_stage(name, image):
+        if name == stage:
+            captured['image'] = image
+    
+    capture_page_stages(pdf_bytes, page_index, capture_stage)
+    return captured.get('image')
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def get_debug_thumbnail(doc_hash, page_index, stage, _pdf_bytes):
+    """Build a cached, downscaled PNG of one page/stage for on-screen display, or None if the page skips it."""
+    from PIL import Image
+    
+    image = get_debug_stage_image(_pdf_bytes, page_index, stage)
+    if image is None:
+        return None
+    if not isinstance(image, Image.Image):  # OpenCV array
+        image = Image.open(io.BytesIO(save_debug_image(image)))
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    return save_debug_image(image)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_debug_regions(doc_hash, page_index, field_names, _pdf_bytes):
+    """Outline the charge regions crop mode would send for one page, cached.
     
-    return debug_images
+    Returns:
+        (PNG bytes of the page with regions outlined, list of region tuples in points)
+    """
+    image, regions = draw_regions(_pdf_bytes, page_index, list(field_names))
+    return save_debug_image(image), regions
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_debug_page_count(doc_hash, _pdf_bytes):
+    """Get the page count of the debug PDF, cached by content hash."""
+    return get_page_count(_pdf_bytes)
 
 def render_debug_tab(uploaded_files, prompt, include_calculations, client):
     """Render the debug tab UI."""
     st.markdown("## Image Processing Debug")
     st.write("Upload a PDF to see intermediate steps of image processing")
     
-    # Initialize session state for debug images if not exists
-    if 'debug_images' not in st.session_state:
-        st.session_state.debug_images = None
-    
     debug_pdf = st.file_uploader("Upload PDF for image debug", type=['pdf'], key="debug_pdf_uploader")
     
     if debug_pdf:
-        if st.button("Process and Download Images", key="process_images_btn"):
-            with st.spinner("Processing images..."):
-                st.session_state.debug_images = process_debug_images(debug_pdf)
-    
-    # Display images if they exist in session state
-    if st.session_state.debug_images:
-        for page_num, page_images in enumerate(st.session_state.debug_images, 1):
-            st.markdown(f"### Page {page_num}")
-            
-            cols = st.columns(6)  # Changed to 6 columns
-            
-            with cols[0]:
-                st.download_button(
-                    "Download Original",
-                    page_images['original'],
-                    f"page_{page_num}_original.png",
-                    "image/png",
-                    key=f"download_original_{page_num}"
-                )
-                st.image(page_images['original'], caption="Original", use_column_width=True)
-            
-            with cols[1]:
-                st.download_button(
-                    "Download RGB",
-                    page_images['rgb'],
-                    f"page_{page_num}_rgb.png",
-                    "image/png",
-                    key=f"download_rgb_{page_num}"
-                )
-                st.image(page_images['rgb'], caption="RGB", use_column_width=True)
-            
-            with cols[2]:
-                st.download_button(
-                    "Download Grayscale",
-                    page_images['gray'],
-                    f"page_{page_num}_gray.png",
-                    "image/png",
-                    key=f"download_gray_{page_num}"
-                )
-                st.image(page_images['gray'], caption="Grayscale", use_column_width=True)
-            
-            with cols[3]:
-                st.download_button(
-                    "Download Binary",
-                    page_images['binary'],
-                    f"page_{page_num}_binary.png",
-                    "image/png",
-                    key=f"download_binary_{page_num}"
-                )
-                st.image(page_images['binary'], caption="Binary (White = Content)", use_column_width=True)
-            
-            with cols[4]:
-                st.download_button(
-                    "Download Contours",
-                    page_images['contours'],
-                    f"page_{page_num}_contours.png",
-                    "image/png",
-                    key=f"download_contours_{page_num}"
-                )
-                st.image(page_images['contours'], caption="Detected Content (Red: Details, Green: Final Crop)", use_column_width=True)
-            
-            with cols[5]:
-                st.download_button(
-                    "Download Optimized",
-                    page_images['optimized'],
-                    f"page_{page_num}_optimized.png",
-                    "image/png",
-                    key=f"download_optimized_{page_num}"
-                )
-                st.image(page_images['optimized'], caption="Final Cropped Result", use_column_width=True)
-            
-            st.markdown("---")
-    elif debug_pdf:
-        st.info("Click 'Process and Download Images' to see the processing steps")
+        pdf_bytes = debug_pdf.getvalue()
+        doc_hash = document_hash(pdf_bytes)
+        page_count = get_debug_page_count(doc_hash, pdf_bytes)
+        
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            page_num = st.number_input("Page", min_value=1, max_value=page_count, value=1,
+                                       key="debug_page_number")
+        with col2:
+            stage = st.radio("Stage", options=PAGE_STAGES, horizontal=True,
+                             format_func=lambda s: STAGE_LABELS[s].split(' (')[0],
+                             key="debug_stage")
+        
+        # Only the selected page and stage are computed; previews are cached
+        with st.spinner("Processing image..."):
+            thumbnail = get_debug_thumbnail(doc_hash, page_num - 1, stage, pdf_bytes)
+        if thumbnail is None:
+            st.info(f"Page {page_num} is a digital page: it is rendered straight to its vector content "
+                    f"bounds, so it has no {STAGE_LABELS[stage].split(' (')[0].lower()} stage.")
+        else:
+            st.image(thumbnail, caption=f"Page {page_num} of {page_count}: {STAGE_LABELS[stage]}",
+                     use_column_width=True)
+        
+        # Full-resolution images are only built when a download is requested
+        if thumbnail is not None and st.button("Prepare Full-Resolution Download", key="prepare_debug_download"):
+            with st.spinner("Rendering full resolution..."):
+                full_image = save_debug_image(get_debug_stage_image(pdf_bytes, page_num - 1, stage))
+            st.download_button(
+                f"Download {STAGE_LABELS[stage].split(' (')[0]}",
+                full_image,
+                f"page_{page_num}_{stage}.png",
+                "image/png",
+                key=f"download_{stage}_{page_num}"
+            )
+        
+        # Regions that "Crop to charge regions" would send for this page
+        if st.checkbox("Show charge regions for the current fields", key="debug_show_regions"):
+            field_names = tuple(field for field, _ in st.session_state.get('fields', []) if field)
+            with st.spinner("Locating charge regions..."):
+                overlay, regions = get_debug_regions(doc_hash, page_num - 1, field_names, pdf_bytes)
+            st.image(overlay, caption=f"Page {page_num}: selected regions (green)", use_column_width=True)
+            if regions:
+                st.write(f"{len(regions)} region{'s' if len(regions) > 1 else ''} sent at full resolution, plus a low-resolution overview")
+            else:
+                st.info("No regions located (or they cover most of the page); the full page would be sent")
     else:
         st.info("Upload a PDF file to see the intermediate image processing steps")
 
@@ -234,7 +175,8 @@ def render_debug_tab(uploaded_files, prompt, include_calculations, client):
                     st.markdown("---")
                 
                 # Show the API preview (same for both buttons)
-                preview = preview_api_call(uploaded_files, prompt, include_calculations)
+                preview = preview_api_call(uploaded_files, prompt, include_calculations,
+                                           use_files_api=st.session_state.get('use_files_api', False))
                 st.session_state.api_preview = preview
                 st.json(preview)
         else:
@@ -305,6 +247,68 @@ def render_debug_tab(uploaded_files, prompt, include_calculations, client):
         else:
             st.info("No API calls logged yet.")
 
+    with st.expander("🔌 Connection Pool", expanded=False):
+        stats = get_connection_stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Requests", stats['requests'])
+        with col2:
+            st.metric("New Connections", stats['new_connections'])
+        with col3:
+            st.metric("Connection Reuse", f"{stats['reuse_rate']:.0%}")
+        st.write("Pool settings (process-wide):")
+        st.json(get_http_pool_settings())
+
+    with st.expander("🔀 Model Routing Statistics", expanded=False):
+        if st.session_state.get('routing_stats'):
+            st.dataframe([
+                {
+                    'model': model,
+                    'attempts': stats['attempts'],
+                    'success rate': f"{stats['passed'] / stats['attempts']:.0%}",
+                    'avg latency (s)': round(stats['total_seconds'] / stats['attempts'], 2)
+                }
+                for model, stats in st.session_state.routing_stats.items()
+            ])
+        else:
+            st.info("No routed API calls made yet.")
+
+    with st.expander("🖼️ Image Bytes per Page", expanded=False):
+        if st.session_state.get('image_encoding_report'):
+            report = st.session_state.image_encoding_report
+            total_bytes = sum(entry['bytes'] for entry in report)
+            st.metric("Total Image Bytes", f"{total_bytes / 1024:.0f} KB")
+            baseline_bytes = sum(entry.get('baseline_bytes', 0) for entry in report)
+            if baseline_bytes and all('baseline_bytes' in entry for entry in report):
+                st.write(f"RGB JPEG would have been {baseline_bytes / 1024:.0f} KB "
+                         f"({baseline_bytes / max(total_bytes, 1):.1f}× larger)")
+            st.dataframe(report)
+        else:
+            st.info("No images were encoded in the last processing run.")
+        if st.session_state.get('peak_memory_mb') is not None:
+            st.metric("Peak Memory During Run", f"{st.session_state.peak_memory_mb:.0f} MB",
+                      help="Highest resident memory of the app process while the last run was processing")
+
+    with st.expander("🗜️ PDF Slimming", expanded=False):
+        if st.session_state.get('pdf_slimming_report'):
+            report = st.session_state.pdf_slimming_report
+            bytes_before = sum(entry['bytes_before'] for entry in report)
+            bytes_after = sum(entry['bytes_after'] for entry in report)
+            st.metric("PDF Bytes Sent", f"{bytes_after / 1024:.0f} KB",
+                      delta=f"-{(bytes_before - bytes_after) / 1024:.0f} KB", delta_color="inverse")
+            st.write(f"Originals were {bytes_before / 1024:.0f} KB "
+                     f"({bytes_before / max(bytes_after, 1):.1f}× larger)")
+            st.dataframe(report)
+        else:
+            st.info("No PDFs were slimmed in the last processing run.")
+
+    with st.expander("🔁 Skipped Duplicate Pages", expanded=False):
+        if st.session_state.get('skipped_pages'):
+            for skipped in st.session_state.skipped_pages:
+                st.write(f"- {skipped['filename']} page {skipped['page']} (matches {skipped['duplicate_of']})")
+        else:
+            st.info("No pages were skipped in the last processing run.")
+
     with st.expander("⚠️ Problematic Files", expanded=True):
         if hasattr(st.session_state, 'problematic_files') and st.session_state.problematic_files:
             for file_log in st.session_state.problematic_files:
@@ -0,0 +1,63 @@
+"""Results history tab UI component for the PDF Parser application."""
+
+import io
+import streamlit as st
+
+from src.utils.results_store import get_results_store, results_to_dataframe
+
+# Rows shown per page; exports are not limited
+MAX_DISPLAY_ROWS = 1000
+
+def render_history_tab():
+    """Render the tab for querying and exporting stored results."""
+    st.title('Results History')
+    store = get_results_store()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        template = st.selectbox("Template", options=["All"] + store.templates(), key="history_template")
+    with col2:
+        account_number = st.text_input("Account Number", key="history_account").strip()
+
+    col3, col4, col5 = st.columns([1, 2, 2])
+    with col3:
+        filter_period = st.checkbox("Filter by billing period", value=False, key="history_filter_period")
+    with col4:
+        period_from = st.date_input("Period start on or after", disabled=not filter_period, key="history_from")
+    with col5:
+        period_to = st.date_input("Period end on or before", disabled=not filter_period, key="history_to")
+
+    filters = dict(
+        template=None if template == "All" else template,
+        account_number=account_number or None,
+        period_from=period_from.isoformat() if filter_period else None,
+        period_to=period_to.isoformat() if filter_period else None
+    )
+    total = store.count(**filters)
+    if not total:
+        st.info("No stored results match these filters.")
+        return
+
+    st.write(f"{total} stored bill{'s' if total > 1 else ''}")
+    page_count = (total + MAX_DISPLAY_ROWS - 1) // MAX_DISPLAY_ROWS
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Page (of {page_count}, {MAX_DISPLAY_ROWS} rows each)", min_value=1,
+                               max_value=page_count, value=1, key="history_page")
+    # Only the rows shown are read and decoded
+    results = store.query(**filters, limit=MAX_DISPLAY_ROWS, offset=(page - 1) * MAX_DISPLAY_ROWS)
+    st.dataframe(results_to_dataframe(results).drop(columns=['_id']))
+
+    # Exports read every matching row, so they are only built on request
+    col6, col7 = st.columns(2)
+    with col6:
+        if st.button('Prepare CSV Export', key='history_prepare_csv'):
+            df = results_to_dataframe(store.query(**filters)).drop(columns=['_id'])
+            st.download_button('Download CSV', df.to_csv(index=False), 'results_history.csv', mime='text/csv')
+    with col7:
+        if st.button('Prepare Excel Export', key='history_prepare_excel'):
+            df = results_to_dataframe(store.query(**filters)).drop(columns=['_id'])
+            excel_buffer = io.BytesIO()
+            df.to_excel(excel_buffer, index=False, sheet_name='Extracted Data')
+            st.download_button('Download Excel', excel_buffer.getvalue(), 'results_history.xlsx',
+                               mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -1,15 +1,107 @@
 """Main tab UI component for the PDF Parser application."""
 
 import os
-import io
-import json
-import pandas as pd
 import streamlit as st
-from anthropic import Anthropic
 
-from src.config.templates import TEMPLATES
+from src.config.templates import REQUIRED_FIELDS, TEMPLATES
 from src.config.examples import CALCULATIONS_EXAMPLES, SIMPLE_EXAMPLES
+from src.jobs.queue import DONE, FAILED as TASK_FAILED, get_work_queue
+from src.jobs.runner import CANCELLED, FAILED, get_job_runner
+from src.pdf.documents import InputDocument
 from src.pdf.parser import process_pdf_files
+from src.pdf.prompts import build_extraction_tool, build_prompt, build_tool_prompt
+
+def collect_job_results(job):
+    """Copy a finished job's results and diagnostics into session state."""
+    for key, value in job.state.items():
+        if key == 'messages':
+            continue
+        if key == 'problematic_files':
+            st.session_state.setdefault('problematic_files', []).extend(value)
+        elif key == 'routing_stats':
+            session_stats = st.session_state.setdefault('routing_stats', {})
+            for model, stats in value.items():
+                totals = session_stats.setdefault(model, {'attempts': 0, 'passed': 0, 'total_seconds': 0.0})
+                for name in totals:
+                    totals[name] += stats[name]
+        else:
+            st.session_state[key] = value
+    if job.result is not None:
+        st.session_state.results_df = job.result
+
+@st.fragment(run_every=2)
+def render_job_status():
+    """Poll the active processing job and show its progress."""
+    job_id = st.session_state.get('active_job_id')
+    if not job_id:
+        return
+    job = get_job_runner().get(job_id)
+    if job is None:
+        st.session_state.job_messages = [('warning', "The processing job is no longer available.")]
+        finish_job_tracking()
+        return
+
+    if not job.finished:
+        st.markdown(f"Processing files ({job.processed} out of {job.total})...")
+        st.progress(job.progress)
+        if job.cancel_event.is_set():
+            st.info("Cancelling after the current file...")
+        elif st.button("Cancel", key=f"cancel_job_{job.id}"):
+            job.cancel()
+        return
+
+    # Finished: hand results and messages to the session and rerun the full page
+    messages = list(job.state.get('messages', []))
+    if job.status == FAILED:
+        messages.append(('error', f"Error initializing PDF processing: {job.error.splitlines()[0]}"))
+    elif job.result is not None:
+        processed = len(job.result)
+        cancelled = " (cancelled before the remaining files)" if job.status == CANCELLED else ""
+        messages.append(('success', f"Successfully processed {processed} file{'s' if processed > 1 else ''}!{cancelled}"))
+    else:
+        messages.append(('error', "No data was successfully extracted from the files."))
+    st.session_state.job_messages = messages
+
+    collect_job_results(job)
+    finish_job_tracking()
+
+def finish_job_tracking():
+    """Stop tracking the active job and rerun the page to show its outcome."""
+    st.session_state.active_job_id = None
+    st.query_params.pop('job', None)
+    st.rerun()
+
+@st.fragment(run_every=5)
+def render_queue_status():
+    """Poll the batch handed to worker processes and load its results when done."""
+    batch_id = st.session_state.get('queue_batch_id')
+    if not batch_id:
+        return
+    queue = get_work_queue()
+    counts = queue.batch_status(batch_id)
+    finished = counts[DONE] + counts[TASK_FAILED]
+    if finished < counts['total']:
+        st.markdown(f"Workers finished {finished} out of {counts['total']} queued files...")
+        st.progress(finished / counts['total'])
+        st.caption("Start workers with `python -m src.jobs.worker`; each one processes a file at a time.")
+        if not st.button("Abandon Batch", key=f"abandon_batch_{batch_id}",
+                         help="Stop waiting for the workers; files already finished are still loaded"):
+            return
+        queue.abandon_batch(batch_id)
+
+    results, failures = queue.batch_results(batch_id)
+    messages = [('error', f"Error processing {failure['filename']}: {failure['response']}") for failure in failures]
+    st.session_state.setdefault('problematic_files', []).extend(failures)
+    if results:
+        import pandas as pd
+        df = pd.DataFrame(results)
+        st.session_state.results_df = df[['filename'] + [col for col in df.columns if col != 'filename']]
+        messages.append(('success', f"Successfully processed {len(results)} file{'s' if len(results) > 1 else ''}!"))
+    else:
+        messages.append(('error', "No data was successfully extracted from the files."))
+    st.session_state.job_messages = messages
+    st.session_state.queue_batch_id = None
+    st.rerun()
 
 def render_main_tab():
     """Render the main bill parsing tab."""
@@ -42,15 +134,57 @@ def render_main_tab():
         image_format = st.selectbox(
             "Image Format",
             options=[
-                ("JPEG (Lower Quality)", False),
-                ("PNG (Higher Quality)", True)
+                ("JPEG (Lower Quality)", "jpeg"),
+                ("PNG (Higher Quality)", "png"),
+                ("Auto (Smallest per Page)", "auto")
             ],
             format_func=lambda x: x[0],
             disabled=not use_vision,
             help="Select the image format for PDF conversion",
             key="image_format"
         )
-        use_png = image_format[1] if use_vision else False
+        use_png = use_vision and image_format[1] == "png"
+        adaptive_encoding = use_vision and image_format[1] == "auto"
+    
+    col6, col7 = st.columns([2, 4])
+    with col6:
+        skip_duplicate_pages = st.checkbox("Skip repeated pages", value=False, disabled=not use_vision,
+                                           help="Don't send pages (terms, inserts, stubs) that match a page already sent in this batch")
+    with col7:
+        dedup_similarity = st.slider("Page similarity threshold", min_value=0.90, max_value=1.0, value=1.0,
+                                     step=0.005, disabled=not (use_vision and skip_duplicate_pages),
+                                     help="1.0 skips only exact repeats. Lower values also skip near-identical pages "
+                                          "(scan noise, re-rendered pages): 0.99 lets 0.1% of a page's pixels differ, "
+                                          "0.90 lets 1% differ, enough for a page with a few changed figures to be skipped")
+    
+    crop_regions = st.checkbox("Crop to charge regions", value=False, disabled=not use_vision,
+                               help="Send full-resolution crops of the regions holding the fields plus a low-resolution page overview instead of whole pages")
+    
+    pack_small_bills = st.checkbox("Pack small bills into shared requests", value=False,
+                                   help="Send several short bills per API call so the prompt and examples are sent once per group")
+    
+    use_model_routing = st.checkbox("Try fast model first", value=False,
+                                    help="Send each bill to a faster, cheaper model and only escalate to the larger model when the result fails validation")
+    
+    use_structured_output = st.checkbox("Structured output (tool schema)", value=False,
+                                        help="Have Claude fill a tool schema generated from the fields instead of writing JSON text")
+    
+    use_files_api = st.checkbox("Upload PDFs once via Files API", value=False, key="use_files_api",
+                                disabled=use_vision,
+                                help="Upload each distinct PDF once and reference it by file ID instead of re-sending it with every request")
+    
+    col8, col9 = st.columns([2, 4])
+    with col8:
+        slim_pdfs = st.checkbox("Slim PDFs before sending", value=False, disabled=use_vision,
+                                help="Drop unused objects, fonts and images and compress streams before each PDF is sent")
+    with col9:
+        max_image_dpi = st.number_input("Downsample embedded images above (DPI, 0 = keep)", min_value=0, max_value=600,
+                                        value=0, step=50, disabled=use_vision or not slim_pdfs)
+    slim_pdfs = slim_pdfs and not use_vision
+    max_image_dpi = int(max_image_dpi) if slim_pdfs and max_image_dpi else None
+    
+    use_work_queue = st.checkbox("Send to worker queue", value=False,
+                                 help="Queue each file for separate worker processes (python -m src.jobs.worker) instead of processing here. Page deduplication and bill packing are not applied.")
     
     col4, col5 = st.columns([1, 2])
     with col4:
@@ -111,44 +245,14 @@ def render_main_tab():
         st.rerun()
 
     # Create the prompt string based on fields
-    field_dict = {field: "" for field, _ in st.session_state.fields if field}
-
-    tiered_calculation_instructions = """
-   a. Use the plain field name for the first tiers/instances/charges (e.g., "FIELD")
-   b. Add a suffix for each additional tiers/instances/charges (e.g., "FIELD_2", "FIELD_3")
-   c. If there is a total value stated, use it and add a '_Total' suffix for the total (e.g., "FIELD_Total")
-   d. If there isn't a clearly stated total, calculate and create one with the sum of the tiers/instances/charges. You MUST add a "CalcTotal" suffix to indicate it was calculated. (e.g., "FIELD_CalcTotal").""" if include_calculations else """
-   a. If there is a total value stated, use it and add a '_Total' suffix for the total (e.g., "FIELD_Total")
-   b. If there isn't a clearly stated total, calculate and create one with the sum of the tiers/instances/charges. You MUST add a "CalcTotal" suffix to indicate it was calculated. (e.g., "FIELD_CalcTotal")."""
-
-    prompt = f"""Your objective is to extract key information from this utility bill and present it in a standardized JSON format. Follow these steps:
-
-1. Carefully analyze the utility bill content.
-2. Identify and extract the required fields.
-3. Format the extracted information according to the specifications.
-4. Handle any tiered charges appropriately.
-5. Compile the final JSON output.
-
-Required Fields{f" to be extracted only for {meter_number}" if specify_meter and meter_number else ""}:
-{json.dumps(field_dict, indent=2)}
-
-Special Instructions:
-1. For charges that show multiple charges with the main part of the name identical but with seasonal suffixes (e.g., "Charge A Summer", "Charge A Winter"), or tiered charges (like water service charges), or multiple instances of the same charge (when a rate changes in the middle of the bill period), or any other case where the same charge is shown multiple times with different values, use the following instructions:{tiered_calculation_instructions}
-
-2. Formatting Rules:
-   - Each field should be a separate key at the root level of the JSON
-   - Do not nest the values in sub-objects
-   - Return each amount as a plain number
-   - Do not include gallons, rates, or date ranges
-
-3. If a field is not found in the bill, use null as the value.
-
-Return the data in this structure (while adding the proper suffixes for different tiers/instances/charges and totals):
-{json.dumps(field_dict, indent=2)}
-
-Remember to replace the null values with the actual extracted data or keep as null if the information is not found in the bill.
-
-Provide ONLY the JSON object as your final output, with no additional text."""
+    meter_filter = meter_number if specify_meter and meter_number else None
+    if use_structured_output:
+        extraction_tool = build_extraction_tool(st.session_state.fields)
+        prompt = build_tool_prompt(include_calculations, meter_filter)
+    else:
+        extraction_tool = None
+        prompt = build_prompt(st.session_state.fields, include_calculations, meter_filter)
+    st.session_state.prompt = prompt
 
     # File upload area
     if "file_uploader_key" not in st.session_state:
@@ -169,68 +273,98 @@ Provide ONLY the JSON object as your final output, with no additional text."""
                  help='Remove all uploaded files',
                  on_click=clear_files)
     
-    # Prepare split PDFs for processing
-    split_files_to_process = []
+    # Queue split PDFs for processing; content stays on disk until a file is processed
+    split_documents = []
     for split_pdf in list(st.session_state.split_pdfs_to_parse):  # Use list() to avoid modification during iteration
-        try:
-            file_path = os.path.join(os.getcwd(), split_pdf)
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as f:
-                    split_files_to_process.append(("split_pdf", split_pdf, f.read()))
-            else:
-                # File doesn't exist anymore, remove it from the list
-                st.session_state.split_pdfs_to_parse.remove(split_pdf)
-                st.warning(f"File {split_pdf} no longer exists and has been removed from processing queue.")
-        except Exception as e:
-            st.error(f"Error loading split PDF {split_pdf}: {str(e)}")
+        document = InputDocument.from_path(os.path.join(os.getcwd(), split_pdf))
+        if document.exists():
+            split_documents.append(document)
+        else:
+            # File doesn't exist anymore, remove it from the list
             st.session_state.split_pdfs_to_parse.remove(split_pdf)
-            continue
+            st.warning(f"File {split_pdf} no longer exists and has been removed from processing queue.")
 
     # Show split PDFs that will be processed
-    if split_files_to_process:
+    if split_documents:
         st.write("Split PDFs to be processed:")
-        for _, name, _ in split_files_to_process:
+        for document in split_documents:
             col1, col2 = st.columns([6, 1])
             with col1:
-                st.write(f"- {name}")
+                st.write(f"- {document.name} ({document.size / 1024:.0f} KB)")
             with col2:
-                if st.button("Remove", key=f"remove_from_parser_{name}"):
-                    st.session_state.split_pdfs_to_parse.remove(name)
+                if st.button("Remove", key=f"remove_from_parser_{document.name}"):
+                    st.session_state.split_pdfs_to_parse.remove(document.name)
                     st.rerun()
 
-    # Process Bills button
-    if st.button('Process Bills'):
-        if uploaded_files or split_files_to_process:
-            status_container = st.empty()
-            progress_bar = st.progress(0)
-            total_files = len(uploaded_files) + len(split_files_to_process)
-            status_container.markdown(f"Processing files (0 out of {total_files})...")
+    # Reattach to a running job, e.g. after reopening the app in a new browser tab
+    if not st.session_state.get('active_job_id') and st.query_params.get('job'):
+        st.session_state.active_job_id = st.query_params['job']
 
-            try:
-                # Process the files
-                df = process_pdf_files(
-                    uploaded_files, 
-                    split_files_to_process, 
-                    prompt, 
-                    include_calculations, 
-                    status_container=status_container, 
-                    progress_bar=progress_bar, 
-                    total_files=total_files,
-                    use_vision=use_vision,
-                    use_png=image_format[1] if use_vision else False
-                )
-                
-                if df is not None:
-                    status_container.success(f"Successfully processed {len(df)} file{'s' if len(df) > 1 else ''}!")
-                    st.session_state.results_df = df
-                else:
-                    status_container.error("No data was successfully extracted from the files.")
-
-            except Exception as e:
-                status_container.error(f"Error initializing PDF processing: {str(e)}")
+    # Process Bills button
+    job_running = bool(st.session_state.get('active_job_id') or st.session_state.get('queue_batch_id'))
+    if st.button('Process Bills', disabled=job_running):
+        documents = [InputDocument.from_upload(f) for f in uploaded_files] + split_documents
+        required_fields = [field for field in REQUIRED_FIELDS.get(template_name, [])
+                           if field in {name for name, _ in st.session_state.fields}]
+        field_names = [field for field, _ in st.session_state.fields if field]
+        if documents and use_work_queue:
+            # Hand the files to worker processes; results are collected when all are done
+            st.session_state.queue_batch_id = get_work_queue().enqueue_batch(documents, {
+                'prompt': prompt,
+                'include_calculations': include_calculations,
+                'use_vision': use_vision,
+                'use_png': use_png,
+                'adaptive_encoding': adaptive_encoding,
+                'use_files_api': use_files_api and not use_vision,
+                'use_model_routing': use_model_routing,
+                'required_fields': required_fields,
+                'field_names': field_names,
+                'extraction_tool': extraction_tool,
+                'template_name': template_name,
+                'crop_regions': use_vision and crop_regions,
+                'slim_pdfs': slim_pdfs,
+                'max_image_dpi': max_image_dpi
+            })
+            st.rerun()
+        elif documents:
+            # Run the batch in the background so the UI stays responsive
+            job = get_job_runner().submit(
+                f"{len(documents)} file{'s' if len(documents) > 1 else ''} with {template_name}",
+                process_pdf_files,
+                documents, 
+                prompt, 
+                include_calculations, 
+                total=len(documents),
+                use_vision=use_vision,
+                use_png=use_png,
+                adaptive_encoding=adaptive_encoding,
+                use_files_api=use_files_api and not use_vision,
+                dedup_similarity=dedup_similarity if use_vision and skip_duplicate_pages else None,
+                pack_small_bills=pack_small_bills,
+                use_model_routing=use_model_routing,
+                required_fields=required_fields,
+                field_names=field_names,
+                extraction_tool=extraction_tool,
+                template_name=template_name,
+                crop_regions=crop_regions,
+                slim_pdfs=slim_pdfs,
+                max_image_dpi=max_image_dpi
+            )
+            st.session_state.active_job_id = job.id
+            st.query_params['job'] = job.id
+            st.rerun()
         else:
             st.warning("Please upload files or select split PDFs to process.")
 
+    if st.session_state.get('active_job_id'):
+        render_job_status()
+    if st.session_state.get('queue_batch_id'):
+        render_queue_status()
+
+    # Messages from the last finished job are shown once
+    for level, message in st.session_state.pop('job_messages', []):
+        getattr(st, level)(message)
+
     # Display results if available
     if hasattr(st.session_state, 'results_df'):
         # Get the original field order from session state
@@ -279,6 +413,7 @@ Provide ONLY the JSON object as your final output, with no additional text."""
         df_sorted = st.session_state.results_df[sorted_columns]
         
         # Create Excel file with sorted columns
+        import pandas as pd
         excel_buffer = pd.ExcelWriter('results.xlsx', engine='openpyxl')
         df_sorted.to_excel(excel_buffer, index=False, sheet_name='Extracted Data')
 
@@ -2,7 +2,181 @@
 
 import os
 import streamlit as st
-from src.pdf.splitter import split_pdf, validate_page_ranges, get_pdf_page_count
+from src.pdf.documents import InputDocument
+from src.pdf.manifest import load_manifest, run_manifest_splits, validate_manifest
+from src.pdf.render import document_hash, get_page_count, render_page_thumbnail
+from src.pdf.slimming import DEFAULT_MAX_IMAGE_DPI
+from src.pdf.splitter import build_split_zip, split_pdf, validate_page_ranges, get_pdf_page_count, pages_to_ranges
+
+# Number of page thumbnails rendered per strip page
+THUMBNAILS_PER_PAGE = 12
+THUMBNAIL_COLUMNS = 6
+
+# Manifest validation errors listed at most; the rest are counted
+MAX_LISTED_ERRORS = 20
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def get_page_thumbnail(doc_hash, page_index, _pdf_bytes):
+    """Render a page thumbnail, cached by document hash and page."""
+    return render_page_thumbnail(_pdf_bytes, page_index)
+
+def toggle_page_selection(page_num):
+    """Add or remove a page from the thumbnail selection."""
+    selected = st.session_state.selected_split_pages
+    if page_num in selected:
+        selected.remove(page_num)
+    else:
+        selected.add(page_num)
+
+def add_selected_pages_to_group(group_idx):
+    """Append the selected pages as page ranges to a group and clear the selection."""
+    group = st.session_state.page_ranges_groups[group_idx]
+    ranges = [r for r in group['ranges'] if r[0] or r[1]]
+    ranges.extend((str(start), str(end)) for start, end in pages_to_ranges(st.session_state.selected_split_pages))
+    group['ranges'] = ranges
+    # Range inputs keep their own widget state, so seed them with the new values
+    for i, (start, end) in enumerate(ranges):
+        st.session_state[f"start_range_{group_idx}_{i}"] = start
+        st.session_state[f"end_range_{group_idx}_{i}"] = end
+    # Untick the thumbnails that were just added
+    for page_num in st.session_state.selected_split_pages:
+        st.session_state.pop(f"thumb_select_{st.session_state.current_pdf_hash[:12]}_{page_num}", None)
+    st.session_state.selected_split_pages = set()
+
+def render_thumbnail_strip(uploaded_pdf):
+    """Render a paginated strip of page thumbnails with page selection.
+    
+    Only the thumbnails on the visible strip page are rendered, so large PDFs
+    cost no more than small ones.
+    
+    Args:
+        uploaded_pdf: The uploaded PDF file
+    """
+    pdf_bytes = uploaded_pdf.getvalue()
+    doc_hash = st.session_state.current_pdf_hash
+    page_count = st.session_state.page_count
+    strip_pages = (page_count + THUMBNAILS_PER_PAGE - 1) // THUMBNAILS_PER_PAGE
+
+    with st.expander("Page Thumbnails", expanded=False):
+        strip_page = 1
+        if strip_pages > 1:
+            strip_page = st.number_input(f"Thumbnail page (of {strip_pages})", min_value=1,
+                                         max_value=strip_pages, value=1, key="thumbnail_strip_page")
+        first_page = (strip_page - 1) * THUMBNAILS_PER_PAGE + 1
+        last_page = min(first_page + THUMBNAILS_PER_PAGE - 1, page_count)
+
+        cols = st.columns(THUMBNAIL_COLUMNS)
+        for page_num in range(first_page, last_page + 1):
+            with cols[(page_num - first_page) % THUMBNAIL_COLUMNS]:
+                st.image(get_page_thumbnail(doc_hash, page_num - 1, pdf_bytes), use_column_width=True)
+                st.checkbox(f"Page {page_num}",
+                            value=page_num in st.session_state.selected_split_pages,
+                            key=f"thumb_select_{doc_hash[:12]}_{page_num}",
+                            on_change=toggle_page_selection, args=(page_num,))
+
+        selected = st.session_state.selected_split_pages
+        if selected:
+            ranges_str = ", ".join(f"{start}-{end}" for start, end in pages_to_ranges(selected))
+            st.write(f"Selected pages: {ranges_str}")
+            col1, col2 = st.columns([3, 2])
+            with col1:
+                group_idx = st.selectbox(
+                    "Add to group",
+                    options=range(len(st.session_state.page_ranges_groups)),
+                    format_func=lambda idx: st.session_state.page_ranges_groups[idx]['name'],
+                    key="thumbnail_target_group"
+                )
+            with col2:
+                st.button("Add Selected Pages", key="add_selected_pages_btn", use_container_width=True,
+                          on_click=add_selected_pages_to_group, args=(group_idx,))
+
+def get_valid_group_ranges():
+    """Validate the filled page ranges of every group.
+    
+    Returns:
+        (valid_ranges_by_group, error_messages)
+    """
+    valid_ranges_by_group = []
+    error_messages = []
+    for group in st.session_state.page_ranges_groups:
+        valid_ranges, errors = validate_page_ranges(
+            [r for r in group['ranges'] if r[0] and r[1]],  # Only process filled ranges
+            st.session_state.page_count
+        )
+        if valid_ranges:
+            valid_ranges_by_group.append((group['name'], valid_ranges))
+        error_messages.extend(f"{error} in {group['name']}" for error in errors)
+    return valid_ranges_by_group, error_messages
+
+def render_bulk_split():
+    """Render the manifest-driven bulk split area.
+    
+    Every manifest row is validated before anything is split. Sources are
+    then split in parallel worker processes, and each source's outputs are
+    listed (and optionally sent to the parser) as soon as it is done.
+    """
+    with st.expander("Bulk Split from Manifest", expanded=False):
+        st.write("Upload a CSV or JSON manifest with a source, name and pages for each PDF to create, "
+                 "along with its source PDFs.")
+        manifest_file = st.file_uploader("Split manifest", type=['csv', 'json'], key="split_manifest")
+        source_files = st.file_uploader("Source PDFs", type=['pdf'], accept_multiple_files=True, key="manifest_sources")
+        send_to_parser = st.checkbox("Send created PDFs to the parser", value=True, key="manifest_send_to_parser")
+        downsample_images = st.checkbox(f"Downsample embedded images to {DEFAULT_MAX_IMAGE_DPI} DPI", value=False,
+                                        key="manifest_downsample_images")
+
+        if not manifest_file:
+            return
+        try:
+            manifest = load_manifest(manifest_file.getvalue(), manifest_file.name)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+        sources = {f.name: InputDocument.from_upload(f) for f in source_files or []}
+
+        source_names = {row['source'] for row in manifest}
+        st.write(f"{len(manifest)} PDF{'s' if len(manifest) != 1 else ''} to create from "
+                 f"{len(source_names)} source{'s' if len(source_names) != 1 else ''}")
+
+        if not st.button("Split All", key="manifest_split_btn", disabled=not manifest):
+            return
+
+        # Validate every row up front, so a bad row never leaves a job half done
+        page_counts = {}
+        error_messages = []
+        with st.spinner("Validating manifest..."):
+            for name in source_names & sources.keys():
+                try:
+                    page_counts[name] = get_page_count(sources[name].getvalue())
+                except Exception as e:
+                    error_messages.append(f"Source {name} could not be read: {str(e)}")
+            jobs, row_errors = validate_manifest(manifest, page_counts)
+        error_messages.extend(row_errors)
+        if error_messages:
+            for msg in error_messages[:MAX_LISTED_ERRORS]:
+                st.error(msg)
+            if len(error_messages) > MAX_LISTED_ERRORS:
+                st.error(f"...and {len(error_messages) - MAX_LISTED_ERRORS} more problems")
+            return
+
+        progress = st.progress(0.0, text="Splitting...")
+        failures = []
+        results = run_manifest_splits(jobs, sources, max_image_dpi=DEFAULT_MAX_IMAGE_DPI if downsample_images else None)
+        for done, (source_name, created_files, error) in enumerate(results, 1):
+            if error:
+                failures.append(f"{source_name}: {error}")
+            for filename in created_files:
+                if filename not in st.session_state.created_pdfs:
+                    st.session_state.created_pdfs.append(filename)
+                if send_to_parser and filename not in st.session_state.split_pdfs_to_parse:
+                    st.session_state.split_pdfs_to_parse.append(filename)
+            progress.progress(done / len(jobs), text=f"Split {done} of {len(jobs)} sources")
+
+        if failures:
+            for failure in failures:
+                st.error(failure)
+        else:
+            st.rerun()
 
 def render_split_tab():
     """Render the PDF splitting tab."""
@@ -44,6 +218,10 @@ def render_split_tab():
         st.session_state.page_count = 0
     if 'split_pdfs_to_parse' not in st.session_state:
         st.session_state.split_pdfs_to_parse = []
+    if 'selected_split_pages' not in st.session_state:
+        st.session_state.selected_split_pages = set()
+
+    render_bulk_split()
 
     # File upload area
     uploaded_pdf = st.file_uploader("Upload PDF", type=['pdf'], key="pdf_splitter")
@@ -53,10 +231,15 @@ def render_split_tab():
         if st.session_state.current_pdf != uploaded_pdf.name:
             st.session_state.page_count = get_pdf_page_count(uploaded_pdf)
             st.session_state.current_pdf = uploaded_pdf.name
+            st.session_state.current_pdf_hash = document_hash(uploaded_pdf.getvalue())
+            st.session_state.selected_split_pages = set()
 
         # Display total page count
         st.write(f"Total pages: {st.session_state.page_count}")
 
+        # Page thumbnails for picking ranges visually
+        render_thumbnail_strip(uploaded_pdf)
+
         # Add "New Group" button at the top
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
@@ -164,24 +347,25 @@ def render_split_tab():
 
         st.markdown("<br>", unsafe_allow_html=True)
 
+        col1, col2 = st.columns(2)
+        with col1:
+            slim_split_pdfs = st.checkbox("Slim split PDFs", value=True, key="split_slim_pdfs",
+                                          help="Keep only the fonts, images and objects each split PDF's own pages use")
+        with col2:
+            downsample_images = st.checkbox(f"Downsample embedded images to {DEFAULT_MAX_IMAGE_DPI} DPI", value=False,
+                                            key="split_downsample_images", disabled=not slim_split_pdfs,
+                                            help="Shrink scanned pages and photos in the split PDFs; text and vector content are kept as-is")
+        max_image_dpi = DEFAULT_MAX_IMAGE_DPI if slim_split_pdfs and downsample_images else None
+        has_ranges = any(any(start and end for start, end in group['ranges'])
+                         for group in st.session_state.page_ranges_groups)
+
         # Create PDFs button
         button_label = "Create PDFs" if len(st.session_state.page_ranges_groups) > 1 else "Create PDF"
         if st.button(button_label, key="create_pdf_btn", 
                     use_container_width=True,
-                    disabled=not any(any(start and end for start, end in group['ranges']) 
-                                   for group in st.session_state.page_ranges_groups)):
-            valid_ranges_by_group = []
-            error_messages = []
-
+                    disabled=not has_ranges):
             # Validate ranges for each group
-            for group in st.session_state.page_ranges_groups:
-                valid_ranges, errors = validate_page_ranges(
-                    [r for r in group['ranges'] if r[0] and r[1]],  # Only process filled ranges
-                    st.session_state.page_count
-                )
-                if valid_ranges:
-                    valid_ranges_by_group.append((group['name'], valid_ranges))
-                error_messages.extend(f"{error} in {group['name']}" for error in errors)
+            valid_ranges_by_group, error_messages = get_valid_group_ranges()
 
             if error_messages:
                 for msg in error_messages:
@@ -189,7 +373,10 @@ def render_split_tab():
             else:
                 try:
                     # Create new PDFs
-                    created_files = split_pdf(uploaded_pdf, valid_ranges_by_group)
+                    size_report = []
+                    created_files = split_pdf(uploaded_pdf, valid_ranges_by_group, max_image_dpi=max_image_dpi,
+                                              size_report=size_report, slim=slim_split_pdfs)
+                    st.session_state.split_size_report = size_report
                     
                     # Update session state
                     for filename in created_files:
@@ -202,11 +389,39 @@ def render_split_tab():
                 except Exception as e:
                     st.error(f"Error creating PDFs: {str(e)}")
 
+        # The ZIP is generated straight from the source and ranges; nothing is written to disk
+        if st.button("Prepare ZIP Download", key="split_zip_btn", use_container_width=True, disabled=not has_ranges):
+            valid_ranges_by_group, error_messages = get_valid_group_ranges()
+            if error_messages:
+                for msg in error_messages:
+                    st.error(msg)
+            else:
+                try:
+                    size_report = []
+                    with st.spinner("Building ZIP..."):
+                        zip_bytes = build_split_zip(uploaded_pdf, valid_ranges_by_group, slim_split_pdfs,
+                                                    max_image_dpi, size_report)
+                    bytes_after = sum(entry['bytes_after'] for entry in size_report)
+                    st.caption(f"{len(size_report)} PDF{'s' if len(size_report) > 1 else ''}, "
+                               f"{bytes_after / 1024:.0f} KB before compression, {len(zip_bytes) / 1024:.0f} KB zipped")
+                    st.download_button("Download ZIP", zip_bytes,
+                                       f"split_{os.path.splitext(uploaded_pdf.name)[0]}.zip",
+                                       mime="application/zip", key="split_zip_download", use_container_width=True)
+                except Exception as e:
+                    st.error(f"Error creating ZIP: {str(e)}")
+
     # Display created PDFs
     if st.session_state.created_pdfs:
         st.markdown("---")
         st.subheader("Created PDFs")
         
+        size_report = st.session_state.get('split_size_report')
+        if size_report:
+            bytes_before = sum(entry['bytes_before'] for entry in size_report)
+            bytes_after = sum(entry['bytes_after'] for entry in size_report)
+            if bytes_after < bytes_before:
+                st.caption(f"Last split: {bytes_after / 1024:.0f} KB after slimming, down from {bytes_before / 1024:.0f} KB")
+        
         for pdf_name in st.session_state.created_pdfs:
             col1, col2, col3 = st.columns([6, 2, 2])
             with col1:
@@ -1,15 +1,17 @@
 """API utility functions for the PDF Parser application."""
 
 import base64
+import hashlib
 import json
 import math
-import streamlit as st
 from datetime import datetime
 from typing import Any
 
 from src.config.examples import CALCULATIONS_EXAMPLES, SIMPLE_EXAMPLES
+from src.config.models import DEFAULT_MODEL
+from src.utils.file_registry import get_file_registry
 
-def preview_api_call(uploaded_files, prompt, include_calculations):
+def preview_api_call(uploaded_files, prompt, include_calculations, use_files_api=False):
     """Generate a preview of the API call that would be sent"""
     # Show preview for first file only since files are processed individually
     if not uploaded_files:
@@ -17,19 +19,26 @@ def preview_api_call(uploaded_files, prompt, include_calculations):
     
     pdf_file = uploaded_files[0]
     
-    # Actually encode the PDF content for the preview
-    pdf_base64 = base64.b64encode(pdf_file.read()).decode()
-    pdf_file.seek(0)  # Reset file pointer after reading
+    if use_files_api:
+        # Reference the registered upload without encoding or uploading anything
+        content_hash = hashlib.sha256(pdf_file.getvalue()).hexdigest()
+        source = {
+            "type": "file",
+            "file_id": get_file_registry().lookup(content_hash) or "<uploaded on first request>"
+        }
+    else:
+        # Actually encode the PDF content for the preview
+        source = {
+            "type": "base64",
+            "media_type": "application/pdf",
+            "data": base64.b64encode(pdf_file.getvalue()).decode()  # Use actual encoded content instead of placeholder
+        }
     
     # Prepare message content for single PDF
     message_content = [
         {
             "type": "document",
-            "source": {
-                "type": "base64",
-                "media_type": "application/pdf",
-                "data": pdf_base64  # Use actual encoded content instead of placeholder
-            }
+            "source": source
         },
         {
             "type": "text",
@@ -43,7 +52,7 @@ def preview_api_call(uploaded_files, prompt, include_calculations):
 
     # Construct the full API call preview
     api_call_preview = {
-        "model": "claude-3-5-sonnet-20241022",
+        "model": DEFAULT_MODEL,
         "max_tokens": 8192,
         "temperature": 0,
         "system": "You are an expert utility bill analyst AI specializing in data extraction and standardization. Your primary responsibilities include:\n\n1. Accurately extracting specific fields from utility bills\n2. Handling complex cases such as tiered charges\n3. Maintaining consistent data formatting\n4. Returning data in a standardized JSON format\n\nYour expertise allows you to navigate complex billing structures, identify relevant information quickly, and standardize data in various utility bill formats. You are meticulous in following instructions and maintaining data integrity throughout the extraction and formatting process.",
@@ -76,34 +85,20 @@ def count_tokens(client, prompt, include_calculations):
     ]
     
     try:
-        # Use the client's direct request method
-        response = client._client.post(
-            "https://api.anthropic.com/v1/messages/count_tokens",
-            json={
-                "model": "claude-3-5-sonnet-20241022",
-                "system": "You are an expert utility bill analyst AI specializing in data extraction and standardization. Your primary responsibilities include:\n\n1. Accurately extracting specific fields from utility bills\n2. Handling complex cases such as tiered charges and multiple instances of the same charge\n3. Maintaining consistent data formatting\n4. Returning data in a standardized JSON format\n\nYour expertise allows you to navigate complex billing structures, identify relevant information quickly, and standardize data in various utility bill formats. You are meticulous in following instructions and maintaining data integrity throughout the extraction and formatting process.",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": message_content
-                    }
-                ],
-                "tools": []  # Include empty tools array as per spec
-            },
-            headers={
-                "x-api-key": st.secrets["ANTHROPIC_API_KEY"],
-                "anthropic-beta": "token-counting-2024-11-01",
-                "anthropic-version": "2023-06-01"
-            }
+        # Goes through the client's shared connection pool and default headers
+        response = client.messages.count_tokens(
+            model=DEFAULT_MODEL,
+            system="You are an expert utility bill analyst AI specializing in data extraction and standardization. Your primary responsibilities include:\n\n1. Accurately extracting specific fields from utility bills\n2. Handling complex cases such as tiered charges and multiple instances of the same charge\n3. Maintaining consistent data formatting\n4. Returning data in a standardized JSON format\n\nYour expertise allows you to navigate complex billing structures, identify relevant information quickly, and standardize data in various utility bill formats. You are meticulous in following instructions and maintaining data integrity throughout the extraction and formatting process.",
+            messages=[
+                {
+                    "role": "user",
+                    "content": message_content
+                }
+            ]
         )
         
-        # Print response for debugging
-        print("API Response:", response.text)
-        
-        result = response.json()
-        
         # Return the raw result instead of trying to access input_tokens
-        return result
+        return response.model_dump()
         
     except Exception as e:
         # Wrap any errors with more context
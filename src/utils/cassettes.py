@@ -0,0 +1,232 @@
+"""API request recording and replay for the PDF Parser application.
+
+Point PDF_PARSER_CASSETTE at a cassette file and set PDF_PARSER_CASSETTE_MODE
+to ``record`` to capture the fingerprint and full response of every API
+request while the app, a worker or a benchmark runs as usual, or to
+``replay`` to serve those responses back without touching the network:
+
+    PDF_PARSER_CASSETTE=cassettes/water.jsonl PDF_PARSER_CASSETTE_MODE=record streamlit run app.py
+    PDF_PARSER_CASSETTE=cassettes/water.jsonl PDF_PARSER_CASSETTE_MODE=replay streamlit run app.py
+
+Replayed responses are returned immediately unless PDF_PARSER_REPLAY_LATENCY
+is set to a multiple of the recorded latency (1 replays it as recorded).
+
+Requests are captured at the HTTP transport, so the SDK parses replayed
+responses exactly like live ones and every API call (messages, Files API
+uploads) is covered. A request's fingerprint covers its method, path, beta
+headers and canonicalized body; the API key is not part of it, so replays
+need no key. Re-recording appends to a cassette; delete it to start over.
+
+tests/test_replay_pipeline.py replays a committed cassette through
+process_pdf_files as a regression test, and benchmarks/replay_pipeline.py
+uses cassettes to profile the pipeline offline.
+"""
+
+import base64
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import httpx
+
+CASSETTE_ENV = "PDF_PARSER_CASSETTE"
+CASSETTE_MODE_ENV = "PDF_PARSER_CASSETTE_MODE"
+REPLAY_LATENCY_ENV = "PDF_PARSER_REPLAY_LATENCY"
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Request headers that change what the API does, and so are part of the fingerprint
+FINGERPRINT_HEADERS = ('anthropic-beta', 'anthropic-version')
+
+# Response headers not stored: bodies are stored decoded, and the rest describe the live connection
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'date', 'set-cookie'}
+
+# Rate limits and overloads are not recorded; the SDK's retry of the request is
+TRANSIENT_STATUS = 429
+
+def get_cassette_settings():
+    """Get the cassette configured through the environment.
+
+    Returns:
+        (path, mode, latency_scale), or None when no cassette is configured
+
+    Raises:
+        ValueError: If the mode is not record or replay
+    """
+    path = os.environ.get(CASSETTE_ENV)
+    if not path:
+        return None
+    mode = os.environ.get(CASSETTE_MODE_ENV, REPLAY).lower()
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"{CASSETTE_MODE_ENV} must be '{RECORD}' or '{REPLAY}', not '{mode}'")
+    return path, mode, float(os.environ.get(REPLAY_LATENCY_ENV) or 0)
+
+def is_replaying():
+    """Check whether API responses are served from a cassette."""
+    settings = get_cassette_settings()
+    return settings is not None and settings[1] == REPLAY
+
+def request_fingerprint(request):
+    """Get the fingerprint a request is recorded and looked up under.
+
+    JSON bodies are canonicalized and multipart boundaries (random per
+    request) are normalized, so equal requests always match.
+
+    Args:
+        request: The httpx.Request
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    body = request.read()
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('application/json') and body:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode()
+    elif 'boundary=' in content_type:
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        body = body.replace(boundary, b'boundary')
+
+    digest = hashlib.sha256(f"{request.method} {request.url.raw_path.decode()}\n".encode())
+    for name in FINGERPRINT_HEADERS:
+        digest.update(f"{name}: {request.headers.get(name, '')}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+class Cassette:
+    """Recorded API interactions, stored one JSON object per line.
+
+    A request made more than once gets its recordings back in order, then
+    the last one again, so a cassette can be replayed any number of times.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions = {}
+        self._replayed = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._interactions.setdefault(entry['fingerprint'], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._interactions.values())
+
+    def record(self, fingerprint, request, status, headers, content, elapsed):
+        """Append an interaction to the cassette file."""
+        entry = {
+            'fingerprint': fingerprint,
+            'method': request.method,
+            'path': request.url.path,
+            'status': status,
+            'headers': headers,
+            'elapsed': round(elapsed, 3)
+        }
+        try:
+            entry['body'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_base64'] = base64.b64encode(content).decode('ascii')
+
+        with self._lock:
+            self._interactions.setdefault(fingerprint, []).append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def next_interaction(self, fingerprint):
+        """Get the next recorded interaction for a fingerprint, or None if it was never recorded."""
+        with self._lock:
+            entries = self._interactions.get(fingerprint)
+            if not entries:
+                return None
+            index = self._replayed.get(fingerprint, 0)
+            self._replayed[fingerprint] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+class RecordingTransport(httpx.BaseTransport):
+    """Send requests over a real transport and record their responses."""
+
+    def __init__(self, transport, cassette):
+        self._transport = transport
+        self._cassette = cassette
+
+    def handle_request(self, request):
+        fingerprint = request_fingerprint(request)
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        try:
+            # Reading decodes the body, so it is stored and returned without content-encoding
+            content = response.read()
+        finally:
+            response.close()
+        elapsed = time.perf_counter() - started
+
+        headers = [[name, value] for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_RESPONSE_HEADERS]
+        if response.status_code != TRANSIENT_STATUS and response.status_code < 500:
+            self._cassette.record(fingerprint, request, response.status_code, headers, content, elapsed)
+        return httpx.Response(response.status_code, headers=headers, content=content,
+                              request=request, extensions=response.extensions)
+
+    def close(self):
+        self._transport.close()
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serve recorded responses without touching the network."""
+
+    def __init__(self, cassette, latency_scale=0):
+        self._cassette = cassette
+        self._latency_scale = latency_scale
+
+    def handle_request(self, request):
+        entry = self._cassette.next_interaction(request_fingerprint(request))
+        if entry is None:
+            # A 404 is not retried, so the miss surfaces straight away as a NotFoundError
+            return httpx.Response(404, request=request, json={
+                'type': 'error',
+                'error': {
+                    'type': 'not_found_error',
+                    'message': f"No response recorded in {self._cassette.path} for {request.method} {request.url.path}"
+                }
+            })
+
+        if self._latency_scale:
+            time.sleep(entry['elapsed'] * self._latency_scale)
+        if 'body' in entry:
+            content = entry['body'].encode('utf-8')
+        else:
+            content = base64.b64decode(entry['body_base64'])
+        return httpx.Response(entry['status'], headers=entry['headers'], content=content, request=request)
+
+@functools.lru_cache(maxsize=None)
+def get_cassette(path):
+    """Get the process-wide cassette for a path, loaded on first use."""
+    return Cassette(path)
+
+def wrap_transport(create_transport):
+    """Get the HTTP transport for the configured cassette mode.
+
+    Args:
+        create_transport: Callable returning the live httpx transport; only
+                          called when recording, since replays never reach the network
+
+    Returns:
+        The transport to use, or None when no cassette is configured
+    """
+    settings = get_cassette_settings()
+    if settings is None:
+        return None
+    path, mode, latency_scale = settings
+    cassette = get_cassette(path)
+    if mode == RECORD:
+        print(f"Recording API responses to {path}")
+        return RecordingTransport(create_transport(), cassette)
+    print(f"Replaying {len(cassette)} recorded API responses from {path}")
+    return ReplayTransport(cassette, latency_scale)
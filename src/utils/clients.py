@@ -0,0 +1,146 @@
+"""Shared API clients for the PDF Parser application.
+
+A single HTTP connection pool is created per process and shared by every
+Anthropic client, tab and Streamlit session, so TLS connections are kept
+alive and reused across requests and processing runs.
+"""
+
+import functools
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+import httpx
+import streamlit as st
+from anthropic import Anthropic
+
+from src.utils.cassettes import is_replaying, wrap_transport
+
+# Connection pool defaults; override any of them in the [http_pool] section of secrets.toml
+HTTP_POOL_DEFAULTS = {
+    'max_connections': 20,
+    'max_keepalive_connections': 10,
+    'keepalive_expiry': 120.0,   # seconds an idle connection is kept open
+    'connect_timeout': 10.0,
+    'read_timeout': 600.0,       # long PDFs can take minutes to extract
+    'http2': False               # requires the optional h2 package
+}
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_connection_stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0}
+_seen_streams = weakref.WeakSet()
+
+def get_http_pool_settings():
+    """Get the connection pool settings, with overrides from secrets applied."""
+    settings = dict(HTTP_POOL_DEFAULTS)
+    try:
+        settings.update(st.secrets.get("http_pool", {}))
+    except FileNotFoundError:
+        # No secrets file (e.g. a worker process); use the defaults
+        pass
+    return settings
+
+def _track_connection(response):
+    """Count whether a response arrived over a new or a reused connection."""
+    stream = response.extensions.get("network_stream")
+    with _stats_lock:
+        _connection_stats['requests'] += 1
+        if stream is None:
+            return
+        try:
+            reused = stream in _seen_streams
+            _seen_streams.add(stream)
+        except TypeError:
+            # Stream type doesn't support weak references; skip reuse tracking
+            return
+        _connection_stats['reused_connections' if reused else 'new_connections'] += 1
+
+@functools.lru_cache(maxsize=None)
+def get_http_client():
+    """Get the process-wide HTTP client with a keep-alive connection pool.
+
+    Returns:
+        httpx.Client: The shared HTTP client
+    """
+    settings = get_http_pool_settings()
+    http2 = bool(settings['http2'])
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings['max_connections'],
+        max_keepalive_connections=settings['max_keepalive_connections'],
+        keepalive_expiry=settings['keepalive_expiry']
+    )
+    timeout = httpx.Timeout(settings['read_timeout'], connect=settings['connect_timeout'])
+
+    # Record or replay API responses when a cassette is configured (see src.utils.cassettes)
+    transport = wrap_transport(lambda: httpx.HTTPTransport(limits=limits, http2=http2))
+    if transport is not None:
+        # Proxy environment variables would route requests around the cassette
+        return httpx.Client(transport=transport, timeout=timeout, trust_env=False,
+                            event_hooks={'response': [_track_connection]})
+
+    return httpx.Client(
+        limits=limits,
+        timeout=timeout,
+        http2=http2,
+        event_hooks={'response': [_track_connection]}
+    )
+
+def get_connection_stats():
+    """Get request and connection reuse counts for the shared HTTP client.
+
+    Returns:
+        dict with requests, new_connections, reused_connections and reuse_rate
+    """
+    with _stats_lock:
+        stats = dict(_connection_stats)
+    tracked = stats['new_connections'] + stats['reused_connections']
+    stats['reuse_rate'] = stats['reused_connections'] / tracked if tracked else 0.0
+    return stats
+
+@functools.lru_cache(maxsize=None)
+def _create_client(api_key):
+    return Anthropic(api_key=api_key, http_client=get_http_client())
+
+@functools.lru_cache(maxsize=None)
+def _create_beta_client(api_key, betas):
+    # with_options shares the base client's HTTP connection pool
+    return _create_client(api_key).with_options(default_headers={"anthropic-beta": ",".join(betas)})
+
+def get_api_key():
+    """Get the Anthropic API key from secrets.toml, falling back to the environment.
+
+    Worker processes run outside Streamlit and may have no secrets file, so
+    they can supply the key through ANTHROPIC_API_KEY instead. Cassette
+    replays never reach the API, so they run without a key.
+    """
+    try:
+        return st.secrets["ANTHROPIC_API_KEY"]
+    except (FileNotFoundError, KeyError):
+        if is_replaying():
+            return os.environ.get("ANTHROPIC_API_KEY", "cassette-replay")
+        return os.environ["ANTHROPIC_API_KEY"]
+
+def get_anthropic_client(betas=()):
+    """Get the process-wide Anthropic client, created on first use.
+
+    Clients are cached for the lifetime of the process and all share one
+    HTTP connection pool, so Streamlit reruns, sessions and processing runs
+    reuse open connections instead of paying a TLS handshake each time.
+
+    Args:
+        betas: Beta feature names to send in the anthropic-beta header
+
+    Returns:
+        Anthropic: The shared client
+    """
+    api_key = get_api_key()
+    if betas:
+        return _create_beta_client(api_key, tuple(betas))
+    return _create_client(api_key)
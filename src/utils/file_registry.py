@@ -0,0 +1,122 @@
+"""Files API upload registry for the PDF Parser application.
+
+PDFs uploaded through the Anthropic Files API are remembered by content hash
+so the same document is sent over the wire only once, no matter how many
+times it is re-processed (e.g. with a different template).
+"""
+
+import contextlib
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+
+FILES_API_BETA = "files-api-2025-04-14"
+
+# Registry database lives next to the app, like results.db and the work queue
+DEFAULT_REGISTRY_PATH = os.path.join(os.getcwd(), ".file_registry.db")
+
+# Uploaded files are treated as stale after this many seconds
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    content_hash TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    uploaded_at REAL NOT NULL
+);
+"""
+
+class FileRegistry:
+    """Map PDF content hashes to Files API file IDs, persisted in SQLite.
+
+    Each operation is a single statement on a fresh connection, so the
+    Streamlit app and any number of worker processes on the same host can
+    share one registry without losing each other's entries.
+
+    The client passed to get_or_upload only needs a ``beta.files.upload``
+    method returning an object with an ``id`` attribute, so a local stand-in
+    can replace the real Anthropic client.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the registry safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # Rolls back a transaction left open by an error; only closing releases the connection
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, content_hash):
+        """Get the file ID for a content hash, or None if unknown or expired."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_id FROM files WHERE content_hash = ? AND uploaded_at >= ?",
+                (content_hash, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return row['file_id'] if row else None
+
+    def get_or_upload(self, client, filename, content):
+        """Get the file ID for a PDF, uploading it only if not already registered.
+
+        Args:
+            client: Anthropic client (or stand-in) used for uploads
+            filename: Name to give the uploaded file
+            content: Raw bytes of the PDF
+
+        Returns:
+            str: The Files API file ID
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        file_id = self.lookup(content_hash)
+        if file_id:
+            return file_id
+
+        uploaded = client.beta.files.upload(
+            file=(filename, content, "application/pdf"),
+            betas=[FILES_API_BETA]
+        )
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (content_hash, file_id, filename, size, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, uploaded.id, filename, len(content), time.time())
+            )
+
+        return uploaded.id
+
+    def forget(self, content_hash):
+        """Drop a content hash, e.g. after the API reports its file ID as missing."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE content_hash = ?", (content_hash,))
+
+    def purge_expired(self):
+        """Remove all stale entries from the registry.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM files WHERE uploaded_at < ?", (time.time() - self.ttl_seconds,))
+        return cursor.rowcount
+
+@functools.lru_cache(maxsize=None)
+def get_file_registry():
+    """Get the process-wide file registry, purging stale entries on first use."""
+    registry = FileRegistry()
+    registry.purge_expired()
+    return registry
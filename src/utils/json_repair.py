@@ -0,0 +1,148 @@
+"""Tolerant JSON parsing for model responses in the PDF Parser application."""
+
+import json
+import re
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+# How many truncation points to try when closing a cut-off response
+MAX_TRUNCATION_ATTEMPTS = 20
+
+def strip_code_fences(text):
+    """Return the content of the first Markdown code fence, or the text unchanged."""
+    match = CODE_FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+def find_json_start(text):
+    """Return the index of the first '{' or '[', or -1 if there is none."""
+    starts = [index for index in (text.find('{'), text.find('[')) if index != -1]
+    return min(starts) if starts else -1
+
+def scan_json(text):
+    """Scan JSON text once, tracking strings, open containers and commas.
+
+    Trailing commas (before a closing '}' or ']', or at the very end of a
+    cut-off response) are dropped from the returned text. Only commas outside
+    string literals are considered, so string values are never changed.
+
+    Args:
+        text: JSON text starting at its first '{' or '['
+
+    Returns:
+        (cleaned, closers, cut_points, in_string) where cleaned is the text
+        without trailing commas, closers closes the containers still open at
+        its end, cut_points holds (index, closers) for every remaining comma
+        in cleaned, and in_string is True if the text ends inside a string
+    """
+    cleaned = []
+    stack = []
+    cut_points = []
+    pending_comma = None
+    in_string = False
+    escaped = False
+
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            cleaned.append(char)
+            continue
+
+        if pending_comma is not None and not char.isspace():
+            if char in '}]':
+                del cleaned[pending_comma]
+            else:
+                cut_points.append((pending_comma, ''.join(reversed(stack))))
+            pending_comma = None
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if stack:
+                stack.pop()
+        elif char == ',':
+            pending_comma = len(cleaned)
+        cleaned.append(char)
+
+    if pending_comma is not None:
+        del cleaned[pending_comma]
+    return ''.join(cleaned), ''.join(reversed(stack)), cut_points, in_string
+
+def close_truncated_json(scanned):
+    """Generate candidate completions of a JSON document that was cut off.
+
+    Candidates are the whole text with its containers closed, then the text
+    cut back at each comma (most recent first), which drops the incomplete
+    trailing entry.
+
+    Args:
+        scanned: The result of scan_json for the text
+
+    Yields:
+        (candidate, closed_cut_value): Candidate JSON documents, most complete
+        first; closed_cut_value is True when the candidate keeps a number or
+        literal the cut may have shortened (12 of 12.50)
+    """
+    cleaned, closers, cut_points, in_string = scanned
+
+    # A response cut inside a string has a truncated value; never close it
+    if not in_string:
+        closed = cleaned.rstrip()
+        yield closed + closers, bool(closed) and closed[-1] not in '"}]'
+
+    for index, cut_closers in reversed(cut_points[-MAX_TRUNCATION_ATTEMPTS:]):
+        yield cleaned[:index] + cut_closers, False
+
+def parse_json_response(text, details=None):
+    """Parse a JSON response, repairing common model output problems.
+
+    Handles Markdown code fences, prose before or after the JSON, trailing
+    commas and responses truncated mid-document.
+
+    Args:
+        text: Raw text of the model response
+        details: Optional dict; its 'closed_cut_value' key is set to True when a
+                 truncated response was repaired by keeping the value it was cut
+                 in, which may therefore be incomplete
+
+    Returns:
+        (data, repaired) where repaired is True if the text was not valid JSON as-is
+
+    Raises:
+        json.JSONDecodeError: If no repair produces valid JSON
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError as e:
+        original_error = e
+
+    cleaned = strip_code_fences(text)
+    start = find_json_start(cleaned)
+    if start == -1:
+        raise original_error
+    scanned = scan_json(cleaned[start:])
+
+    # Complete JSON followed by trailing prose
+    try:
+        data, _ = json.JSONDecoder().raw_decode(scanned[0])
+        return data, True
+    except json.JSONDecodeError:
+        pass
+
+    # Truncated JSON: close open containers at the last safe point
+    for candidate, closed_cut_value in close_truncated_json(scanned):
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if details is not None:
+            details['closed_cut_value'] = closed_cut_value
+        return data, True
+
+    raise original_error
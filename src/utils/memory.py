@@ -0,0 +1,73 @@
+"""Process memory reporting for the PDF Parser application."""
+
+import contextlib
+import os
+import sys
+import threading
+
+# Seconds between resident memory samples while a run is tracked
+SAMPLE_INTERVAL = 0.1
+
+def get_peak_memory_mb():
+    """Get the peak resident memory over this process's whole lifetime, in megabytes.
+
+    In a long-running Streamlit server this is the highest value since the
+    server started, not that of the latest run; use track_peak_memory for a run.
+
+    Returns:
+        float, or None where the resource module is unavailable (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def get_current_memory_mb():
+    """Get the current resident memory of this process in megabytes.
+
+    Returns:
+        float, or None where /proc is unavailable (macOS, Windows)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+@contextlib.contextmanager
+def track_peak_memory():
+    """Sample resident memory on a helper thread while the block runs.
+
+    Yields:
+        dict whose 'peak_mb' is the highest resident memory seen during the
+        block, filled in when the block exits; None where it can't be measured
+    """
+    usage = {'peak_mb': get_current_memory_mb()}
+    if usage['peak_mb'] is None:
+        yield usage
+        return
+
+    stop_event = threading.Event()
+
+    def sample():
+        while not stop_event.wait(SAMPLE_INTERVAL):
+            current = get_current_memory_mb()
+            if current is not None and current > usage['peak_mb']:
+                usage['peak_mb'] = current
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield usage
+    finally:
+        stop_event.set()
+        sampler.join()
+        current = get_current_memory_mb()
+        if current is not None:
+            usage['peak_mb'] = max(usage['peak_mb'], current)
@@ -0,0 +1,199 @@
+"""Persistent results store for the PDF Parser application.
+
+Every extracted bill is appended to a SQLite database, indexed by file
+hash, account number, billing period and template, so results outlive the
+Streamlit session and can be queried or exported without re-extracting.
+Rows are never updated; re-processing a file adds a new row.
+
+Export a slice from the command line:
+
+    python -m src.utils.results_store --template "Water Bills" --from 2024-01-01 --output water.csv
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_STORE_PATH = os.path.join(os.getcwd(), "results.db")
+
+# Result fields the indexed columns are taken from, in order of preference
+ACCOUNT_FIELDS = ("Account Number", "Account")
+PERIOD_START_FIELDS = ("Start Date", "Billing Period Start")
+PERIOD_END_FIELDS = ("End Date", "Billing Period End")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_hash TEXT NOT NULL,
+    filename TEXT,
+    template TEXT,
+    account_number TEXT,
+    period_start TEXT,
+    period_end TEXT,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_file_hash ON results (file_hash);
+CREATE INDEX IF NOT EXISTS idx_results_account ON results (account_number, period_start);
+CREATE INDEX IF NOT EXISTS idx_results_template ON results (template, period_start);
+"""
+
+def first_value(result, fields):
+    """Get the first non-empty value among the given result fields, as text."""
+    for field in fields:
+        value = result.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+class ResultsStore:
+    """Append-only SQLite store of extracted bills."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            # Commits on success and rolls back on error; only closing releases the connection
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, result, file_hash, template=None):
+        """Record one extracted bill.
+
+        Args:
+            result: The extracted data, including its 'filename'
+            file_hash: SHA-256 of the source PDF
+            template: Name of the template the bill was extracted with
+
+        Returns:
+            int: The row ID
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO results (file_hash, filename, template, account_number, period_start, period_end, data, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_hash, result.get('filename'), template,
+                 first_value(result, ACCOUNT_FIELDS),
+                 first_value(result, PERIOD_START_FIELDS),
+                 first_value(result, PERIOD_END_FIELDS),
+                 json.dumps(result), time.time())
+            )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _where_clause(template, account_number, period_from, period_to, file_hash, after_id):
+        # Billing period bounds are compared as text, which orders correctly for YYYY-MM-DD dates
+        conditions = []
+        params = []
+        for column, operator, value in (
+            ("template", "=", template),
+            ("account_number", "=", account_number),
+            ("period_start", ">=", period_from),
+            ("period_end", "<=", period_to),
+            ("file_hash", "=", file_hash),
+            ("id", ">", after_id),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def query(self, template=None, account_number=None, period_from=None, period_to=None, file_hash=None, after_id=None, limit=None, offset=0):
+        """Get stored bills matching all the given filters.
+
+        Args:
+            template: Template name
+            account_number: Exact account number
+            period_from: Earliest period start to include
+            period_to: Latest period end to include
+            file_hash: Source PDF hash
+            after_id: Only rows added after this row ID (for incremental exports)
+            limit: Maximum number of rows
+            offset: Number of matching rows to skip (with limit, for paging)
+
+        Returns:
+            list of dicts: The stored results, each with '_id' and 'file_hash' added
+        """
+        where, params = self._where_clause(template, account_number, period_from, period_to, file_hash, after_id)
+        query = "SELECT id, file_hash, data FROM results" + where + " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{'_id': row['id'], 'file_hash': row['file_hash'], **json.loads(row['data'])} for row in rows]
+
+    def count(self, template=None, account_number=None, period_from=None, period_to=None, file_hash=None, after_id=None):
+        """Count stored bills matching all the given filters (see query)."""
+        where, params = self._where_clause(template, account_number, period_from, period_to, file_hash, after_id)
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results" + where, params).fetchone()[0]
+
+    def templates(self):
+        """Get the names of the templates with stored results."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT template FROM results WHERE template IS NOT NULL ORDER BY template").fetchall()
+        return [row['template'] for row in rows]
+
+@functools.lru_cache(maxsize=None)
+def get_results_store(path=DEFAULT_STORE_PATH):
+    """Get the shared ResultsStore for a database file."""
+    return ResultsStore(path)
+
+def results_to_dataframe(results):
+    """Build a DataFrame from stored results with filename first."""
+    import pandas as pd
+
+    df = pd.DataFrame(results)
+    if 'filename' in df.columns:
+        df = df[['filename'] + [col for col in df.columns if col != 'filename']]
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and export stored extraction results.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Path to the results database")
+    parser.add_argument("--template", help="Template name")
+    parser.add_argument("--account", help="Account number")
+    parser.add_argument("--from", dest="period_from", help="Earliest billing period start (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="period_to", help="Latest billing period end (YYYY-MM-DD)")
+    parser.add_argument("--after-id", type=int, help="Only rows added after this row ID")
+    parser.add_argument("--output", help="Write to a .csv, .xlsx or .jsonl file instead of printing")
+    args = parser.parse_args()
+
+    results = get_results_store(args.store).query(args.template, args.account, args.period_from,
+                                                  args.period_to, after_id=args.after_id)
+    if not results:
+        print("No matching results")
+        return
+
+    if args.output is None:
+        print(results_to_dataframe(results).to_string(index=False))
+    elif args.output.endswith('.jsonl'):
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    elif args.output.endswith('.xlsx'):
+        results_to_dataframe(results).to_excel(args.output, index=False, sheet_name='Extracted Data')
+    else:
+        results_to_dataframe(results).to_csv(args.output, index=False)
+
+    # The last row ID lets the next export pick up where this one stopped
+    print(f"{len(results)} results; last row ID {results[-1]['_id']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Per-thread processing state for the PDF Parser application.
+
+Processing code records its logs and diagnostics (API logs, usage, problem
+files, ...) through get_run_state(). In the Streamlit script thread that is
+st.session_state; background jobs bind their own dict instead, since they
+have no session to write to.
+"""
+
+import contextlib
+import threading
+import streamlit as st
+
+_local = threading.local()
+
+def get_run_state():
+    """Get the mapping processing results are recorded in for this thread."""
+    state = getattr(_local, 'state', None)
+    return st.session_state if state is None else state
+
+@contextlib.contextmanager
+def bind_run_state(state):
+    """Record processing state for the current thread into the given dict."""
+    previous = getattr(_local, 'state', None)
+    _local.state = state
+    try:
+        yield state
+    finally:
+        _local.state = previous
+
+def report_message(level, message):
+    """Show a user-facing message, or queue it on the bound state in background threads.
+
+    Args:
+        level: Streamlit message function name ('error', 'warning', 'info' or 'success')
+        message: The message text
+    """
+    state = getattr(_local, 'state', None)
+    if state is None:
+        getattr(st, level)(message)
+    else:
+        state.setdefault('messages', []).append((level, message))
@@ -0,0 +1,60 @@
+"""Tests for the Files API upload registry, using a local stand-in for the client."""
+
+import hashlib
+import time
+from types import SimpleNamespace
+
+from src.utils.file_registry import FileRegistry
+
+class StandInFilesClient:
+    """Records uploads and hands out sequential file IDs, like client.beta.files."""
+
+    def __init__(self):
+        self.uploads = []
+        self.beta = SimpleNamespace(files=SimpleNamespace(upload=self.upload))
+
+    def upload(self, file, betas):
+        self.uploads.append(file[0])
+        return SimpleNamespace(id=f"file_{len(self.uploads)}")
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+def test_same_content_is_uploaded_once(tmp_path):
+    registry = FileRegistry(str(tmp_path / "registry.db"))
+    client = StandInFilesClient()
+
+    first = registry.get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill")
+    second = registry.get_or_upload(client, "renamed.pdf", b"%PDF-1.7 bill")
+
+    assert first == second == "file_1"
+    assert client.uploads == ["bill.pdf"]
+
+def test_registry_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "registry.db")
+    client = StandInFilesClient()
+    FileRegistry(path).get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill")
+
+    # Another process opening the same database sees the upload
+    assert FileRegistry(path).get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill") == "file_1"
+    assert len(client.uploads) == 1
+
+def test_forgotten_file_is_uploaded_again(tmp_path):
+    registry = FileRegistry(str(tmp_path / "registry.db"))
+    client = StandInFilesClient()
+    registry.get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill")
+
+    registry.forget(content_hash(b"%PDF-1.7 bill"))
+
+    assert registry.get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill") == "file_2"
+
+def test_expired_entries_are_ignored_and_purged(tmp_path, monkeypatch):
+    registry = FileRegistry(str(tmp_path / "registry.db"), ttl_seconds=60)
+    client = StandInFilesClient()
+    registry.get_or_upload(client, "bill.pdf", b"%PDF-1.7 bill")
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert registry.lookup(content_hash(b"%PDF-1.7 bill")) is None
+    assert registry.purge_expired() == 1
@@ -0,0 +1,48 @@
+"""Tests for the tolerant JSON parsing of model responses."""
+
+import json
+
+import pytest
+
+from src.utils.json_repair import parse_json_response
+
+def test_valid_json_is_not_repaired():
+    assert parse_json_response('{"a": 1}') == ({'a': 1}, False)
+
+def test_code_fence_and_prose_are_stripped():
+    text = 'Here is the data:\n```json\n{"a": 1, "b": [1, 2,],}\n```\nLet me know if you need more.'
+    assert parse_json_response(text) == ({'a': 1, 'b': [1, 2]}, True)
+
+def test_trailing_comma_inside_string_is_kept():
+    data, repaired = parse_json_response('{"a": "x, }", "b": 1,}')
+    assert repaired
+    assert data == {'a': 'x, }', 'b': 1}
+
+def test_truncated_value_containing_closer_is_kept():
+    details = {}
+    data, repaired = parse_json_response('{"a": "x, }", "b": 1', details)
+    assert repaired
+    assert data == {'a': 'x, }', 'b': 1}
+    # The number 1 may have been cut short, so callers are told
+    assert details['closed_cut_value'] is True
+
+def test_escaped_quote_does_not_end_string():
+    data, _ = parse_json_response('{"a": "say \\"hi, ]\\"", "b": 2,')
+    assert data == {'a': 'say "hi, ]"', 'b': 2}
+
+def test_response_cut_inside_string_drops_that_entry():
+    details = {}
+    data, repaired = parse_json_response('{"a": 1, "b": "hel', details)
+    assert repaired
+    assert data == {'a': 1}
+    assert details['closed_cut_value'] is False
+
+def test_response_cut_after_complete_entry_is_closed():
+    details = {}
+    data, _ = parse_json_response('[{"a": 1}, {"a": 2},', details)
+    assert data == [{'a': 1}, {'a': 2}]
+    assert details['closed_cut_value'] is False
+
+def test_unrepairable_text_raises_original_error():
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_response('no JSON here')
@@ -0,0 +1,81 @@
+"""Replay a recorded API interaction through the whole extraction pipeline.
+
+The cassette in tests/data holds the response to one document-mode request
+for water_bill.pdf, so these tests cover request building, response
+parsing and DataFrame assembly without network access or an API key.
+
+The cassette matches the request exactly, so it must be re-recorded when
+anything in the request changes (system prompt, examples, model, request
+options): delete tests/data/water_bill.jsonl and run this module with
+PDF_PARSER_CASSETTE_MODE=record and ANTHROPIC_API_KEY set.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("fitz")
+pytest.importorskip("httpx")
+pytest.importorskip("pandas")
+pytest.importorskip("streamlit")
+
+from src.pdf.documents import InputDocument
+from src.pdf.parser import process_pdf_files
+from src.utils import cassettes, clients
+from src.utils.run_state import bind_run_state
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CASSETTE_PATH = os.path.join(DATA_DIR, "water_bill.jsonl")
+BILL_PATH = os.path.join(DATA_DIR, "water_bill.pdf")
+
+PROMPT = ("Extract the Account Number, Start Date, End Date and Total Current Charges from this utility bill. "
+          "Provide ONLY a JSON object with those four keys.")
+FIELD_NAMES = ["Account Number", "Start Date", "End Date", "Total Current Charges"]
+
+# Client getters cached per process; cleared so the shared HTTP client picks up the cassette
+CACHED_GETTERS = (clients.get_http_client, clients._create_client, clients._create_beta_client, cassettes.get_cassette)
+
+@pytest.fixture
+def cassette(monkeypatch):
+    mode = os.environ.get(cassettes.CASSETTE_MODE_ENV, cassettes.REPLAY)
+    monkeypatch.setenv(cassettes.CASSETTE_ENV, CASSETTE_PATH)
+    monkeypatch.setenv(cassettes.CASSETTE_MODE_ENV, mode)
+    monkeypatch.setenv(cassettes.REPLAY_LATENCY_ENV, "0")
+    if mode == cassettes.REPLAY:
+        # Replays must never depend on a real key
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    for getter in CACHED_GETTERS:
+        getter.cache_clear()
+    yield
+    for getter in CACHED_GETTERS:
+        getter.cache_clear()
+
+def test_replayed_bill_yields_recorded_fields(cassette):
+    with bind_run_state({}) as state:
+        df = process_pdf_files([InputDocument.from_path(BILL_PATH)], PROMPT, False, field_names=FIELD_NAMES)
+
+    assert 'problematic_files' not in state
+    assert df is not None and len(df) == 1
+    assert df.iloc[0].to_dict() == {
+        'filename': "water_bill.pdf",
+        'Account Number': "1001-2002",
+        'Start Date': "2024-05-01",
+        'End Date': "2024-05-31",
+        'Total Current Charges': 84.17
+    }
+    assert state['last_usage'] == {'input_tokens': 3712, 'output_tokens': 61, 'stop_reason': "end_turn"}
+
+def test_unrecorded_request_fails_without_reaching_the_api(cassette):
+    if os.environ.get(cassettes.CASSETTE_MODE_ENV) == cassettes.RECORD:
+        pytest.skip("only meaningful when replaying")
+    with open(BILL_PATH, "rb") as f:
+        # A trailing comment keeps the PDF valid but changes the request
+        changed = InputDocument.from_bytes("changed_bill.pdf", f.read() + b"% changed\n")
+
+    with bind_run_state({}) as state:
+        df = process_pdf_files([changed], PROMPT, False, field_names=FIELD_NAMES)
+
+    assert df is None
+    assert [problem['filename'] for problem in state['problematic_files']] == ["changed_bill.pdf"]
+    assert "No response recorded" in state['problematic_files'][0]['response']
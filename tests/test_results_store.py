@@ -0,0 +1,36 @@
+"""Tests for the persistent results store."""
+
+from src.utils.results_store import ResultsStore
+
+def make_store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    for index in range(5):
+        store.append({'filename': f"bill_{index}.pdf", 'Account Number': "1001" if index % 2 else "2002",
+                      'Start Date': f"2024-0{index + 1}-01"}, f"hash_{index}", "Water Bills")
+    store.append({'filename': "gas.pdf"}, "hash_gas", "Gas Bills")
+    return store
+
+def test_filters_match_indexed_columns(tmp_path):
+    store = make_store(tmp_path)
+
+    assert [row['filename'] for row in store.query(account_number="1001")] == ["bill_1.pdf", "bill_3.pdf"]
+    assert [row['filename'] for row in store.query(template="Water Bills", period_from="2024-04-01")] == ["bill_3.pdf", "bill_4.pdf"]
+    assert store.count(template="Gas Bills") == 1
+    assert store.templates() == ["Gas Bills", "Water Bills"]
+
+def test_pages_cover_all_rows_in_order(tmp_path):
+    store = make_store(tmp_path)
+
+    pages = [store.query(template="Water Bills", limit=2, offset=offset) for offset in (0, 2, 4)]
+
+    assert [[row['filename'] for row in page] for page in pages] == [
+        ["bill_0.pdf", "bill_1.pdf"], ["bill_2.pdf", "bill_3.pdf"], ["bill_4.pdf"]]
+    assert store.count(template="Water Bills") == 5
+
+def test_after_id_returns_only_newer_rows(tmp_path):
+    store = make_store(tmp_path)
+    last_id = store.query()[-1]['_id']
+
+    new_id = store.append({'filename': "late.pdf"}, "hash_late", "Water Bills")
+
+    assert [row['_id'] for row in store.query(after_id=last_id)] == [new_id]
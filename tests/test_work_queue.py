@@ -0,0 +1,57 @@
+"""Tests for the SQLite work queue."""
+
+import time
+
+from src.jobs.queue import DONE, FAILED, LEASED, PENDING, WorkQueue
+from src.pdf.documents import InputDocument
+
+def make_queue(tmp_path, max_attempts=3, count=2):
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=max_attempts)
+    documents = [InputDocument.from_bytes(f"bill_{index}.pdf", b"%PDF-1.7") for index in range(count)]
+    return queue, queue.enqueue_batch(documents, {'prompt': "Extract"})
+
+def test_tasks_are_leased_once_and_completed(tmp_path):
+    queue, batch_id = make_queue(tmp_path)
+
+    first = queue.lease("worker-a")
+    second = queue.lease("worker-b")
+
+    assert first['id'] != second['id']
+    assert queue.lease("worker-c") is None
+    assert queue.complete(first['id'], "worker-a", {'filename': first['filename']})
+    assert not queue.complete(second['id'], "worker-a", {})
+    assert queue.batch_status(batch_id)[DONE] == 1
+    assert queue.batch_status(batch_id)[LEASED] == 1
+
+def test_failed_attempts_are_retried_until_the_limit(tmp_path):
+    queue, batch_id = make_queue(tmp_path, max_attempts=2, count=1)
+
+    for attempt in (1, 2):
+        task = queue.lease("worker")
+        assert task['attempts'] == attempt
+        queue.fail(task['id'], "worker", "boom")
+
+    assert queue.lease("worker") is None
+    results, failures = queue.batch_results(batch_id)
+    assert results == []
+    assert failures == [{'filename': "bill_0.pdf", 'response': "boom"}]
+
+def test_expired_lease_on_last_attempt_fails_the_task(tmp_path):
+    queue, batch_id = make_queue(tmp_path, max_attempts=1, count=1)
+    queue.lease("worker", visibility_timeout=0.01)
+    time.sleep(0.05)
+
+    status = queue.batch_status(batch_id)
+
+    assert status[FAILED] == 1
+    assert status[LEASED] == 0
+
+def test_abandoned_batch_counts_as_finished(tmp_path):
+    queue, batch_id = make_queue(tmp_path)
+    task = queue.lease("worker")
+
+    assert queue.abandon_batch(batch_id) == 2
+    assert queue.batch_status(batch_id)[FAILED] == 2
+    assert queue.batch_status(batch_id)[PENDING] == 0
+    # A result arriving after the batch was abandoned is discarded
+    assert not queue.complete(task['id'], "worker", {})